@@ -0,0 +1,37 @@
+"""Index issues on their creation and closing dates
+
+Revision ID: 5b3e8a1c9d47
+Revises: c0bffa4e8fbc
+Create Date: 2026-10-17 09:12:31.204511
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = "5b3e8a1c9d47"
+down_revision = "c0bffa4e8fbc"
+
+from alembic import op
+
+
+def upgrade():
+    """ Creates the indexes used by the issues history stats on the issues
+    table.
+    """
+    op.create_index(
+        "ix_issues_project_id_date_created",
+        "issues",
+        ["project_id", "date_created"],
+    )
+    op.create_index(
+        "ix_issues_project_id_closed_at",
+        "issues",
+        ["project_id", "closed_at"],
+    )
+
+
+def downgrade():
+    """ Drop the indexes used by the issues history stats on the issues
+    table.
+    """
+    op.drop_index("ix_issues_project_id_closed_at", table_name="issues")
+    op.drop_index("ix_issues_project_id_date_created", table_name="issues")
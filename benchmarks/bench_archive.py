@@ -0,0 +1,175 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark the generation of the archives of a project.
+
+It creates a synthetic git repository (5000 files of 4KB by default, spread
+over folders) and times, for each archive format:
+- cloning the repository, checking out the commit and archiving the working
+  tree (the former behavior of generate_archive),
+- streaming the archive straight from the objects of the repository, with
+  stream_archive.
+
+Usage:
+    python benchmarks/bench_archive.py --files 5000 --size 4096
+    python benchmarks/bench_archive.py --repo /srv/git/repositories/foo.git
+
+"""
+
+from __future__ import print_function, unicode_literals, absolute_import
+
+import argparse
+import os
+import random
+import shutil
+import sys
+import tarfile
+import tempfile
+import time
+import tracemalloc
+import zipfile
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+)
+
+import pygit2  # noqa: E402
+
+import pagure.lib.git  # noqa: E402
+
+
+def make_repo(path, nb_files, size):
+    """Create a bare repository with a single commit holding the files."""
+    repo = pygit2.init_repository(path, bare=True)
+    rand = random.Random(42)
+    folders = {}
+    for idx in range(nb_files):
+        folder = "folder%s" % (idx % 50)
+        content = "".join(
+            rand.choice("abcdefghijklmnopqrstuvwxyz \n") for _ in range(size)
+        ).encode("utf-8")
+        folders.setdefault(folder, repo.TreeBuilder()).insert(
+            "file%s.txt" % idx,
+            repo.create_blob(content),
+            pygit2.GIT_FILEMODE_BLOB,
+        )
+    builder = repo.TreeBuilder()
+    for folder, subtree in folders.items():
+        builder.insert(folder, subtree.write(), pygit2.GIT_FILEMODE_TREE)
+    author = pygit2.Signature("Alice Author", "alice@authors.tld")
+    repo.create_commit(
+        "refs/heads/master", author, author, "Files", builder.write(), []
+    )
+    return repo
+
+
+def clone_and_archive(repopath, commit, name, fmt, target):
+    """Clone, check out and archive the working tree, the former way."""
+    clonepath = tempfile.mkdtemp(prefix="bench-archive-clone-")
+    try:
+        repo = pygit2.clone_repository(repopath, clonepath)
+        repo.checkout_tree(repo[commit].tree)
+        if fmt == "zip":
+            with zipfile.ZipFile(target, "w") as zipstream:
+                for root, dirs, files in os.walk(clonepath):
+                    dirs[:] = [folder for folder in dirs if folder != ".git"]
+                    for filename in files:
+                        path = os.path.join(root, filename)
+                        zipstream.write(
+                            path,
+                            os.path.join(
+                                name, os.path.relpath(path, clonepath)
+                            ),
+                            zipfile.ZIP_DEFLATED,
+                        )
+        else:
+            mode = "w:gz" if fmt == "tar.gz" else "w"
+            with tarfile.open(target, mode=mode) as tar:
+                tar.add(
+                    clonepath,
+                    arcname=name,
+                    filter=lambda info: None if ".git" in info.name else info,
+                )
+    finally:
+        shutil.rmtree(clonepath)
+
+
+def stream(repopath, commit, name, fmt, target):
+    """Stream the archive from the objects of the repository."""
+    repo = pygit2.Repository(repopath)
+    chunks = pagure.lib.git.stream_archive(repo, commit, name, fmt)
+    for _ in pagure.lib.git.save_archive(chunks, target):
+        pass
+
+
+def measure(function, *args):
+    """Run the function, return the time it took and its peak of memory
+    allocated."""
+    tracemalloc.start()
+    start = time.time()
+    function(*args)
+    duration = time.time() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return duration, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument(
+        "--files",
+        type=int,
+        default=5000,
+        help="Number of files of the synthetic repository (default: 5000)",
+    )
+    parser.add_argument(
+        "--size",
+        type=int,
+        default=4096,
+        help="Size of the files, in bytes (default: 4096)",
+    )
+    parser.add_argument(
+        "--repo", help="Path of an existing repository to use instead"
+    )
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench-archive-")
+    try:
+        repopath = args.repo
+        if not repopath:
+            repopath = os.path.join(workdir, "repo.git")
+            make_repo(repopath, args.files, args.size)
+        repo = pygit2.Repository(repopath)
+        commit = repo.revparse_single("HEAD").peel(pygit2.Commit).hex
+
+        print(
+            "%-8s %-22s %10s %12s %12s"
+            % ("format", "method", "time", "peak memory", "size")
+        )
+        for fmt in pagure.lib.git.ARCHIVE_FORMATS:
+            for label, function in (
+                ("clone and check out", clone_and_archive),
+                ("stream from objects", stream),
+            ):
+                target = os.path.join(workdir, "archive.%s" % fmt)
+                duration, peak = measure(
+                    function, repopath, commit, "bench", fmt, target
+                )
+                print(
+                    "%-8s %-22s %9.3fs %10.1fMB %10.1fMB"
+                    % (
+                        fmt,
+                        label,
+                        duration,
+                        peak / 1024.0 / 1024,
+                        os.path.getsize(target) / 1024.0 / 1024,
+                    )
+                )
+                os.unlink(target)
+    finally:
+        shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark the decoding of the files displayed.
+
+It creates a synthetic git repository holding a corpus of files in mixed
+character encodings (ASCII, UTF-8, ISO-8859-1, windows-1251, Shift JIS and
+EUC-KR) of a given size, and times viewing each of them a number of times:
+- guessing the encoding of the whole file with chardet and decoding it,
+  twice, as view_file did before,
+- decoding the file once, as UTF-8 if it is valid UTF-8 and guessing the
+  encoding of a sample of it otherwise, without caching the encodings found,
+- the same, caching the encodings found by identifier of the git blob.
+
+Usage:
+    python benchmarks/bench_encoding.py --size 1048576 --views 3
+    python benchmarks/bench_encoding.py --repo /srv/git/repositories/foo.git
+
+"""
+
+from __future__ import print_function, unicode_literals, absolute_import
+
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+)
+
+import pygit2  # noqa: E402
+
+import pagure.config  # noqa: E402
+import pagure.exceptions  # noqa: E402
+from pagure.lib import encoding_utils  # noqa: E402
+
+# Text of each encoding of the corpus, repeated to reach the size of the file
+SAMPLES = [
+    ("ascii", "def main():\n    return 'Twas bryllyg and the slythy toves'\n"),
+    ("utf-8", "# Šabata, français, gagné, 日本語のテキスト, ελληνικά\n"),
+    ("iso-8859-1", "Le garçon déçu mais l'âme plutôt naïve, Louÿs rêva\n"),
+    ("windows-1251", "Съешь же ещё этих мягких французских булок\n"),
+    ("shift_jis", "いろはにほへと　ちりぬるを　わかよたれそ　つねならむ\n"),
+    ("euc-kr", "다람쥐 헌 쳇바퀴에 타고파, 키스의 고유조건은\n"),
+]
+
+
+def make_repo(path, size):
+    """Create a bare repository holding a file of the given size in each
+    encoding of the corpus."""
+    repo = pygit2.init_repository(path, bare=True)
+    rand = random.Random(42)
+    builder = repo.TreeBuilder()
+    for encoding, text in SAMPLES:
+        lines = []
+        length = 0
+        while length < size:
+            line = text.replace(" ", " " * rand.randint(1, 3), 1)
+            lines.append(line)
+            length += len(line.encode(encoding))
+        builder.insert(
+            "file.%s" % encoding,
+            repo.create_blob("".join(lines).encode(encoding)),
+            pygit2.GIT_FILEMODE_BLOB,
+        )
+    author = pygit2.Signature("Alice Author", "alice@authors.tld")
+    repo.create_commit(
+        "refs/heads/master", author, author, "Files", builder.write(), []
+    )
+    return repo
+
+
+def list_blobs(repo, tree, path=""):
+    """Return the name and blob of every file of the tree."""
+    blobs = []
+    for entry in tree:
+        obj = repo[entry.id]
+        name = os.path.join(path, entry.name)
+        if isinstance(obj, pygit2.Tree):
+            blobs.extend(list_blobs(repo, obj, name))
+        elif b"\0" not in obj.data[:8000]:
+            blobs.append((name, obj))
+    return blobs
+
+
+def former_view(blob):
+    """Decode the file the way view_file did, guessing its encoding from
+    the whole file twice."""
+    data = blob.data
+    data.decode(encoding_utils.guess_encoding(data))
+    return data.decode(encoding_utils.guess_encoding(data))
+
+
+def uncached_view(blob):
+    """Decode the file once, without caching its encoding."""
+    return encoding_utils.decode(blob.data)
+
+
+def cached_view(blob):
+    """Decode the file once, caching its encoding by blob."""
+    return encoding_utils.decode(blob.data, blob_id=blob.oid.hex)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument(
+        "--size",
+        type=int,
+        default=1024 * 1024,
+        help="Size of the files of the corpus, in bytes (default: 1048576)",
+    )
+    parser.add_argument(
+        "--views",
+        type=int,
+        default=3,
+        help="Number of views of each file (default: 3)",
+    )
+    parser.add_argument(
+        "--repo", help="Path of an existing repository to use instead"
+    )
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench-encoding-")
+    try:
+        if args.repo:
+            repo = pygit2.Repository(args.repo)
+        else:
+            repo = make_repo(os.path.join(workdir, "repo.git"), args.size)
+        commit = repo.revparse_single("HEAD").peel(pygit2.Commit)
+        blobs = list_blobs(repo, commit.tree)
+        pagure.config.config["ENCODING_CACHE_SIZE"] = len(blobs)
+
+        print(
+            "%-24s %12s %12s %12s" % ("file", "former", "uncached", "cached")
+        )
+        totals = [0.0, 0.0, 0.0]
+        for name, blob in blobs:
+            durations = []
+            for view in (former_view, uncached_view, cached_view):
+                start = time.time()
+                try:
+                    for _ in range(args.views):
+                        view(blob)
+                except pagure.exceptions.PagureException:
+                    pass
+                durations.append(time.time() - start)
+            totals = [total + dur for total, dur in zip(totals, durations)]
+            print(
+                "%-24s %11.3fs %11.3fs %11.3fs"
+                % ((name[-24:],) + tuple(durations))
+            )
+        print("%-24s %11.3fs %11.3fs %11.3fs" % (("total",) + tuple(totals)))
+    finally:
+        shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    main()
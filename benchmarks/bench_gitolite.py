@@ -0,0 +1,182 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark the generation of the gitolite configuration.
+
+It creates a sqlite database with a number of synthetic projects (each
+with a couple of committers and a group) and times, for the gitolite3 and
+gitolite3_fragments git auth backends, a full rebuild of the configuration
+and the update of a single project.
+
+Usage:
+    python benchmarks/bench_gitolite.py --projects 10000 --projects 50000
+
+"""
+
+from __future__ import print_function, unicode_literals, absolute_import
+
+import argparse
+import datetime
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+)
+
+import pagure.config  # noqa: E402
+import pagure.lib.query  # noqa: E402
+import pagure.lib.git_auth  # noqa: E402
+import pagure.lib.model as model  # noqa: E402
+
+
+def populate(session, nb_projects, nb_users):
+    """Insert the synthetic users, groups and projects in the database."""
+    now = datetime.datetime.utcnow()
+    engine = session.get_bind()
+    engine.execute(
+        model.User.__table__.insert(),
+        [
+            {
+                "id": idx,
+                "user": "user%s" % idx,
+                "fullname": "User %s" % idx,
+                "default_email": "user%s@example.com" % idx,
+                "created": now,
+                "updated_on": now,
+                "refuse_sessions_before": None,
+            }
+            for idx in range(1, nb_users + 1)
+        ],
+    )
+    engine.execute(
+        model.PagureGroup.__table__.insert(),
+        [
+            {
+                "id": idx,
+                "group_name": "group%s" % idx,
+                "display_name": "Group %s" % idx,
+                "group_type": "user",
+                "user_id": idx,
+                "created": now,
+            }
+            for idx in range(1, 11)
+        ],
+    )
+    engine.execute(
+        model.PagureUserGroup.__table__.insert(),
+        [
+            {"user_id": idx, "group_id": idx % 10 + 1}
+            for idx in range(1, nb_users + 1)
+        ],
+    )
+    engine.execute(
+        model.Project.__table__.insert(),
+        [
+            {
+                "id": idx,
+                "user_id": idx % nb_users + 1,
+                "name": "project%s" % idx,
+                "namespace": "ns%s" % (idx % 20) if idx % 3 else None,
+                "hook_token": "token%s" % idx,
+                "is_fork": False,
+                "read_only": False,
+                "private": False,
+                "date_created": now,
+                "date_modified": now,
+            }
+            for idx in range(1, nb_projects + 1)
+        ],
+    )
+    engine.execute(
+        model.ProjectUser.__table__.insert(),
+        [
+            {
+                "project_id": idx,
+                "user_id": (idx + offset) % nb_users + 1,
+                "access": "commit",
+            }
+            for idx in range(1, nb_projects + 1)
+            for offset in (1, 2)
+        ],
+    )
+    engine.execute(
+        model.ProjectGroup.__table__.insert(),
+        [
+            {"project_id": idx, "group_id": idx % 10 + 1, "access": "commit"}
+            for idx in range(1, nb_projects + 1, 5)
+        ],
+    )
+
+
+def timeit(function, *args, **kwargs):
+    """Return the time, in seconds, the function took to run."""
+    start = time.time()
+    function(*args, **kwargs)
+    return time.time() - start
+
+
+def run(nb_projects, nb_users, backends):
+    """Run the benchmark for the given number of projects."""
+    folder = tempfile.mkdtemp(prefix="pagure-bench-gitolite-")
+    try:
+        session = model.create_tables(
+            "sqlite:///%s/db.sqlite" % folder,
+            acls=pagure.config.config.get("ACLS", {}),
+        )
+        populate(session, nb_projects, nb_users)
+
+        for name in backends:
+            configfile = os.path.join(folder, name, "gitolite.conf")
+            os.makedirs(os.path.dirname(configfile))
+            pagure.config.config["GITOLITE_CONFIG"] = configfile
+            helper = pagure.lib.git_auth.get_git_auth_helper(name)
+
+            full = timeit(
+                helper.write_gitolite_acls, session, configfile, project=-1
+            )
+            session.remove()
+            project = session.query(model.Project).get(nb_projects // 2)
+            single = timeit(
+                helper.write_gitolite_acls, session, configfile, project
+            )
+            print(
+                "%-20s %7d projects  full rebuild: %8.3fs  "
+                "one project: %8.4fs" % (name, nb_projects, full, single)
+            )
+        session.remove()
+    finally:
+        shutil.rmtree(folder)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument(
+        "--projects",
+        type=int,
+        action="append",
+        help="Number of projects to generate, can be repeated "
+        "(default: 10000 and 50000)",
+    )
+    parser.add_argument(
+        "--users", type=int, default=1000, help="Number of users to generate"
+    )
+    parser.add_argument(
+        "--backend",
+        action="append",
+        help="Git auth backend to benchmark, can be repeated "
+        "(default: gitolite3 and gitolite3_fragments)",
+    )
+    args = parser.parse_args()
+
+    backends = args.backend or ["gitolite3", "gitolite3_fragments"]
+    for nb_projects in args.projects or [10000, 50000]:
+        run(nb_projects, args.users, backends)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark the git smart-HTTP proxy.
+
+It creates a repository containing a large random blob, then times a clone
+(git-upload-pack) and a push (git-receive-pack) of it through
+``pagure.ui.clone.proxy_raw_git``, with the request body either buffered
+in a temporary file (the default) or streamed to git.
+
+The requests are sent by the git client through a WSGI server running in
+this process, so the numbers include the whole round-trip. As for the
+pagure application, the PAGURE_CONFIG environment variable must be set.
+
+Usage:
+    python benchmarks/bench_http_git.py --size 1024
+
+"""
+
+from __future__ import print_function, unicode_literals, absolute_import
+
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+)
+
+import flask  # noqa: E402
+import werkzeug.serving  # noqa: E402
+
+import pagure.config  # noqa: E402
+import pagure.lib.query  # noqa: E402
+import pagure.ui.clone  # noqa: E402
+
+
+class QuietHandler(werkzeug.serving.WSGIRequestHandler):
+    """Request handler not logging every request."""
+
+    def log_request(self, *args, **kwargs):
+        pass
+
+
+class FakeProject(object):
+    """The bits of a project proxy_raw_git uses."""
+
+    path = "bench.git"
+
+
+def make_app():
+    """Return a minimal flask application proxying every request to git."""
+    app = flask.Flask(__name__)
+
+    @app.route("/<path:path>", methods=["GET", "POST"])
+    def proxy(path):
+        return pagure.ui.clone.proxy_raw_git(FakeProject())
+
+    return app
+
+
+def git(*args, **kwargs):
+    """Run the specified git command."""
+    subprocess.check_call(
+        ("git",) + args,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        **kwargs
+    )
+
+
+def prepare(folder, size):
+    """Create the repository with a blob of the given size, in MiB."""
+    source = os.path.join(folder, "source")
+    git("init", "-q", source)
+    with open(os.path.join(source, "data.bin"), "wb") as stream:
+        for _ in range(size):
+            stream.write(os.urandom(1024 * 1024))
+    git("-C", source, "add", "data.bin")
+    git(
+        "-C",
+        source,
+        "-c",
+        "user.name=bench",
+        "-c",
+        "user.email=bench@example.com",
+        "commit",
+        "-q",
+        "-m",
+        "data",
+    )
+    return source
+
+
+def run(folder, source, streaming, buffer_size):
+    """Time a push and a clone through the proxy."""
+    repos = os.path.join(folder, "repos")
+    if os.path.exists(repos):
+        shutil.rmtree(repos)
+    git("init", "-q", "--bare", os.path.join(repos, "bench.git"))
+    git(
+        "-C",
+        os.path.join(repos, "bench.git"),
+        "config",
+        "http.receivepack",
+        "true",
+    )
+
+    pagure.config.config.update(
+        {
+            "GIT_FOLDER": repos,
+            "HTTP_REPO_ACCESS_GITOLITE": None,
+            "HTTP_REPO_ACCESS_STREAMING": streaming,
+            "HTTP_REPO_ACCESS_BUFFER_SIZE": buffer_size,
+        }
+    )
+
+    server = werkzeug.serving.make_server(
+        "127.0.0.1",
+        0,
+        make_app(),
+        threaded=True,
+        request_handler=QuietHandler,
+    )
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    url = "http://127.0.0.1:%s/bench.git" % server.server_port
+
+    try:
+        start = time.time()
+        git("-C", source, "push", "-q", url, "HEAD:refs/heads/master")
+        push = time.time() - start
+
+        clone = os.path.join(folder, "clone")
+        start = time.time()
+        git("clone", "-q", "--bare", url, clone)
+        pull = time.time() - start
+        shutil.rmtree(clone)
+    finally:
+        server.shutdown()
+        server.server_close()
+    return push, pull
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument(
+        "--size",
+        type=int,
+        default=1024,
+        help="Size of the pack to push and clone, in MiB (default: 1024)",
+    )
+    parser.add_argument(
+        "--buffer-size",
+        type=int,
+        default=64 * 1024,
+        help="Value of HTTP_REPO_ACCESS_BUFFER_SIZE (default: 65536)",
+    )
+    args = parser.parse_args()
+
+    folder = tempfile.mkdtemp(prefix="pagure-bench-http-")
+    try:
+        source = prepare(folder, args.size)
+        for streaming in (False, True):
+            push, pull = run(folder, source, streaming, args.buffer_size)
+            print(
+                "%-10s %6d MiB  push: %7.2fs (%7.1f MiB/s)  "
+                "clone: %7.2fs (%7.1f MiB/s)"
+                % (
+                    "streaming" if streaming else "spooled",
+                    args.size,
+                    push,
+                    args.size / push,
+                    pull,
+                    args.size / pull,
+                )
+            )
+    finally:
+        shutil.rmtree(folder)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark the sending of the email notifications.
+
+It starts a local SMTP server standing in for the actual one (aiosmtpd if it
+is installed, a minimal server of its own otherwise), which can wait a bit
+before greeting every new connection the way a remote server would, and
+sends a number of notifications, each to several recipients, timing:
+- a new connection to the SMTP server for every email (the former
+  behavior of send_email),
+- deliver_email keeping its connection open from one email to the next,
+  as the pagure_mail workers do.
+
+Usage:
+    python benchmarks/bench_mail.py --emails 200 --recipients 5
+    python benchmarks/bench_mail.py --connect-delay 0.05
+
+"""
+
+from __future__ import print_function, unicode_literals, absolute_import
+
+import argparse
+import os
+import sys
+import threading
+import time
+
+from six.moves.socketserver import StreamRequestHandler, TCPServer
+from six.moves.socketserver import ThreadingMixIn
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+)
+
+import pagure.config  # noqa: E402
+import pagure.lib.notify  # noqa: E402
+
+
+class Counter(object):
+    """What the SMTP server received."""
+
+    connections = 0
+    messages = 0
+    connect_delay = 0.0
+
+
+class Handler(StreamRequestHandler):
+    """Minimal SMTP server, accepting and dropping every message."""
+
+    def reply(self, line):
+        self.wfile.write(line.encode("ascii") + b"\r\n")
+
+    def handle(self):
+        Counter.connections += 1
+        time.sleep(Counter.connect_delay)
+        self.reply("220 localhost bench")
+        in_data = False
+        for line in self.rfile:
+            if in_data:
+                if line.rstrip(b"\r\n") == b".":
+                    in_data = False
+                    Counter.messages += 1
+                    self.reply("250 OK")
+                continue
+            command = line[:4].upper()
+            if command == b"EHLO":
+                self.reply("250-localhost")
+                self.reply("250 8BITMIME")
+            elif command == b"DATA":
+                in_data = True
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+            elif command == b"QUIT":
+                self.reply("221 Bye")
+                break
+            else:
+                self.reply("250 OK")
+
+
+class ThreadingServer(ThreadingMixIn, TCPServer):
+    """SMTP server answering every connection in its own thread."""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+def start_server():
+    """Start the stand-in SMTP server, return its port and a function
+    stopping it."""
+    try:
+        from aiosmtpd.controller import Controller
+    except ImportError:
+        server = ThreadingServer(("127.0.0.1", 0), Handler)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.daemon = True
+        thread.start()
+
+        def stop():
+            server.shutdown()
+            server.server_close()
+
+        return server.server_address[1], stop
+
+    class AioHandler(object):
+        async def handle_EHLO(self, server, session, envelope, hostname, rs):
+            Counter.connections += 1
+            time.sleep(Counter.connect_delay)
+            session.host_name = hostname
+            return rs
+
+        async def handle_DATA(self, server, session, envelope):
+            Counter.messages += 1
+            return "250 OK"
+
+    controller = Controller(AioHandler(), hostname="127.0.0.1", port=0)
+    controller.start()
+    return controller.server.sockets[0].getsockname()[1], controller.stop
+
+
+def send(nb_emails, to_mail, keep_connection):
+    """Send the emails, return the time it took."""
+    start = time.time()
+    for idx in range(nb_emails):
+        pagure.lib.notify.deliver_email(
+            "Content of the notification %s\n" % idx * 20,
+            "Notification %s" % idx,
+            to_mail,
+            mail_id="bench-%s" % idx,
+            project_name="namespace/project",
+            keep_connection=keep_connection,
+        )
+    return time.time() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument(
+        "--emails",
+        type=int,
+        default=200,
+        help="Number of emails to send (default: 200)",
+    )
+    parser.add_argument(
+        "--recipients",
+        type=int,
+        default=5,
+        help="Number of recipients of each email (default: 5)",
+    )
+    parser.add_argument(
+        "--connect-delay",
+        type=float,
+        default=0.01,
+        help="Time the SMTP server takes to greet a new connection "
+        "(default: 0.01)",
+    )
+    args = parser.parse_args()
+
+    Counter.connect_delay = args.connect_delay
+    port, stop = start_server()
+    pagure.config.config.update(
+        {
+            "EMAIL_SEND": True,
+            "SMTP_SERVER": "127.0.0.1",
+            "SMTP_PORT": port,
+            "SMTP_SSL": False,
+            "SMTP_STARTTLS": False,
+            "SMTP_USERNAME": None,
+            "SMTP_PASSWORD": None,
+        }
+    )
+    to_mail = ",".join(
+        "user%s@example.com" % idx for idx in range(args.recipients)
+    )
+    total = args.emails * args.recipients
+
+    try:
+        for label, keep_connection in (
+            ("connection per email:", False),
+            ("kept connection:     ", True),
+        ):
+            Counter.connections = Counter.messages = 0
+            duration = send(args.emails, to_mail, keep_connection)
+            print(
+                "%s %8.3fs  %7.1f msg/s  %5d connections  %6d received"
+                % (
+                    label,
+                    duration,
+                    total / duration,
+                    Counter.connections,
+                    Counter.messages,
+                )
+            )
+    finally:
+        smtp = getattr(pagure.lib.notify._SMTP, "connection", None)
+        if smtp is not None:
+            smtp.quit()
+        stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark the rendering of markdown by text2markdown.
+
+It renders the comments of a synthetic ticket (500 comments by default)
+the way the issue page does, and times:
+- a new markdown processor for every comment (the former behavior),
+- re-used markdown processors, without cache,
+- re-used markdown processors, with the rendered html cached, rendering
+  the ticket a second time.
+
+Usage:
+    python benchmarks/bench_markdown.py --comments 500
+
+"""
+
+from __future__ import print_function, unicode_literals, absolute_import
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+)
+
+import flask  # noqa: E402
+
+import pagure.config  # noqa: E402
+import pagure.lib.query  # noqa: E402
+
+
+SNIPPETS = [
+    "Thanks for the report, I can **reproduce** it on the latest version.",
+    "Could you try with the following configuration:\n\n"
+    "```\nDEBUG = True\nITEM_PER_PAGE = 48\n```\n",
+    "* first step\n* second step\n    * nested step\n* third step\n",
+    "| Version | Status |\n| --- | --- |\n| 5.12 | broken |\n"
+    "| 5.13 | fixed |\n",
+    "The documentation is at https://docs.pagure.org/pagure/ and the "
+    "[usage guide](https://docs.pagure.org/pagure/usage/) too.",
+    "> quoted from the previous comment\n\nI do not think so, _really_.",
+    "!!! note\n    This is an admonition block.\n",
+    "Line one\nline two\nline three with `inline code`.",
+]
+
+
+def make_comments(nb_comments):
+    """Return the text of the synthetic comments."""
+    rand = random.Random(42)
+    return [
+        "Comment %s\n\n%s"
+        % (idx, "\n\n".join(rand.sample(SNIPPETS, rand.randint(1, 4))))
+        for idx in range(nb_comments)
+    ]
+
+
+def render(comments):
+    """Render all the comments, return the time it took."""
+    start = time.time()
+    for comment in comments:
+        pagure.lib.query.text2markdown(comment)
+    return time.time() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument(
+        "--comments",
+        type=int,
+        default=500,
+        help="Number of comments of the ticket (default: 500)",
+    )
+    args = parser.parse_args()
+
+    comments = make_comments(args.comments)
+    app = flask.Flask(__name__)
+
+    with app.test_request_context("/test/issue/1"):
+        pagure.config.config["MARKDOWN_CACHE_SIZE"] = 0
+
+        # Drop the processors of this thread before every comment
+        start = time.time()
+        for comment in comments:
+            pagure.lib.query._MARKDOWN_PROCESSORS.__dict__.clear()
+            pagure.lib.query.text2markdown(comment)
+        print("new processor per comment: %8.3fs" % (time.time() - start))
+
+        print("re-used processors:        %8.3fs" % render(comments))
+
+        pagure.config.config["MARKDOWN_CACHE_SIZE"] = args.comments
+        pagure.lib.query._MARKDOWN_CACHE.clear()
+        print("cache, first render:       %8.3fs" % render(comments))
+        print("cache, second render:      %8.3fs" % render(comments))
+
+
+if __name__ == "__main__":
+    main()
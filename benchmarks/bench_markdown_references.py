@@ -0,0 +1,197 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark the rendering of the references of a markdown document.
+
+It creates a sqlite database holding two projects, some users and a number
+of issues, and renders a changelog-style document referencing a number of
+issues, pull-requests, issues of the other project and users (200 by
+default), reporting the time a render takes and the number of queries it
+runs:
+- looking up all the references of the document in bulk before rendering
+  it,
+- looking up each reference on its own as it is rendered, as was done
+  before.
+
+Usage:
+    python benchmarks/bench_markdown_references.py --references 200
+    python benchmarks/bench_markdown_references.py --renders 20
+
+"""
+
+from __future__ import print_function, unicode_literals, absolute_import
+
+import argparse
+import datetime
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+)
+
+import flask  # noqa: E402
+import sqlalchemy  # noqa: E402
+
+import pagure.config  # noqa: E402
+import pagure.flask_app  # noqa: E402
+import pagure.lib.model as model  # noqa: E402
+import pagure.lib.query  # noqa: E402
+import pagure.pfmarkdown  # noqa: E402
+
+
+class Counter(object):
+    """Number of queries run."""
+
+    queries = 0
+
+
+def count_query(conn, cursor, statement, parameters, context, many):
+    Counter.queries += 1
+
+
+def populate(session, nb_references):
+    """Insert the projects, users and issues in the database."""
+    users = []
+    for idx in range(nb_references // 5 + 1):
+        user = model.User(
+            user="user%s" % idx,
+            fullname="User %s" % idx,
+            default_email="user%s@example.com" % idx,
+            password="foo",
+        )
+        session.add(user)
+        users.append(user)
+    session.flush()
+
+    now = datetime.datetime.utcnow()
+    for name in ("test", "other"):
+        project = model.Project(
+            user_id=users[0].id,
+            name=name,
+            description="%s project" % name,
+            hook_token="%s-token" % name,
+        )
+        session.add(project)
+        session.flush()
+        for idx in range(nb_references):
+            session.add(
+                model.Issue(
+                    id=idx + 1,
+                    project_id=project.id,
+                    title="Issue #%s" % idx,
+                    content="Content of the issue %s" % idx,
+                    user_id=users[0].id,
+                    uid="%s-issue%s" % (name, idx),
+                    date_created=now,
+                    last_updated=now,
+                )
+            )
+    session.commit()
+
+
+def make_document(nb_references):
+    """Return a changelog-style document with the given number of
+    references."""
+    lines = []
+    for idx in range(nb_references):
+        kind = idx % 5
+        if kind in (0, 1):
+            ref = "#%s" % (idx + 1)
+        elif kind == 2:
+            # Not an issue, looked up as a pull-request
+            ref = "PR#%s" % (nb_references + idx + 1)
+        elif kind == 3:
+            ref = "other#%s" % (idx + 1)
+        else:
+            ref = "@user%s" % (idx // 5)
+        lines.append("* Fixed %s, reported upstream" % ref)
+    return "\n".join(lines)
+
+
+def render(app, session, text, nb_renders):
+    """Render the document, return the time a render took and the number
+    of queries it ran."""
+    with app.test_request_context("/test/issue/1"):
+        flask.g.session = session
+        pagure.lib.query.text2markdown(text)
+        Counter.queries = 0
+        start = time.time()
+        for _ in range(nb_renders):
+            session.expire_all()
+            pagure.lib.query.text2markdown(text)
+        duration = time.time() - start
+    return duration / nb_renders, Counter.queries / float(nb_renders)
+
+
+prefetch = pagure.pfmarkdown.References.prefetch
+
+
+def no_prefetch(self, text):
+    """Look up each reference on its own as it is rendered."""
+    self.reset()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument(
+        "--references",
+        type=int,
+        default=200,
+        help="Number of references in the document (default: 200)",
+    )
+    parser.add_argument(
+        "--renders",
+        type=int,
+        default=10,
+        help="Number of renders of the document (default: 10)",
+    )
+    args = parser.parse_args()
+
+    folder = tempfile.mkdtemp(prefix="pagure-bench-markdown-references-")
+    try:
+        dburl = "sqlite:///%s/db.sqlite" % folder
+        session = model.create_tables(
+            dburl, acls=pagure.config.config.get("ACLS", {})
+        )
+        model.create_default_status(session)
+        populate(session, args.references)
+        sqlalchemy.event.listen(
+            session.get_bind(), "before_cursor_execute", count_query
+        )
+
+        app = pagure.flask_app.create_app(
+            {
+                "DB_URL": dburl,
+                "GIT_FOLDER": os.path.join(folder, "repos"),
+                "EMAIL_SEND": False,
+                "MARKDOWN_CACHE_SIZE": 0,
+            }
+        )
+        pagure.config.config["MARKDOWN_CACHE_SIZE"] = 0
+        # The debug logs of the markdown patterns would dominate the timings
+        logging.disable(logging.INFO)
+        text = make_document(args.references)
+
+        for label, function in (
+            ("in bulk:", prefetch),
+            ("one at a time:", no_prefetch),
+        ):
+            pagure.pfmarkdown.References.prefetch = function
+            duration, queries = render(app, session, text, args.renders)
+            print(
+                "%-15s %8.2fms per render  %6.1f queries per render"
+                % (label, duration * 1000, queries)
+            )
+    finally:
+        pagure.pfmarkdown.References.prefetch = prefetch
+        shutil.rmtree(folder)
+
+
+if __name__ == "__main__":
+    main()
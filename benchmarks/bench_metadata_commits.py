@@ -0,0 +1,167 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark the commits of the JSON files of the tickets to their git repo.
+
+It creates a synthetic tickets git repository (50000 tickets by default)
+and times a number of ticket updates:
+- cloning the repository, writing the JSON file, committing it and pushing
+  it back (the former behavior of _update_git),
+- committing each JSON file directly to the bare repository, building the
+  new tree from the current one (DIRECT_METADATA_COMMITS),
+- committing all the updates at once, as when several of them are pending
+  for the repository.
+
+Usage:
+    python benchmarks/bench_metadata_commits.py --tickets 50000 --updates 20
+
+"""
+
+from __future__ import print_function, unicode_literals, absolute_import
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import uuid
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+)
+
+import pygit2  # noqa: E402
+
+import pagure.lib.git  # noqa: E402
+
+
+def ticket_json(uid, idx, title):
+    """Return the content of the JSON file of a synthetic ticket."""
+    return json.dumps(
+        {
+            "id": idx,
+            "uid": uid,
+            "title": title,
+            "content": "Content of the ticket %s\n" % idx * 10,
+            "status": "Open",
+            "comments": [],
+        },
+        sort_keys=True,
+        indent=4,
+        separators=(",", ": "),
+    ).encode("utf-8")
+
+
+def make_repo(path, nb_tickets):
+    """Create a bare tickets repository, return the uids of its tickets."""
+    repo = pygit2.init_repository(path, bare=True)
+    builder = repo.TreeBuilder()
+    uids = []
+    for idx in range(nb_tickets):
+        uid = uuid.uuid4().hex
+        uids.append(uid)
+        builder.insert(
+            uid,
+            repo.create_blob(ticket_json(uid, idx, "Ticket %s" % idx)),
+            pygit2.GIT_FILEMODE_BLOB,
+        )
+    author = pygit2.Signature("pagure", "pagure")
+    repo.create_commit(
+        "refs/heads/master", author, author, "Import", builder.write(), []
+    )
+    return uids
+
+
+def clone_commit_push(repopath, uid, content):
+    """Update a ticket the former way, in a clone pushed back."""
+    clonepath = tempfile.mkdtemp(prefix="bench-metadata-clone-")
+    try:
+        repo = pygit2.clone_repository(repopath, clonepath)
+        with open(os.path.join(clonepath, uid), "wb") as stream:
+            stream.write(content)
+        repo.index.add(uid)
+        repo.index.write()
+        author = pygit2.Signature("pagure", "pagure")
+        repo.create_commit(
+            "refs/heads/master",
+            author,
+            author,
+            "Updated issue %s" % uid,
+            repo.index.write_tree(),
+            [repo.head.target],
+        )
+        pagure.lib.git.read_git_lines(["push", "origin", "master"], clonepath)
+    finally:
+        shutil.rmtree(clonepath)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument(
+        "--tickets",
+        type=int,
+        default=50000,
+        help="Number of tickets in the repository (default: 50000)",
+    )
+    parser.add_argument(
+        "--updates",
+        type=int,
+        default=20,
+        help="Number of tickets updated (default: 20)",
+    )
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench-metadata-")
+    try:
+        repopath = os.path.join(workdir, "tickets.git")
+        start = time.time()
+        uids = make_repo(repopath, args.tickets)
+        print(
+            "repository of %d tickets created in %.2fs"
+            % (args.tickets, time.time() - start)
+        )
+        updated = uids[: args.updates]
+
+        start = time.time()
+        for idx, uid in enumerate(updated):
+            clone_commit_push(repopath, uid, ticket_json(uid, idx, "Clone"))
+        clone = time.time() - start
+
+        start = time.time()
+        for idx, uid in enumerate(updated):
+            pagure.lib.git._commit_files(
+                repopath,
+                {uid: ticket_json(uid, idx, "Direct")},
+                "Updated issue %s" % uid,
+            )
+        direct = time.time() - start
+
+        start = time.time()
+        pagure.lib.git._commit_files(
+            repopath,
+            dict(
+                (uid, ticket_json(uid, idx, "Batched"))
+                for idx, uid in enumerate(updated)
+            ),
+            "Updated %d objects" % len(updated),
+        )
+        batched = time.time() - start
+
+        for label, duration in (
+            ("clone, commit and push:", clone),
+            ("direct commit:", direct),
+            ("single batched commit:", batched),
+        ):
+            print(
+                "%-24s %8.3fs  %8.4fs per update"
+                % (label, duration, duration / len(updated))
+            )
+    finally:
+        shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    main()
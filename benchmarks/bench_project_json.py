@@ -0,0 +1,217 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark the parsing of the JSON text columns of the projects.
+
+It creates a sqlite database holding a project with its settings, a number
+of milestones, priorities, close status, reports and quick replies as well
+as a number of issues (100 by default), and renders its list of issues a
+number of times, reporting the time a render takes and how many times
+json.loads was called for it, as well as the time reading some of these
+properties a number of times takes on its own:
+- with the parsed values of the JSON text columns cached on the project,
+- parsing the columns on every access, as was done before.
+
+Usage:
+    python benchmarks/bench_project_json.py --issues 100 --renders 50
+
+"""
+
+from __future__ import print_function, unicode_literals, absolute_import
+
+import argparse
+import datetime
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+)
+
+import pygit2  # noqa: E402
+
+import pagure.config  # noqa: E402
+import pagure.flask_app  # noqa: E402
+import pagure.lib.model as model  # noqa: E402
+
+
+class CountingJson(object):
+    """Stand-in for the json module used by pagure.lib.model, counting the
+    calls to json.loads."""
+
+    calls = 0
+
+    def __getattr__(self, name):
+        return getattr(json, name)
+
+    def loads(self, *args, **kwargs):
+        CountingJson.calls += 1
+        return json.loads(*args, **kwargs)
+
+
+def populate(session, nb_issues):
+    """Insert the project, its metadata and its issues in the database."""
+    user = model.User(
+        user="pingou",
+        fullname="PY C",
+        default_email="bar@pingou.com",
+        password="foo",
+    )
+    session.add(user)
+    session.flush()
+
+    project = model.Project(
+        user_id=user.id,
+        name="test",
+        description="test project",
+        hook_token="aaabbbccc",
+    )
+    project.settings = {"issue_tracker": True, "Web-hooks": None}
+    project.milestones = dict(
+        ("v%s.0" % idx, {"date": "2030-%02d-01" % (idx % 12 + 1)})
+        for idx in range(20)
+    )
+    project.milestones_keys = ["v%s.0" % idx for idx in range(20)]
+    project.priorities = {
+        "": "",
+        "1": "High",
+        "2": "Normal",
+        "3": "Low",
+    }
+    project.close_status = ["Invalid", "Insufficient data", "Fixed", "Dup"]
+    project.reports = {
+        "report%s" % idx: {"status": "Open", "tags": ["tag%s" % idx]}
+        for idx in range(5)
+    }
+    project.quick_replies = ["Thanks!", "Please attach the logs."]
+    session.add(project)
+    session.flush()
+
+    now = datetime.datetime.utcnow()
+    for idx in range(nb_issues):
+        session.add(
+            model.Issue(
+                id=idx + 1,
+                project_id=project.id,
+                title="Issue #%s" % idx,
+                content="Content of the issue %s" % idx,
+                user_id=user.id,
+                uid="issue%s" % idx,
+                milestone="v%s.0" % (idx % 20),
+                priority=idx % 3 + 1,
+                date_created=now,
+                last_updated=now,
+            )
+        )
+    session.commit()
+
+
+def uncached_get_json(self, name, default, convert=None):
+    """Parse the JSON text column on every access."""
+    self.__dict__.pop("_json_cache", None)
+    return cached_get_json(self, name, default, convert)
+
+
+cached_get_json = model.Project._get_json
+
+
+def render(client, nb_renders):
+    """Render the list of issues, return the time a render took and the
+    number of calls to json.loads it made."""
+    client.get("/test/issues")
+    CountingJson.calls = 0
+    start = time.time()
+    for _ in range(nb_renders):
+        output = client.get("/test/issues")
+        assert output.status_code == 200, output.status_code
+    duration = time.time() - start
+    return duration / nb_renders, CountingJson.calls / float(nb_renders)
+
+
+def access(session, nb_accesses):
+    """Read some of the JSON properties of the project a number of times,
+    return the time it took."""
+    project = session.query(model.Project).filter_by(name="test").one()
+    start = time.time()
+    for _ in range(nb_accesses):
+        project.settings.get("issue_tracker")
+        project.milestones
+        project.priorities
+        project.close_status
+    return time.time() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument(
+        "--issues",
+        type=int,
+        default=100,
+        help="Number of issues of the project (default: 100)",
+    )
+    parser.add_argument(
+        "--renders",
+        type=int,
+        default=50,
+        help="Number of renders of the list of issues (default: 50)",
+    )
+    parser.add_argument(
+        "--accesses",
+        type=int,
+        default=25,
+        help="Number of reads of the settings, milestones, priorities and "
+        "close status of the project timed on their own (default: 25)",
+    )
+    args = parser.parse_args()
+
+    folder = tempfile.mkdtemp(prefix="pagure-bench-project-json-")
+    try:
+        dburl = "sqlite:///%s/db.sqlite" % folder
+        session = model.create_tables(
+            dburl, acls=pagure.config.config.get("ACLS", {})
+        )
+        model.create_default_status(session)
+        populate(session, args.issues)
+        pygit2.init_repository(
+            os.path.join(folder, "repos", "test.git"), bare=True
+        )
+
+        app = pagure.flask_app.create_app(
+            {
+                "DB_URL": dburl,
+                "GIT_FOLDER": os.path.join(folder, "repos"),
+                "EMAIL_SEND": False,
+            }
+        )
+        client = app.test_client()
+        model.json = CountingJson()
+
+        for label, get_json in (
+            ("cached:  ", cached_get_json),
+            ("uncached:", uncached_get_json),
+        ):
+            model.Project._get_json = get_json
+            duration, calls = render(client, args.renders)
+            print(
+                "%s %8.2fms per render  %6.1f json.loads per render  "
+                "%8.2fms for the reads"
+                % (
+                    label,
+                    duration * 1000,
+                    calls,
+                    access(session, args.accesses) * 1000,
+                )
+            )
+    finally:
+        model.Project._get_json = cached_get_json
+        model.json = json
+        shutil.rmtree(folder)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark the rendering of the documents to HTML.
+
+It renders every document (reStructuredText, markdown and text files) of a
+folder, the doc/ folder of pagure by default, a number of times, as the
+docs server and the front page of the projects do, and times it:
+- rendering the documents every time, as was done before,
+- caching the documents rendered in the process (RENDERED_CACHE_SIZE),
+- caching them in a shared cache only, as when each view is served by
+  another process (RENDERED_CACHE_BACKEND).
+The caches are filled by a first view of the documents, which is not timed.
+
+Usage:
+    python benchmarks/bench_rendered_docs.py --views 5
+    python benchmarks/bench_rendered_docs.py --backend redis
+    python benchmarks/bench_rendered_docs.py --folder /path/to/docs
+
+"""
+
+from __future__ import print_function, unicode_literals, absolute_import
+
+import argparse
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+)
+
+import pygit2  # noqa: E402
+
+import pagure.config  # noqa: E402
+import pagure.doc_utils  # noqa: E402
+
+DOC_FOLDER = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "doc"
+)
+
+
+def list_documents(folder):
+    """Return the path, extension, content and blob identifier of every
+    document of the folder."""
+    documents = []
+    for root, dirs, files in os.walk(folder):
+        dirs[:] = [name for name in dirs if not name.startswith(("_", "."))]
+        for name in sorted(files):
+            ext = os.path.splitext(name)[1]
+            if not pagure.doc_utils._get_renderer(ext):
+                continue
+            path = os.path.join(root, name)
+            with open(path, "rb") as stream:
+                data = stream.read()
+            documents.append((path, ext, data, pygit2.hash(data).hex))
+    return documents
+
+
+def render(documents, views, clear_process_cache=False):
+    """Render every document the given number of times, return how long it
+    took."""
+    start = time.time()
+    for _ in range(views):
+        if clear_process_cache:
+            pagure.doc_utils._RENDERED_CACHE.clear()
+        for _path, ext, data, blob_id in documents:
+            pagure.doc_utils.convert_readme(data, ext, blob_id=blob_id)
+    return time.time() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument(
+        "--folder",
+        default=DOC_FOLDER,
+        help="Folder of the documents to render (default: the doc/ folder "
+        "of pagure)",
+    )
+    parser.add_argument(
+        "--views",
+        type=int,
+        default=5,
+        help="Number of views of each document (default: 5)",
+    )
+    parser.add_argument(
+        "--backend",
+        choices=["disk", "redis"],
+        default="disk",
+        help="Shared cache to use, redis uses REDIS_HOST, REDIS_PORT and "
+        "REDIS_DB of the configuration (default: disk)",
+    )
+    args = parser.parse_args()
+
+    # The warnings of docutils about the sphinx directives are not relevant
+    logging.disable(logging.WARNING)
+    documents = list_documents(args.folder)
+    print(
+        "%d documents, %.1fKiB, viewed %d times"
+        % (
+            len(documents),
+            sum(len(doc[2]) for doc in documents) / 1024.0,
+            args.views,
+        )
+    )
+
+    config = pagure.config.config
+    folder = tempfile.mkdtemp(prefix="bench-rendered-docs-")
+    try:
+        config["MARKDOWN_CACHE_SIZE"] = 0
+        config["RENDERED_CACHE_SIZE"] = 0
+        config["RENDERED_CACHE_BACKEND"] = None
+        uncached = render(documents, args.views)
+
+        # The caches are filled by a first view of the documents, not timed
+        config["RENDERED_CACHE_SIZE"] = len(documents)
+        render(documents, 1)
+        in_process = render(documents, args.views)
+
+        config["RENDERED_CACHE_BACKEND"] = args.backend
+        config["RENDERED_CACHE_FOLDER"] = folder
+        render(documents, 1, clear_process_cache=True)
+        shared = render(documents, args.views, clear_process_cache=True)
+
+        for label, duration in (
+            ("not cached:", uncached),
+            ("in-process cache:", in_process),
+            ("%s cache:" % args.backend, shared),
+        ):
+            print(
+                "%-18s %8.3fs  %8.3fms per view"
+                % (
+                    label,
+                    duration,
+                    duration * 1000 / (len(documents) * args.views),
+                )
+            )
+    finally:
+        shutil.rmtree(folder)
+
+
+if __name__ == "__main__":
+    main()
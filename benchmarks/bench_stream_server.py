@@ -0,0 +1,199 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Load test the EventSource server with simulated clients.
+
+It connects a number of simulated clients (10000 by default) following a
+number of objects, publishes messages about random objects to redis and
+reports the time it took for the messages to reach the clients, as well as
+the memory used. The clients are fed either from a single subscription
+shared by all of them (EVENTSOURCE_MULTIPLEX) or from a subscription of
+their own, polled every second.
+
+By default, redis is simulated in this process with fakeredis, use
+--redis-url to run against an actual redis server.
+
+Usage:
+    python benchmarks/bench_stream_server.py --clients 10000 --messages 200
+    python benchmarks/bench_stream_server.py --mode polling --clients 1000
+
+"""
+
+from __future__ import print_function, unicode_literals, absolute_import
+
+import argparse
+import os
+import random
+import resource
+import sys
+import threading
+import time
+import tracemalloc
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+)
+sys.path.insert(
+    0,
+    os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), "..", "pagure-ev"
+    ),
+)
+
+import redis  # noqa: E402
+import trololio  # noqa: E402
+
+import pagure_stream_server as pss  # noqa: E402
+
+
+class FakeWriter(object):
+    """Stream writer of a simulated client, recording how long the messages
+    took to reach it."""
+
+    latencies = []
+    pings = [0]
+
+    def write(self, data):
+        now = time.time()
+        data = data.decode("utf-8")
+        if data.startswith("data: "):
+            # The polling mode sends the repr of the bytes from redis
+            sent = data[len("data: ") :].strip().strip("b'")
+            self.latencies.append(now - float(sent))
+        else:
+            self.pings[0] += 1
+
+    def drain(self):
+        return trololio.asyncio.sleep(0)
+
+
+def get_pool(redis_url):
+    """Return the pool of connections to redis to use."""
+    if redis_url:
+        return redis.ConnectionPool.from_url(redis_url)
+
+    import fakeredis
+
+    return redis.ConnectionPool(
+        connection_class=fakeredis.FakeConnection,
+        server=fakeredis.FakeServer(),
+    )
+
+
+def publish(pool, nb_objects, nb_messages, interval):
+    """Publish messages about random objects, with the time they were sent
+    as content."""
+    conn = redis.Redis(connection_pool=pool)
+    rand = random.Random(42)
+    for _ in range(nb_messages):
+        uid = "obj%s" % rand.randrange(nb_objects)
+        conn.publish("pagure.%s" % uid, "%.6f" % time.time())
+        time.sleep(interval)
+
+
+def percentile(values, ratio):
+    """Return the given percentile of the sorted values."""
+    return values[min(int(len(values) * ratio), len(values) - 1)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument(
+        "--clients",
+        type=int,
+        default=10000,
+        help="Number of simulated clients (default: 10000)",
+    )
+    parser.add_argument(
+        "--objects",
+        type=int,
+        default=1000,
+        help="Number of objects the clients follow (default: 1000)",
+    )
+    parser.add_argument(
+        "--messages",
+        type=int,
+        default=200,
+        help="Number of messages to publish (default: 200)",
+    )
+    parser.add_argument(
+        "--interval",
+        type=float,
+        default=0.01,
+        help="Time between two messages, in seconds (default: 0.01)",
+    )
+    parser.add_argument(
+        "--mode",
+        choices=["multiplexed", "polling"],
+        default="multiplexed",
+        help="How the clients get their messages (default: multiplexed)",
+    )
+    parser.add_argument(
+        "--redis-url", help="URL of the redis server to use, if not simulated"
+    )
+    args = parser.parse_args()
+
+    pss.POOL = get_pool(args.redis_url)
+    loop = trololio.asyncio.get_event_loop()
+    if args.mode == "multiplexed":
+        follow = pss._follow_multiplexed
+        reader = threading.Thread(
+            target=pss.read_messages,
+            args=(loop, redis.Redis(connection_pool=pss.POOL)),
+        )
+        reader.daemon = True
+        reader.start()
+        pss.PING_WHEEL.start(loop)
+    else:
+        follow = pss._follow_polling
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    for idx in range(args.clients):
+        trololio.asyncio.ensure_future(
+            follow("obj%s" % (idx % args.objects), FakeWriter()), loop=loop
+        )
+    loop.run_until_complete(trololio.asyncio.sleep(2))
+    memory = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+
+    publisher = threading.Thread(
+        target=publish,
+        args=(pss.POOL, args.objects, args.messages, args.interval),
+    )
+    start = time.time()
+    publisher.start()
+    while publisher.is_alive():
+        loop.run_until_complete(trololio.asyncio.sleep(0.5))
+    loop.run_until_complete(trololio.asyncio.sleep(2))
+    duration = time.time() - start
+
+    latencies = sorted(FakeWriter.latencies)
+    print("mode:           %s" % args.mode)
+    print("clients:        %d" % args.clients)
+    print(
+        "memory:         %.1f MiB (%.1f KiB per client)"
+        % (memory / 1024.0 / 1024, memory / 1024.0 / args.clients)
+    )
+    print(
+        "max rss:        %.1f MiB"
+        % (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0)
+    )
+    print("cpu time:       %.2fs over %.2fs" % (time.process_time(), duration))
+    print("deliveries:     %d" % len(latencies))
+    print("pings:          %d" % FakeWriter.pings[0])
+    if latencies:
+        print(
+            "latency:        p50 %.4fs  p95 %.4fs  p99 %.4fs  max %.4fs"
+            % (
+                percentile(latencies, 0.5),
+                percentile(latencies, 0.95),
+                percentile(latencies, 0.99),
+                latencies[-1],
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark the delivery of the web-hooks notifications.
+
+It starts a local HTTP server standing in for the receivers of the
+web-hooks: some answer right away, some answer slowly and some fail with a
+server error. It then sends a number of notifications to a project with
+web-hooks pointing to them and times:
+- posting to every URL one after the other, with a new connection each
+  time (the former behavior),
+- call_web_hooks, fanning out to the URLs concurrently over pooled
+  connections, with retries.
+
+Usage:
+    python benchmarks/bench_webhooks.py --notifications 20 --delay 0.5
+
+"""
+
+from __future__ import print_function, unicode_literals, absolute_import
+
+import argparse
+import os
+import sys
+import threading
+import time
+
+from six.moves.BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+from six.moves.socketserver import ThreadingMixIn
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+)
+
+import requests  # noqa: E402
+
+import pagure.config  # noqa: E402
+import pagure.lib.tasks_services  # noqa: E402
+
+
+class ThreadingServer(ThreadingMixIn, HTTPServer):
+    """HTTP server answering every request in its own thread."""
+
+    daemon_threads = True
+
+
+class Handler(BaseHTTPRequestHandler):
+    """Stand-in receiver of the web-hooks, its behavior depends on the
+    path requested: /fast, /slow or /fail."""
+
+    protocol_version = "HTTP/1.1"
+    delay = 0.5
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        if self.path.startswith("/slow"):
+            time.sleep(self.delay)
+        status = 500 if self.path.startswith("/fail") else 200
+        self.send_response(status)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+class FakeProject(object):
+    """The bits of a project call_web_hooks uses."""
+
+    fullname = "bench"
+    hook_token = "aaabbbccc"
+
+
+def sequential(project, topic, msg, urls):
+    """Post to every URL one after the other, the former behavior."""
+    for url in sorted(urls):
+        try:
+            requests.post(url, data="{}", timeout=60)
+        except Exception:
+            pass
+
+
+def run(function, urls, nb_notifications):
+    """Send the notifications, return the time it took."""
+    start = time.time()
+    for idx in range(nb_notifications):
+        function(FakeProject(), "bench.topic", {"idx": idx}, urls)
+    return time.time() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument(
+        "--notifications",
+        type=int,
+        default=20,
+        help="Number of notifications to send (default: 20)",
+    )
+    parser.add_argument(
+        "--delay",
+        type=float,
+        default=0.5,
+        help="Time the slow receivers take to answer (default: 0.5)",
+    )
+    parser.add_argument(
+        "--fast", type=int, default=6, help="Number of fast receivers"
+    )
+    parser.add_argument(
+        "--slow", type=int, default=3, help="Number of slow receivers"
+    )
+    parser.add_argument(
+        "--failing", type=int, default=1, help="Number of failing receivers"
+    )
+    args = parser.parse_args()
+
+    Handler.delay = args.delay
+    server = ThreadingServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+
+    base = "http://127.0.0.1:%s" % server.server_port
+    urls = (
+        ["%s/fast/%s" % (base, idx) for idx in range(args.fast)]
+        + ["%s/slow/%s" % (base, idx) for idx in range(args.slow)]
+        + ["%s/fail/%s" % (base, idx) for idx in range(args.failing)]
+    )
+
+    pagure.config.config.update(
+        {"WEBHOOK_RETRIES": 2, "WEBHOOK_RETRY_BACKOFF": 0.1}
+    )
+    try:
+        print(
+            "sequential, new connections: %8.3fs"
+            % run(sequential, urls, args.notifications)
+        )
+        pagure.lib.tasks_services.WEBHOOK_STATS.clear()
+        print(
+            "concurrent, pooled, retries: %8.3fs"
+            % run(
+                pagure.lib.tasks_services.call_web_hooks,
+                urls,
+                args.notifications,
+            )
+        )
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    print()
+    print(
+        "%-40s %6s %8s %10s %10s" % ("url", "calls", "failures", "avg", "max")
+    )
+    for url, stats in sorted(pagure.lib.tasks_services.WEBHOOK_STATS.items()):
+        print(
+            "%-40s %6d %8d %9.4fs %9.4fs"
+            % (
+                url,
+                stats["count"],
+                stats["failures"],
+                stats["total_time"] / stats["count"],
+                stats["max_time"],
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -21,8 +21,13 @@ nc localhost 8080
 
 from __future__ import unicode_literals, absolute_import
 
+import collections
+import concurrent.futures
+import functools
 import logging
 import os
+import threading
+import time
 
 
 import redis
@@ -52,6 +57,21 @@ POOL = redis.ConnectionPool(
     port=pagure.config.config["REDIS_PORT"],
     db=pagure.config.config["REDIS_DB"],
 )
+# Queues of the connected clients, per uid of the object they follow, when
+# all the messages are read from a single subscription (EVENTSOURCE_MULTIPLEX)
+CLIENTS = {}
+# Number of seconds between two pings sent to a client
+PING_INTERVAL = 5
+# Maximum number of messages waiting to be sent to a client
+CLIENT_QUEUE_SIZE = 100
+# Threads running the database queries, off the event loop
+EXECUTOR = concurrent.futures.ThreadPoolExecutor(
+    max_workers=pagure.config.config.get("EVENTSOURCE_DB_WORKERS", 4)
+)
+# Result of the resolution of the paths requested, see resolve_path
+_PATH_CACHE = collections.OrderedDict()
+# Resolutions of paths currently running in the executor
+_PATH_PENDING = {}
 
 
 def _get_session():
@@ -115,8 +135,7 @@ OBJECTS = {"issue": _get_issue, "pull-request": _get_pull_request}
 
 
 def get_obj_from_path(path):
-    """ Return the Ticket or Request object based on the path provided.
-    """
+    """Return the Ticket or Request object based on the path provided."""
     (username, namespace, reponame, objtype, objid) = pagure.utils.parse_path(
         path
     )
@@ -137,6 +156,216 @@ def get_obj_from_path(path):
     return getfunc(repo, objid)
 
 
+def _lookup_path(path):
+    """Return the uid of the object at the specified path, or None and the
+    reason why it can not be followed.
+
+    This runs in the executor, using a database session of its own.
+    """
+    session = _get_session()
+    try:
+        return get_obj_from_path(path).uid, None
+    except PagureEvException as err:
+        return None, "%s" % err
+    finally:
+        session.remove()
+
+
+def _store_path(path, future):
+    """Keep the result of the resolution of a path in the cache."""
+    _PATH_PENDING.pop(path, None)
+    if future.cancelled() or future.exception() is not None:
+        return
+
+    ttl = pagure.config.config.get("EVENTSOURCE_CACHE_TTL", 60)
+    _PATH_CACHE[path] = (time.time() + ttl, future.result())
+    while len(_PATH_CACHE) > pagure.config.config.get(
+        "EVENTSOURCE_CACHE_SIZE", 10000
+    ):
+        _PATH_CACHE.popitem(last=False)
+
+
+@trololio.coroutine
+def resolve_path(path):
+    """Return the uid of the object at the specified path, without blocking
+    the event loop.
+
+    The database is queried in the executor and the result is kept in an
+    LRU cache for ``EVENTSOURCE_CACHE_TTL`` seconds, so the clients opening
+    the same ticket at the same time only query it once.
+
+    :raises PagureEvException: if the object can not be followed
+
+    """
+    entry = _PATH_CACHE.pop(path, None)
+    if entry is not None and entry[0] > time.time():
+        _PATH_CACHE[path] = entry
+        uid, error = entry[1]
+    else:
+        future = _PATH_PENDING.get(path)
+        if future is None:
+            loop = trololio.asyncio.get_event_loop()
+            future = loop.run_in_executor(EXECUTOR, _lookup_path, path)
+            future.add_done_callback(functools.partial(_store_path, path))
+            _PATH_PENDING[path] = future
+        uid, error = yield trololio.From(trololio.asyncio.shield(future))
+
+    if error is not None:
+        raise PagureEvException(error)
+    raise trololio.Return(uid)
+
+
+def _queue_message(queue, message):
+    """Queue the message for a client, unless it has too many of them
+    waiting already."""
+    try:
+        queue.put_nowait(message)
+    except trololio.asyncio.QueueFull:
+        log.warning("Client queue full, dropping message")
+
+
+class PingWheel(object):
+    """Timer wheel sending a ping to every client once every
+    ``PING_INTERVAL`` seconds.
+
+    The clients are spread over ``PING_INTERVAL`` slots and a single timer
+    pings the clients of the next slot every second, instead of every
+    client sleeping on its own.
+    """
+
+    def __init__(self, size=PING_INTERVAL):
+        self.slots = [set() for _ in range(size)]
+        self.current = 0
+
+    def add(self, queue):
+        """Add the queue of a client to the wheel, return its slot."""
+        self.slots[self.current].add(queue)
+        return self.current
+
+    def remove(self, queue, slot):
+        """Remove the queue of a client from the wheel."""
+        self.slots[slot].discard(queue)
+
+    def tick(self):
+        """Move to the next slot and ping its clients."""
+        self.current = (self.current + 1) % len(self.slots)
+        for queue in self.slots[self.current]:
+            _queue_message(queue, None)
+
+    def start(self, loop):
+        """Tick every second in the specified event loop."""
+
+        def _tick():
+            self.tick()
+            loop.call_later(1, _tick)
+
+        loop.call_later(1, _tick)
+
+
+PING_WHEEL = PingWheel()
+
+
+def dispatch_message(message):
+    """Queue a message received on the shared subscription for the clients
+    following the object it is about."""
+    channel = message["channel"]
+    data = message["data"]
+    if isinstance(channel, bytes):
+        channel = channel.decode("utf-8")
+    if isinstance(data, bytes):
+        data = data.decode("utf-8")
+
+    uid = channel[len("pagure.") :]
+    for queue in CLIENTS.get(uid, ()):
+        _queue_message(queue, data)
+
+
+def read_messages(loop, conn):
+    """Read all the messages sent to redis for the clients, through a single
+    pattern subscription, and dispatch them in the event loop.
+
+    This blocks and is meant to run in its own thread.
+    """
+    while True:
+        subscriber = conn.pubsub(ignore_subscribe_messages=True)
+        try:
+            subscriber.psubscribe("pagure.*")
+            for message in subscriber.listen():
+                if message["type"] == "pmessage":
+                    loop.call_soon_threadsafe(dispatch_message, message)
+        except redis.RedisError:
+            log.exception("ERROR: Lost the connection to redis")
+        except Exception:
+            # Never let the thread die, the clients would stop receiving
+            # messages while the server keeps accepting them
+            log.exception("ERROR: Failed to read the messages from redis")
+        finally:
+            try:
+                subscriber.close()
+            except Exception:
+                log.exception("ERROR: Failed to close the subscription")
+        # Subscribe again, after a while in case redis is not reachable
+        time.sleep(1)
+
+
+@trololio.coroutine
+def _follow_multiplexed(uid, client_writer):
+    """Send to the client the messages about the specified object, as
+    dispatched from the shared subscription."""
+    queue = trololio.asyncio.Queue(maxsize=CLIENT_QUEUE_SIZE)
+    CLIENTS.setdefault(uid, set()).add(queue)
+    slot = PING_WHEEL.add(queue)
+
+    try:
+        while True:
+            data = yield trololio.From(queue.get())
+            if data is None:
+                # Send a ping to see if the client is still alive
+                client_writer.write(("event: ping\n\n").encode())
+            else:
+                log.info("Sending %s", data)
+                client_writer.write(("data: %s\n\n" % data).encode())
+            yield trololio.From(client_writer.drain())
+    finally:
+        PING_WHEEL.remove(queue, slot)
+        queues = CLIENTS.get(uid)
+        if queues is not None:
+            queues.discard(queue)
+            if not queues:
+                del CLIENTS[uid]
+
+
+@trololio.coroutine
+def _follow_polling(uid, client_writer):
+    """Send to the client the messages about the specified object, polling
+    a subscription of its own."""
+    conn = redis.Redis(connection_pool=POOL)
+    subscriber = conn.pubsub(ignore_subscribe_messages=True)
+
+    try:
+        subscriber.subscribe("pagure.%s" % uid)
+
+        # Inside a while loop, wait for incoming events.
+        oncall = 0
+        while True:
+            msg = subscriber.get_message()
+            if msg is None:
+                # Send a ping to see if the client is still alive
+                if oncall >= PING_INTERVAL:
+                    # Only send a ping once every 5 seconds
+                    client_writer.write(("event: ping\n\n").encode())
+                    oncall = 0
+                oncall += 1
+                yield trololio.From(client_writer.drain())
+                yield trololio.From(trololio.asyncio.sleep(1))
+            else:
+                log.info("Sending %s", msg["data"])
+                client_writer.write(("data: %s\n\n" % msg["data"]).encode())
+                yield trololio.From(client_writer.drain())
+    finally:
+        subscriber.close()
+
+
 @trololio.coroutine
 def handle_client(client_reader, client_writer):
     data = None
@@ -168,9 +397,9 @@ def handle_client(client_reader, client_writer):
     url = urlparse(data[1])
 
     try:
-        obj = get_obj_from_path(url.path)
+        uid = yield trololio.From(resolve_path(url.path))
     except PagureException as err:
-        log.warning(err.message)
+        log.warning("%s", err)
         return
 
     origin = pagure.config.config.get("APP_URL")
@@ -187,30 +416,13 @@ def handle_client(client_reader, client_writer):
         ).encode()
     )
 
-    conn = redis.Redis(connection_pool=POOL)
-    subscriber = conn.pubsub(ignore_subscribe_messages=True)
+    if pagure.config.config.get("EVENTSOURCE_MULTIPLEX", False):
+        follow = _follow_multiplexed
+    else:
+        follow = _follow_polling
 
     try:
-        subscriber.subscribe("pagure.%s" % obj.uid)
-
-        # Inside a while loop, wait for incoming events.
-        oncall = 0
-        while True:
-            msg = subscriber.get_message()
-            if msg is None:
-                # Send a ping to see if the client is still alive
-                if oncall >= 5:
-                    # Only send a ping once every 5 seconds
-                    client_writer.write(("event: ping\n\n").encode())
-                    oncall = 0
-                oncall += 1
-                yield trololio.From(client_writer.drain())
-                yield trololio.From(trololio.asyncio.sleep(1))
-            else:
-                log.info("Sending %s", msg["data"])
-                client_writer.write(("data: %s\n\n" % msg["data"]).encode())
-                yield trololio.From(client_writer.drain())
-
+        yield trololio.From(follow(uid, client_writer))
     except OSError:
         log.info("Client closed connection")
     except trololio.ConnectionResetError as err:
@@ -221,7 +433,6 @@ def handle_client(client_reader, client_writer):
     finally:
         # Wathever happens, close the connection.
         log.info("Client left. Goodbye!")
-        subscriber.close()
         client_writer.close()
 
 
@@ -259,6 +470,14 @@ def main():
         log.info(
             "Serving server at {}".format(SERVER.sockets[0].getsockname())
         )
+        if pagure.config.config.get("EVENTSOURCE_MULTIPLEX", False):
+            reader = threading.Thread(
+                target=read_messages,
+                args=(loop, redis.Redis(connection_pool=POOL)),
+            )
+            reader.daemon = True
+            reader.start()
+            PING_WHEEL.start(loop)
         if pagure.config.config.get("EV_STATS_PORT"):
             stats_coro = trololio.asyncio.start_server(
                 stats,
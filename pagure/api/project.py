@@ -939,6 +939,14 @@ def api_view_file(
             404, error_code=APIERROR.EFILENOTFOUND
         )
 
+    etag = tree.oid.hex if isinstance(content, list) else content.oid.hex
+    headers = pagure.utils.get_object_cache_headers(
+        etag, immutable=identifier == commit.oid.hex, private=repo.private
+    )
+    not_modified = pagure.utils.get_not_modified_response(etag, headers)
+    if not_modified:
+        return not_modified
+
     if output_type == "file":
         output = {
             "type": "file",
@@ -996,7 +1004,9 @@ def api_view_file(
             "content": content_list,
         }
 
-    return flask.jsonify(output)
+    jsonout = flask.jsonify(output)
+    jsonout.headers.extend(headers)
+    return jsonout
 
 
 @API.route("/projects")
@@ -1174,28 +1184,13 @@ def api_projects():
     if pagure.utils.authenticated() and username == flask.g.fas_user.username:
         private = flask.g.fas_user.username
 
-    project_count = pagure.lib.query.search_projects(
-        flask.g.session,
-        username=username,
-        fork=fork,
-        tags=tags,
-        pattern=pattern,
-        private=private,
-        namespace=namespace,
-        owner=owner,
-        count=True,
-    )
-
     # Pagination code inspired by Flask-SQLAlchemy
     page = get_page()
     per_page = get_per_page()
-    pagination_metadata = pagure.lib.query.get_pagination_metadata(
-        flask.request, page, per_page, project_count
-    )
     query_start = (page - 1) * per_page
     query_limit = per_page
 
-    projects = pagure.lib.query.search_projects(
+    project_count, projects = pagure.lib.query.search_projects(
         flask.g.session,
         username=username,
         fork=fork,
@@ -1206,6 +1201,11 @@ def api_projects():
         owner=owner,
         limit=query_limit,
         start=query_start,
+        with_count=True,
+        load_json=not short,
+    )
+    pagination_metadata = pagure.lib.query.get_pagination_metadata(
+        flask.request, page, per_page, project_count
     )
 
     # prepare the output json
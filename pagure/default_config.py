@@ -47,6 +47,8 @@ PAGURE_ADMIN_USERS = []
 
 # Whether or not to send emails
 EMAIL_SEND = False
+# Queue the emails, for the pagure_mail service to send them
+EMAIL_ASYNC = False
 
 # The email address to which the flask.log will send the errors (tracebacks)
 EMAIL_ERROR = "root@localhost.localdomain"
@@ -118,6 +120,11 @@ LOGCOM_CELERY_QUEUE = "pagure_logcom"
 LOADJSON_CELERY_QUEUE = "pagure_loadjson"
 CI_CELERY_QUEUE = "pagure_ci"
 MIRRORING_QUEUE = "pagure_mirror"
+MAIL_CELERY_QUEUE = "pagure_mail"
+
+# Number of files loaded between two reports of the progress of an import
+# of the JSON files of a ticket or pull-request git repository
+LOADJSON_PROGRESS_INTERVAL = 100
 
 # Number of items displayed per page
 ITEM_PER_PAGE = 48
@@ -130,6 +137,16 @@ IP_ALLOWED_INTERNAL = ["127.0.0.1", "localhost", "::1"]
 
 # Worker configuration
 CELERY_CONFIG = {}
+# Bind one database engine and session per worker process instead of
+# creating the session for each task
+TASK_WORKER_SESSION = False
+# When to run the garbage collector at the end of a task, one of:
+# always, every_n, rss, gen0, never
+TASK_GC_POLICY = "always"
+# Number of tasks between two garbage collections for the every_n policy
+TASK_GC_EVERY_N = 100
+# Resident set size (in bytes) above which the rss policy collects
+TASK_GC_RSS_THRESHOLD = 512 * 1024 * 1024
 
 # Redis configuration
 EVENTSOURCE_SOURCE = None
@@ -138,6 +155,17 @@ REDIS_HOST = "0.0.0.0"
 REDIS_PORT = 6379
 REDIS_DB = 0
 EVENTSOURCE_PORT = 8080
+EVENTSOURCE_MULTIPLEX = False
+EVENTSOURCE_DB_WORKERS = 4
+EVENTSOURCE_CACHE_SIZE = 10000
+EVENTSOURCE_CACHE_TTL = 60
+
+# Delivery of the web-hooks notifications
+WEBHOOK_MAX_WORKERS = 8
+WEBHOOK_CONNECT_TIMEOUT = 10
+WEBHOOK_TIMEOUT = 60
+WEBHOOK_RETRIES = 2
+WEBHOOK_RETRY_BACKOFF = 1
 
 # Disallow remote pull requests
 DISABLE_REMOTE_PR = False
@@ -181,6 +209,11 @@ UPLOAD_FOLDER_PATH = os.path.join(
 )
 
 
+# Folder where the gitolite3_fragments git auth backend writes the
+# configuration of each project, defaults to a ``pagure`` folder next to
+# GITOLITE_CONFIG
+GITOLITE_FRAGMENTS_FOLDER = None
+
 # Home folder of the gitolite user -- Folder where to run gl-compile-conf from
 GITOLITE_HOME = None
 
@@ -215,6 +248,16 @@ GL_BINDIR = None
 # See https://git-scm.com/docs/git-gc#git-gc---auto for more details
 GIT_GARBAGE_COLLECT = False
 
+# Whether to commit the changes to the JSON files of the tickets and the
+# pull-requests directly to their git repositories, batching the pending
+# ones, instead of doing it in a clone pushed back
+DIRECT_METADATA_COMMITS = False
+
+# Whether to send the archives of the projects to the users while they are
+# generated by the web application, instead of waiting for a worker to
+# generate them
+ARCHIVE_STREAM = False
+
 
 # SMTP settings
 SMTP_SERVER = "localhost"
@@ -558,6 +601,11 @@ ALLOW_HTTP_PULL_PUSH = True
 ALLOW_HTTP_PUSH = False
 # Path to Gitolite-shell if using that, None to use Git directly
 HTTP_REPO_ACCESS_GITOLITE = "/usr/share/gitolite3/gitolite-shell"
+# Whether to stream the HTTP request body to git instead of buffering it
+# in a temporary file first
+HTTP_REPO_ACCESS_STREAMING = False
+# Size of the blocks copied between the client and git
+HTTP_REPO_ACCESS_BUFFER_SIZE = 64 * 1024
 
 # repoSpanner integration settings
 # Path the the repoBridge binary
@@ -635,6 +683,57 @@ SSH_COMMAND_NON_REPOSPANNER = (
     {},
 )
 
+# Number of seconds the issues history stats of a project are cached for,
+# they are also invalidated when an issue of the project is created, closed
+# or deleted. Set to 0 to disable the cache.
+ISSUES_HISTORY_STATS_CACHE_TTL = 300
+# Where the issues history stats are cached: None (in each process) or
+# "redis" (shared by all the processes, using REDIS_HOST, REDIS_PORT and
+# REDIS_DB).
+ISSUES_HISTORY_STATS_CACHE_BACKEND = None
+
+# Number of seconds the identifier of a project looked up by its name is
+# cached for, in each process. The project is then loaded by its identifier
+# and checked to still match the name looked up. Set to 0 to disable it.
+PROJECT_ID_CACHE_TTL = 60
+
+# Number of rendered markdown texts cached, in each process. Set to 0 to
+# disable the cache.
+MARKDOWN_CACHE_SIZE = 4096
+# Number of seconds the rendering of the texts mentioning users, issues,
+# pull-requests or commits is cached for. These depend on the content of
+# the database, so they are not cached by default.
+MARKDOWN_CACHE_TTL = 0
+
+# Number of seconds the users looked up by their email or username, to be
+# displayed in the pages, are cached for, in each process. Set to 0 to
+# disable the cache.
+IDENTITY_CACHE_TTL = 60
+# Maximum number of emails and usernames whose user is cached
+IDENTITY_CACHE_SIZE = 4096
+
+# Number of git blobs whose character encoding is cached, in each process.
+# Set to 0 to disable the cache.
+ENCODING_CACHE_SIZE = 4096
+
+# Number of seconds the clients and proxies may cache the raw files,
+# patches and diffs of the URLs addressed by the identifier of a git object
+# (whose content thus never changes) without revalidating them. Set to 0 to
+# have them always revalidated, using their ETag.
+IMMUTABLE_CACHE_MAX_AGE = 31536000
+
+# Number of documents (README files, files of the documentation) rendered
+# to HTML cached, in each process. Set to 0 to disable the cache.
+RENDERED_CACHE_SIZE = 1024
+# Cache shared by the processes where the rendered documents are also
+# stored: None, "redis" (using REDIS_HOST, REDIS_PORT and REDIS_DB) or
+# "disk" (in RENDERED_CACHE_FOLDER).
+RENDERED_CACHE_BACKEND = None
+RENDERED_CACHE_FOLDER = None
+# Number of seconds the rendered documents are kept in the shared cache,
+# 0 to keep them forever.
+RENDERED_CACHE_TTL = 604800
+
 CSP_HEADERS = (
     "default-src 'self';"
     "script-src 'self' '{nonce_script}'; "
@@ -12,17 +12,50 @@
 
 from __future__ import unicode_literals, absolute_import
 
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+
 import docutils
 import docutils.core
 import docutils.examples
 import jinja2
 import kitchen.text.converters as ktc
+import markdown
 import markupsafe
+import redis
 import textwrap
 
 from pagure.config import config as pagure_config
+import pagure.exceptions
 import pagure.lib.query
 import pagure.lib.encoding_utils
+import pagure.pfmarkdown
+import pagure.utils
+
+
+# Identifies the rendering of the documents, it is part of the keys under
+# which they are cached: bump the first number when the rendering changes
+RENDERER_VERSION = "1-%s-%s-%s" % (
+    docutils.__version__,
+    markdown.__version__,
+    pagure.lib.query.MARKDOWN_RENDERER_VERSION,
+)
+# The configuration keys the documents rendered depend on
+_RENDERER_CONFIG_KEYS = (
+    "APP_URL",
+    "ENABLE_TICKETS",
+    "FLAG_FAILURE",
+    "FLAG_PENDING",
+    "FLAG_STATUSES_LABELS",
+    "FLAG_SUCCESS",
+)
+_RENDERED_CACHE = pagure.utils.LRUCache()
+_RENDERED_CACHE_REDIS = None
+_log = logging.getLogger(__name__)
 
 
 def modify_rst(rst, view_file_url=None):
@@ -96,21 +129,185 @@ def convert_doc(rst_string, view_file_url=None):
         return html_string
 
 
-def convert_readme(content, ext, view_file_url=None):
+def _get_renderer(ext):
+    """Return the name of the renderer of the files of the given extension,
+    None if they are not rendered."""
+    if ext and ext in [".rst"]:
+        return "rst"
+    elif ext and ext in [".mk", ".md", ".markdown"]:
+        return "markdown"
+    elif not ext or (ext and ext in [".text", ".txt"]):
+        return "text"
+    return None
+
+
+def get_renderer_version():
+    """Return the identifier of the rendering of the documents with the
+    current configuration, it is part of the keys under which they are
+    cached and of their ETag.
+
+    Besides ``RENDERER_VERSION``, the links of the markdown documents depend
+    on ``APP_URL`` and ``ENABLE_TICKETS`` and the rst documents on the
+    ``FLAG_*`` configuration keys.
+    """
+    config = json.dumps(
+        [pagure_config.get(key) for key in _RENDERER_CONFIG_KEYS],
+        sort_keys=True,
+        default=str,
+    )
+    return "%s-%s" % (
+        RENDERER_VERSION,
+        hashlib.sha1(config.encode("utf-8")).hexdigest()[:12],
+    )
+
+
+def _get_shared_cache_redis():
+    """Return the redis connection of the shared cache of the rendered
+    documents."""
+    global _RENDERED_CACHE_REDIS
+    if pagure.lib.query.REDIS is not None:
+        return pagure.lib.query.REDIS
+    if _RENDERED_CACHE_REDIS is None:
+        _RENDERED_CACHE_REDIS = redis.StrictRedis(
+            host=pagure_config["REDIS_HOST"],
+            port=pagure_config["REDIS_PORT"],
+            db=pagure_config["REDIS_DB"],
+        )
+    return _RENDERED_CACHE_REDIS
+
+
+def _get_shared_rendered(key):
+    """Return the rendered document cached under the given key in the
+    shared cache, None if there is none."""
+    backend = pagure_config.get("RENDERED_CACHE_BACKEND")
+    digest = hashlib.sha256(key.encode("utf-8")).hexdigest()
+    data = None
+    try:
+        if backend == "redis":
+            data = _get_shared_cache_redis().get("pagure:rendered:" + digest)
+        elif backend == "disk":
+            path = os.path.join(pagure_config["RENDERED_CACHE_FOLDER"], digest)
+            ttl = pagure_config.get("RENDERED_CACHE_TTL", 0)
+            if os.path.exists(path) and (
+                not ttl or os.path.getmtime(path) + ttl > time.time()
+            ):
+                with open(path, "rb") as stream:
+                    data = stream.read()
+        if not data:
+            return None
+        cached = json.loads(data.decode("utf-8"))
+    except (redis.exceptions.RedisError, IOError, OSError, ValueError) as err:
+        _log.warning("Could not read the rendered document cached: %s", err)
+        return None
+    if cached["markup"]:
+        return markupsafe.Markup(cached["html"])
+    return cached["html"]
+
+
+def _set_shared_rendered(key, html):
+    """Store the given rendered document under the given key in the shared
+    cache."""
+    backend = pagure_config.get("RENDERED_CACHE_BACKEND")
+    digest = hashlib.sha256(key.encode("utf-8")).hexdigest()
+    data = json.dumps(
+        {"html": "%s" % html, "markup": isinstance(html, markupsafe.Markup)}
+    ).encode("utf-8")
+    try:
+        if backend == "redis":
+            _get_shared_cache_redis().set(
+                "pagure:rendered:" + digest,
+                data,
+                ex=pagure_config.get("RENDERED_CACHE_TTL") or None,
+            )
+        elif backend == "disk":
+            folder = pagure_config["RENDERED_CACHE_FOLDER"]
+            # Write the file aside first so it is never read half-written
+            handle, tmppath = tempfile.mkstemp(dir=folder, prefix=".tmp")
+            with os.fdopen(handle, "wb") as stream:
+                stream.write(data)
+            os.rename(tmppath, os.path.join(folder, digest))
+    except (redis.exceptions.RedisError, IOError, OSError) as err:
+        _log.warning("Could not cache the rendered document: %s", err)
+
+
+def _get_rendered(key):
+    """Return the rendered document cached under the given key, None if
+    there is none."""
+    html = _RENDERED_CACHE.lookup(key)
+    if html is not None:
+        return html
+    if pagure_config.get("RENDERED_CACHE_BACKEND"):
+        html = _get_shared_rendered(key)
+        if html is not None:
+            _set_rendered(key, html, shared=False)
+    return html
+
+
+def _set_rendered(key, html, shared=True):
+    """Cache the given rendered document under the given key."""
+    _RENDERED_CACHE.store(key, html, pagure_config["RENDERED_CACHE_SIZE"])
+    if shared and pagure_config.get("RENDERED_CACHE_BACKEND"):
+        _set_shared_rendered(key, html)
+
+
+def has_references(content, ext, blob_id=None):
+    """Return whether the provided document is rendered with links to the
+    users, issues, pull-requests or commits it mentions. Since these links
+    depend on the database, its rendering is neither cached nor validated
+    from the git blob only.
+    """
+    if _get_renderer(ext) != "markdown":
+        return False
+    try:
+        text = pagure.lib.encoding_utils.decode(
+            ktc.to_bytes(content), blob_id=blob_id
+        )
+    except pagure.exceptions.PagureException:
+        return False
+    return bool(pagure.pfmarkdown.REFERENCES_RE.search(text))
+
+
+def convert_readme(content, ext, view_file_url=None, blob_id=None):
     """Convert the provided content according to the extension of the file
     provided.
+
+    When given the identifier of the git blob of the content, the document
+    rendered is cached, see ``RENDERED_CACHE_SIZE`` and
+    ``RENDERED_CACHE_BACKEND``.
     """
-    output = pagure.lib.encoding_utils.decode(ktc.to_bytes(content))
+    renderer = _get_renderer(ext)
+    key = None
+    if blob_id and renderer and pagure_config.get("RENDERED_CACHE_SIZE", 0):
+        key = "%s:%s:%s:%s" % (
+            get_renderer_version(),
+            renderer,
+            blob_id,
+            view_file_url or "",
+        )
+        cached = _get_rendered(key)
+        if cached is not None:
+            return cached, True
+
+    output = pagure.lib.encoding_utils.decode(
+        ktc.to_bytes(content), blob_id=blob_id
+    )
     safe = False
-    if ext and ext in [".rst"]:
+    if renderer == "rst":
         safe = True
         output = convert_doc(output, view_file_url)
-    elif ext and ext in [".mk", ".md", ".markdown"]:
+    elif renderer == "markdown":
+        # The rendering of the mentions of users, issues, pull-requests or
+        # commits depends on the project viewed and on the database
+        if pagure.pfmarkdown.REFERENCES_RE.search(output):
+            key = None
         output = pagure.lib.query.text2markdown(output, readme=True)
         safe = True
-    elif not ext or (ext and ext in [".text", ".txt"]):
+    elif renderer == "text":
         safe = True
         output = "<pre>%s</pre>" % jinja2.escape(output)
+
+    if key:
+        _set_rendered(key, output)
     return output, safe
 
 
@@ -26,6 +26,7 @@ import pagure.lib.mimetype
 import pagure.lib.model_base
 import pagure.lib.query
 import pagure.forms
+import pagure.utils
 
 # Create the application.
 APP = flask.Flask(__name__)
@@ -115,44 +116,42 @@ def __get_tree(repo_obj, tree, filepath, index=0, extended=False):
         )
 
 
-def __get_tree_and_content(repo_obj, commit, path):
-    """Return the tree and the content of the specified file."""
+def __get_tree_and_entry(repo_obj, commit, path):
+    """Return the tree and the entry of the specified file, the entry is
+    None if the path is a folder without index file.
+    """
 
     (blob_or_tree, tree_obj, extended) = __get_tree(
         repo_obj, commit.tree, path
     )
 
-    if blob_or_tree is None:
-        return (tree_obj, None, None)
-
-    if not repo_obj[blob_or_tree.oid]:
+    if blob_or_tree is not None and not repo_obj[blob_or_tree.oid]:
         # Not tested and no idea how to test it, but better safe than sorry
         flask.abort(404, description="File not found")
 
-    is_file = False
-    try:
-        is_file = isinstance(blob_or_tree, pygit2.TreeEntry)
-    except AttributeError:
-        is_file = isinstance(blob_or_tree, pygit2.Blob)
-
-    if is_file:
-        filename = blob_or_tree.name
-        name, ext = os.path.splitext(filename)
-        blob_obj = repo_obj[blob_or_tree.oid]
-        if not is_binary_string(blob_obj.data):
-            try:
-                content, safe = pagure.doc_utils.convert_readme(
-                    blob_obj.data, ext
-                )
-                if safe:
-                    filename = name + ".html"
-            except pagure.exceptions.PagureEncodingException:
-                content = blob_obj.data
-        else:
+    return (tree_obj, blob_or_tree)
+
+
+def __get_content(repo_obj, entry):
+    """Return the content of the specified file, converted to HTML if it
+    is a document, and its filename.
+    """
+    filename = entry.name
+    name, ext = os.path.splitext(filename)
+    blob_obj = repo_obj[entry.oid]
+    if not is_binary_string(blob_obj.data):
+        try:
+            content, safe = pagure.doc_utils.convert_readme(
+                blob_obj.data, ext, blob_id=blob_obj.oid.hex
+            )
+            if safe:
+                filename = name + ".html"
+        except pagure.exceptions.PagureEncodingException:
             content = blob_obj.data
+    else:
+        content = blob_obj.data
 
-    tree = sorted(tree_obj, key=lambda x: x.filemode)
-    return (tree, content, filename)
+    return (content, filename)
 
 
 @APP.route("/<repo>/")
@@ -199,6 +198,7 @@ def view_docs(repo, username=None, namespace=None, filename=None):
 
     content = None
     tree = None
+    headers = {}
     if not filename:
         path = [""]
     else:
@@ -206,9 +206,29 @@ def view_docs(repo, username=None, namespace=None, filename=None):
 
     if commit:
         try:
-            (tree, content, filename) = __get_tree_and_content(
-                repo_obj, commit, path
-            )
+            (tree, entry) = __get_tree_and_entry(repo_obj, commit, path)
+            # The page only depends on the file or the folder shown, and on
+            # the version of the renderers, unless it links to the issues,
+            # users... it mentions
+            if entry is None or not pagure.doc_utils.has_references(
+                repo_obj[entry.oid].data,
+                os.path.splitext(entry.name)[1],
+                blob_id=entry.oid.hex,
+            ):
+                etag = "%s-%s" % (
+                    (entry if entry is not None else tree).oid.hex,
+                    pagure.doc_utils.get_renderer_version(),
+                )
+                headers = pagure.utils.get_object_cache_headers(
+                    etag, private=repo.private
+                )
+                not_modified = pagure.utils.get_not_modified_response(
+                    etag, headers
+                )
+                if not_modified:
+                    return not_modified
+            if entry is not None:
+                (content, filename) = __get_content(repo_obj, entry)
         except pagure.exceptions.FileNotFoundException as err:
             flask.flash("%s" % err, "error")
         except Exception as err:
@@ -233,4 +253,4 @@ def view_docs(repo, username=None, namespace=None, filename=None):
     else:
         mimetype, _ = pagure.lib.mimetype.guess_type(filename, content)
 
-    return flask.Response(content, mimetype=mimetype)
+    return flask.Response(content, mimetype=mimetype, headers=headers)
@@ -60,9 +60,49 @@ if pagure_config.get("PAGURE_CI_SERVICES"):
     pagure.lib.query.set_pagure_ci(pagure_config["PAGURE_CI_SERVICES"])
 
 
+class PagureGlobals(flask.ctx._AppCtxGlobals):
+    """The ``flask.g`` object of pagure, on which some attributes can be
+    computed only when they are first accessed, see ``set_lazy``.
+    """
+
+    def set_lazy(self, name, function):
+        """Set the attribute ``name`` to the value returned by ``function``
+        when it is first accessed.
+        """
+        self.__dict__.pop(name, None)
+        self.__dict__.setdefault("_lazy_attributes", {})[name] = function
+
+    def _load_lazy(self, name):
+        function = self.__dict__.get("_lazy_attributes", {}).pop(name, None)
+        if function is None:
+            return False
+        setattr(self, name, function())
+        return True
+
+    def __setattr__(self, name, value):
+        # A value set explicitly replaces the one not computed yet
+        self.__dict__.get("_lazy_attributes", {}).pop(name, None)
+        super(PagureGlobals, self).__setattr__(name, value)
+
+    def __getattr__(self, name):
+        if self._load_lazy(name):
+            return self.__dict__[name]
+        raise AttributeError(name)
+
+    def get(self, name, default=None):
+        self._load_lazy(name)
+        return super(PagureGlobals, self).get(name, default)
+
+    def __contains__(self, item):
+        return item in self.__dict__ or item in self.__dict__.get(
+            "_lazy_attributes", {}
+        )
+
+
 def create_app(config=None):
     """Create the flask application."""
     app = flask.Flask(__name__)
+    app.app_ctx_globals_class = PagureGlobals
     app.config = pagure_config
 
     if config:
@@ -330,14 +370,23 @@ def set_request():
             flask.g.session, repo, user=username, namespace=namespace
         )
         if flask.g.authenticated:
-            flask.g.repo_forked = pagure.lib.query.get_authorized_project(
-                flask.g.session,
-                repo,
-                user=flask.g.fas_user.username,
-                namespace=namespace,
+            # These are only computed if the endpoint or template uses them
+            flask.g.set_lazy(
+                "repo_forked",
+                lambda: pagure.lib.query.get_authorized_project(
+                    flask.g.session,
+                    repo,
+                    user=flask.g.fas_user.username,
+                    namespace=namespace,
+                ),
             )
-            flask.g.repo_starred = pagure.lib.query.has_starred(
-                flask.g.session, flask.g.repo, user=flask.g.fas_user.username
+            flask.g.set_lazy(
+                "repo_starred",
+                lambda: pagure.lib.query.has_starred(
+                    flask.g.session,
+                    flask.g.repo,
+                    user=flask.g.fas_user.username,
+                ),
             )
 
             # Block all POST request from blocked users
@@ -390,25 +439,21 @@ def set_request():
                 flask.g.issues_enabled = False
 
         flask.g.reponame = get_repo_path(flask.g.repo)
-        flask.g.repo_obj = pygit2.Repository(flask.g.reponame)
-        flask.g.repo_admin = pagure.utils.is_repo_admin(flask.g.repo)
-        flask.g.repo_committer = pagure.utils.is_repo_committer(flask.g.repo)
-        if flask.g.authenticated and not flask.g.repo_committer:
-            flask.g.repo_committer = flask.g.fas_user.username in [
-                u.user.username for u in flask.g.repo.collaborators
-            ]
-
-        flask.g.repo_user = pagure.utils.is_repo_user(flask.g.repo)
-        flask.g.branches = sorted(flask.g.repo_obj.listall_branches())
-
-        repouser = flask.g.repo.user.user if flask.g.repo.is_fork else None
-        fas_user = flask.g.fas_user if pagure.utils.authenticated() else None
-        flask.g.repo_watch_levels = pagure.lib.query.get_watch_level_on_repo(
-            flask.g.session,
-            fas_user,
-            flask.g.repo.name,
-            repouser=repouser,
-            namespace=namespace,
+        flask.g.set_lazy(
+            "repo_obj", lambda: pygit2.Repository(flask.g.reponame)
+        )
+        flask.g.set_lazy(
+            "repo_admin", lambda: pagure.utils.is_repo_admin(flask.g.repo)
+        )
+        flask.g.set_lazy("repo_committer", _is_repo_committer)
+        flask.g.set_lazy(
+            "repo_user", lambda: pagure.utils.is_repo_user(flask.g.repo)
+        )
+        flask.g.set_lazy(
+            "branches", lambda: sorted(flask.g.repo_obj.listall_branches())
+        )
+        flask.g.set_lazy(
+            "repo_watch_levels", lambda: _get_watch_levels(namespace)
         )
 
     items_per_page = pagure_config["ITEM_PER_PAGE"]
@@ -439,6 +484,31 @@ def set_request():
         flask.g.offset = (page - 1) * flask.g.limit
 
 
+def _is_repo_committer():
+    """Returns whether the current user can commit to ``flask.g.repo``,
+    either directly or as a collaborator on some branches.
+    """
+    repo_committer = pagure.utils.is_repo_committer(flask.g.repo)
+    if flask.g.authenticated and not repo_committer:
+        repo_committer = flask.g.fas_user.username in [
+            u.user.username for u in flask.g.repo.collaborators
+        ]
+    return repo_committer
+
+
+def _get_watch_levels(namespace):
+    """Returns the watch levels of the current user on ``flask.g.repo``."""
+    repouser = flask.g.repo.user.user if flask.g.repo.is_fork else None
+    fas_user = flask.g.fas_user if pagure.utils.authenticated() else None
+    return pagure.lib.query.get_watch_level_on_repo(
+        flask.g.session,
+        fas_user,
+        flask.g.repo.name,
+        repouser=repouser,
+        namespace=namespace,
+    )
+
+
 def auth_login():  # pragma: no cover
     """Method to log into the application using FAS OpenID."""
     return_point = flask.url_for("ui_ns.index")
@@ -170,11 +170,18 @@ def send_notifications(
     pushed.
     """
 
+    # Read all the authors in one git call and resolve them in one query
+    commits_info = pagure.lib.git.get_commits_info(revs, repodir)
+    users = pagure.lib.query.search_users_by_emails(
+        session, [info["email"] for info in commits_info.values()]
+    )
+
     auths = set()
     for rev in revs:
-        email = pagure.lib.git.get_author_email(rev, repodir)
-        name = pagure.lib.git.get_author(rev, repodir)
-        author = pagure.lib.query.search_user(session, email=email) or name
+        info = commits_info.get(rev)
+        if info is None:
+            continue
+        author = users.get(info["email"]) or info["author"]
         auths.add(author)
 
     authors = []
@@ -450,6 +457,19 @@ class DefaultRunner(BaseRunner):
                 )
             )
 
+        # Advance the stored commit stats if the default branch moved
+        if changes and "refs/heads/%s" % default_branch in changes:
+            pagure.lib.tasks.update_commits_stats.delay(repodir)
+
+        # Advance the stored commits index of the branches pushed to
+        branches = [
+            refname[len("refs/heads/") :]
+            for refname in changes
+            if refname.startswith("refs/heads/")
+        ]
+        if branches:
+            pagure.lib.tasks.update_commits_index.delay(repodir, branches)
+
         # Refresh of all opened PRs
         parent = project.parent or project
         if not _config.get("GIT_HOOK_DB_RO", False):
@@ -597,42 +597,7 @@ def get_branches_of_commit():
         response.status_code = 404
         return response
 
-    branches = []
-    if not repo_obj.head_is_unborn:
-        compare_branch = repo_obj.lookup_branch(repo_obj.head.shorthand)
-    else:
-        compare_branch = None
-
-    for branchname in repo_obj.listall_branches():
-        branch = repo_obj.lookup_branch(branchname)
-
-        if not repo_obj.is_empty and len(repo_obj.listall_branches()) > 1:
-
-            merge_commit = None
-
-            if compare_branch:
-                merge_commit_obj = repo_obj.merge_base(
-                    compare_branch.peel().hex, branch.peel().hex
-                )
-
-                if merge_commit_obj:
-                    merge_commit = merge_commit_obj.hex
-
-            repo_commit = repo_obj[branch.peel().hex]
-
-            for commit in repo_obj.walk(
-                repo_commit.oid.hex, pygit2.GIT_SORT_NONE
-            ):
-                if commit.oid.hex == merge_commit:
-                    break
-                if commit.oid.hex == commit_id:
-                    branches.append(branchname)
-                    break
-
-    # If we didn't find the commit in any branch and there is one, then it
-    # is in the default branch.
-    if not branches and compare_branch:
-        branches.append(compare_branch.branch_name)
+    branches = pagure.lib.git.get_branches_of_commit(repo_obj, commit_id)
 
     return flask.jsonify({"code": "OK", "branches": branches})
 
@@ -22,13 +22,21 @@ except ImportError:
     cchardet = None
     from chardet import universaldetector, __version__ as ch_version
 
+from pagure.config import config as pagure_config
 from pagure.exceptions import PagureEncodingException
+from pagure.utils import LRUCache
 
 
 _log = logging.getLogger(__name__)
 
 Guess = namedtuple("Guess", ["encoding", "confidence"])
 
+# Number of bytes, from the start of the data, the encoding is guessed from
+DETECTION_SAMPLE_SIZE = 64 * 1024
+
+# Encodings found for the git blobs, by identifier of the blob
+_ENCODING_CACHE = LRUCache()
+
 
 def detect_encodings(data):
     """
@@ -160,16 +168,68 @@ def guess_encoding(data):
     raise PagureEncodingException("No encoding could be guessed for this file")
 
 
-def decode(data):
+def _guess_sample_encoding(data):
     """
-    Guesses the encoding using ``guess_encoding`` and decodes the data.
+    Guess the encoding of the data from its first ``DETECTION_SAMPLE_SIZE``
+    bytes, falling back to the whole data if the data cannot be decoded
+    with any of the encodings guessed from that sample.
 
     :param data: An array of bytes to treat as text data
     :type  data: bytes
+    :return: A string of the best encoding found
+    :rtype: str
+    :raises PagureException: if no encoding was found that the data could
+        be decoded into
 
-    :return: A unicode string that has been decoded using the encoding provided
-             by ``guest_encoding``
+    """
+    if len(data) <= DETECTION_SAMPLE_SIZE:
+        return guess_encoding(data)
+
+    for encoding in guess_encodings(data[:DETECTION_SAMPLE_SIZE]):
+        try:
+            data.decode(encoding.encoding)
+            return encoding.encoding
+        except (UnicodeDecodeError, TypeError):
+            pass
+    return guess_encoding(data)
+
+
+def decode(data, blob_id=None):
+    """
+    Decodes the data, as UTF-8 if it is valid UTF-8 (or ASCII) and using
+    the encoding guessed by ``guess_encoding`` on a sample of it otherwise.
+    The UTF-8 byte order mark the data may start with is stripped.
+
+    Git blobs never change, so the encoding found for the data of a blob is
+    cached by identifier of the blob (see ``ENCODING_CACHE_SIZE``).
+
+    :param data: An array of bytes to treat as text data
+    :type  data: bytes
+    :param blob_id: The identifier of the git blob the data is the content
+        of, if any
+    :type  blob_id: str or None
+
+    :return: A unicode string that has been decoded using the encoding found
     :rtype: unicode str
+    :raises PagureException: if no encoding was found that the data could
+        be decoded into
     """
-    encoding = guess_encoding(data)
-    return data.decode(encoding)
+    cache_size = pagure_config.get("ENCODING_CACHE_SIZE", 0)
+    encoding = None
+    if blob_id and cache_size:
+        encoding = _ENCODING_CACHE.lookup(blob_id)
+    if encoding:
+        return data.decode(encoding)
+
+    try:
+        # Strips the byte order mark of the files starting with one, as
+        # the UTF-8-SIG encoding reported for them by chardet did
+        output = data.decode("utf-8-sig")
+        encoding = "utf-8-sig"
+    except UnicodeDecodeError:
+        encoding = _guess_sample_encoding(data)
+        output = data.decode(encoding)
+
+    if blob_id and cache_size:
+        _ENCODING_CACHE.store(blob_id, encoding, cache_size)
+    return output
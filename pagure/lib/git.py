@@ -15,7 +15,9 @@ from __future__ import print_function, unicode_literals, absolute_import
 # pylint: disable=too-many-statements
 # pylint: disable=too-many-lines
 
+import collections
 import datetime
+import fcntl
 import json
 import logging
 import os
@@ -24,12 +26,14 @@ import subprocess
 import requests
 import tempfile
 import tarfile
+import threading
 import zipfile
 
 import arrow
 import pygit2
 import six
 
+from six.moves.urllib.parse import quote, unquote
 from sqlalchemy.exc import SQLAlchemyError
 
 # from sqlalchemy.orm.session import Session
@@ -213,6 +217,192 @@ def _make_signature(name, email):
     return pygit2.Signature(name=name, email=email)
 
 
+# Name of the folder, stored in the tickets and requests git repositories,
+# listing the objects whose JSON file is waiting to be updated
+PENDING_UPDATES_FOLDER = "pagure_pending_updates"
+
+
+def _get_direct_repopath(repo, repotype):
+    """Return the path of the bare git repository of the specified type of
+    the project if its JSON files are to be committed to it directly (see
+    ``DIRECT_METADATA_COMMITS``), None otherwise.
+    """
+    if not pagure_config.get("DIRECT_METADATA_COMMITS", False):
+        return None
+    if repo.is_on_repospanner:
+        return None
+    repopath = repo.repopath(repotype)
+    if not repopath or not os.path.exists(repopath):
+        return None
+    return repopath
+
+
+def _dump_json(obj):
+    """Return the content of the JSON file of the specified object."""
+    return json.dumps(
+        obj.to_json(), sort_keys=True, indent=4, separators=(",", ": ")
+    ).encode("utf-8")
+
+
+def _commit_files(repopath, files, message):
+    """Commit the specified changes to the files at the root of the tree of
+    the master branch of a bare git repository, without clone nor checkout.
+
+    The branch is only moved if it still points to the commit the new one
+    is based on, so concurrent changes are never overwritten.
+
+    :arg repopath: the path of the git repository
+    :arg files: a dict of the name of the files to their new content, or to
+        None for the files to remove
+    :arg message: the commit message
+    :return: the hash of the new commit, or None if nothing changed
+
+    """
+    repo_obj = pygit2.Repository(repopath)
+    parents = []
+    tree = None
+    if not repo_obj.is_empty:
+        parent = repo_obj.lookup_reference("refs/heads/master").peel(
+            pygit2.Commit
+        )
+        parents.append(parent.oid)
+        tree = parent.tree
+
+    builder = repo_obj.TreeBuilder(tree) if tree else repo_obj.TreeBuilder()
+    changed = False
+    for filename, content in sorted(files.items()):
+        entry = builder.get(filename)
+        if content is None:
+            if entry is not None:
+                builder.remove(filename)
+                changed = True
+            continue
+        oid = repo_obj.create_blob(content)
+        if entry is None or entry.id != oid:
+            builder.insert(filename, oid, pygit2.GIT_FILEMODE_BLOB)
+            changed = True
+    if not changed:
+        return None
+
+    # Author/commiter will always be this one
+    author = _make_signature(name="pagure", email="pagure")
+    # Fails if the branch moved since its tip was read
+    return repo_obj.create_commit(
+        "refs/heads/master",
+        author,
+        author,
+        message,
+        builder.write(),
+        parents,
+    ).hex
+
+
+def queue_git_update(repo, repotype, uid):
+    """Record that the JSON file of the specified object needs to be
+    updated, if it is to be committed directly to the git repository.
+
+    :arg repo: the project the object belongs to
+    :arg repotype: the type of git repository the object is stored in,
+        tickets or requests
+    :arg uid: the unique identifier of the object
+    :return: whether the update was queued, if not it should be done with
+        ``_update_git``
+
+    """
+    repopath = _get_direct_repopath(repo, repotype)
+    if repopath is None:
+        return False
+
+    _mark_pending_updates(repopath, [uid])
+    return True
+
+
+def _mark_pending_updates(repopath, uids):
+    """Record that the JSON files of the specified objects need to be
+    updated in the specified git repository.
+    """
+    folder = os.path.join(repopath, PENDING_UPDATES_FOLDER)
+    if not os.path.exists(folder):
+        try:
+            os.mkdir(folder)
+        except OSError:
+            # Created in the meantime
+            pass
+    # Several updates of the same object are recorded only once
+    for uid in uids:
+        with open(os.path.join(folder, quote(uid, safe="")), "w"):
+            pass
+
+
+def flush_git_updates(session, repo, repotype):
+    """Commit the JSON files of all the objects whose update was queued
+    with ``queue_git_update`` to the git repository, in a single commit.
+
+    This is meant to be called with the lock of the project held, objects
+    queued while it runs are left for the next call.
+
+    :arg session: the session to connect to the database with
+    :arg repo: the project whose objects are updated
+    :arg repotype: the type of git repository, tickets or requests
+    :return: the hash of the commit, or None if there was nothing to commit
+
+    """
+    repopath = repo.repopath(repotype)
+    folder = os.path.join(repopath, PENDING_UPDATES_FOLDER)
+    if not os.path.exists(folder):
+        return None
+
+    uids = []
+    for filename in sorted(os.listdir(folder)):
+        # Forget about them before reading them from the database, so the
+        # changes made after that are queued again
+        try:
+            os.unlink(os.path.join(folder, filename))
+        except OSError:
+            continue
+        uids.append(unquote(filename))
+    if not uids:
+        return None
+
+    files = {}
+    titles = []
+    for uid in uids:
+        if repotype == "tickets":
+            obj = pagure.lib.query.get_issue_by_uid(session, uid)
+        else:
+            obj = pagure.lib.query.get_request_by_uid(session, uid)
+        if obj is None:
+            _log.info("Could not find %s to update in %s", uid, repopath)
+            continue
+        files[obj.uid] = _dump_json(obj)
+        titles.append("Updated %s %s: %s" % (obj.isa, obj.uid, obj.title))
+    if not files:
+        return None
+
+    message = titles[0]
+    if len(titles) > 1:
+        message = "Updated %s objects\n\n%s" % (
+            len(titles),
+            "\n".join(titles),
+        )
+
+    _log.info(
+        "Committing the update of %s objects to: %s", len(files), repopath
+    )
+    try:
+        try:
+            return _commit_files(repopath, files, message)
+        except pygit2.GitError:
+            # The branch moved (push, clean_git...) since its tip was read,
+            # commit on top of its new tip
+            _log.info("The master branch of %s moved, retrying", repopath)
+            return _commit_files(repopath, files, message)
+    except Exception:
+        # Do not lose the updates, leave them for the next call
+        _mark_pending_updates(repopath, uids)
+        raise
+
+
 def _update_git(obj, repo):
     """Update the given issue in its git.
 
@@ -316,6 +506,15 @@ def _clean_git(repo, obj_repotype, obj_uid):
     """Update the given issue remove it from its git."""
     _log.info("Update the git repo: %s to remove: %s", repo.path, obj_uid)
 
+    repopath = _get_direct_repopath(repo, obj_repotype)
+    if repopath is not None:
+        _commit_files(
+            repopath,
+            {obj_uid: None},
+            "Removed object %s: %s" % (obj_repotype, obj_uid),
+        )
+        return
+
     with TemporaryClone(repo, obj_repotype, "clean_git") as tempclone:
         if tempclone is None:
             # This repo is not tracked on disk
@@ -366,9 +565,13 @@ def _clean_git(repo, obj_repotype, obj_uid):
         tempclone.push("pagure", master_ref, internal="yes")
 
 
-def get_user_from_json(session, jsondata, key="user"):
+def get_user_from_json(session, jsondata, key="user", cache=None):
     """From the given json blob, retrieve the user info and search for it
     in the db and create the user if it does not already exist.
+
+    :kwarg cache: a dict in which the users are kept, to not look them up
+        again, for the duration of an import
+
     """
     user = None
 
@@ -388,6 +591,10 @@ def get_user_from_json(session, jsondata, key="user"):
     if not username and not useremails:
         return
 
+    cache_key = ("user", username, tuple(useremails or []))
+    if cache is not None and cache_key in cache:
+        return cache[cache_key]
+
     user = pagure.lib.query.search_user(session, username=username)
     if not user:
         for email in useremails:
@@ -406,22 +613,32 @@ def get_user_from_json(session, jsondata, key="user"):
         )
         session.commit()
 
+    if cache is not None:
+        cache[cache_key] = user
     return user
 
 
-def get_project_from_json(session, jsondata):
+def get_project_from_json(session, jsondata, cache=None):
     """From the given json blob, retrieve the project info and search for
     it in the db and create the projec if it does not already exist.
+
+    :kwarg cache: a dict in which the projects and users are kept, to not
+        look them up again, for the duration of an import
+
     """
     project = None
 
-    user = get_user_from_json(session, jsondata)
+    user = get_user_from_json(session, jsondata, cache=cache)
     name = jsondata.get("name")
     namespace = jsondata.get("namespace")
     project_user = None
     if jsondata.get("parent"):
         project_user = user.username
 
+    cache_key = ("project", name, namespace, project_user)
+    if cache is not None and cache.get(cache_key):
+        return cache[cache_key]
+
     project = pagure.lib.query._get_project(
         session, name, user=project_user, namespace=namespace
     )
@@ -429,7 +646,9 @@ def get_project_from_json(session, jsondata):
     if not project:
         parent = None
         if jsondata.get("parent"):
-            parent = get_project_from_json(session, jsondata.get("parent"))
+            parent = get_project_from_json(
+                session, jsondata.get("parent"), cache=cache
+            )
 
             pagure.lib.query.fork_project(
                 session=session, repo=parent, user=user.username
@@ -462,9 +681,27 @@ def get_project_from_json(session, jsondata):
                 session, project, tags=tags, user=user.username
             )
 
+    if cache is not None:
+        cache[cache_key] = project
     return project
 
 
+def _get_import_project(session, reponame, namespace, username, cache=None):
+    """Return the project the data imported from git is about, looked up
+    only once for the duration of the import if a cache is provided.
+    """
+    cache_key = ("project", reponame, namespace, username)
+    if cache is not None and cache.get(cache_key):
+        return cache[cache_key]
+
+    repo = pagure.lib.query._get_project(
+        session, reponame, user=username, namespace=namespace
+    )
+    if cache is not None:
+        cache[cache_key] = repo
+    return repo
+
+
 def update_custom_field_from_json(session, repo, issue, json_data):
     """Update the custom fields according to the custom fields of
     the issue. If the custom field is not present for the repo in
@@ -518,7 +755,14 @@ def update_custom_field_from_json(session, repo, issue, json_data):
 
 
 def update_ticket_from_git(
-    session, reponame, namespace, username, issue_uid, json_data, agent
+    session,
+    reponame,
+    namespace,
+    username,
+    issue_uid,
+    json_data,
+    agent,
+    cache=None,
 ):
     """Update the specified issue (identified by its unique identifier)
     with the data present in the json blob provided.
@@ -533,11 +777,13 @@ def update_ticket_from_git(
         and used to update the data in the database.
     :arg agent: the username of the person who pushed the changes (and thus
         is assumed did the action).
+    :kwarg cache: a dict in which the project and the users are kept, to
+        not look them up again for every ticket of an import
 
     """
 
-    repo = pagure.lib.query._get_project(
-        session, reponame, user=username, namespace=namespace
+    repo = _get_import_project(
+        session, reponame, namespace, username, cache=cache
     )
 
     if not repo:
@@ -546,10 +792,17 @@ def update_ticket_from_git(
             % (reponame, username, namespace)
         )
 
-    user = get_user_from_json(session, json_data)
+    user = get_user_from_json(session, json_data, cache=cache)
     # rely on the agent provided, but if something goes wrong, behave as
     # ticket creator
-    agent = pagure.lib.query.search_user(session, username=agent) or user
+    agent_key = ("agent", agent)
+    if cache is not None and cache.get(agent_key):
+        agent = cache[agent_key]
+    else:
+        agent = pagure.lib.query.search_user(session, username=agent)
+        if cache is not None:
+            cache[agent_key] = agent
+    agent = agent or user
 
     status = json_data.get("status")
     close_status = json_data.get("close_status")
@@ -620,6 +873,8 @@ def update_ticket_from_git(
             messages.extend(msgs)
 
     session.commit()
+    # The status and closed_at date may have been changed without edit_issue
+    pagure.lib.query.invalidate_issues_history_stats(repo.id)
 
     issue = pagure.lib.query.get_issue_by_uid(session, issue_uid=issue_uid)
 
@@ -744,7 +999,9 @@ def update_ticket_from_git(
         session.rollback()
 
     # Update assignee
-    assignee = get_user_from_json(session, json_data, key="assignee")
+    assignee = get_user_from_json(
+        session, json_data, key="assignee", cache=cache
+    )
     if assignee:
         msg = pagure.lib.query.add_issue_assignee(
             session, issue, assignee.username, user=agent.user, notify=False
@@ -769,7 +1026,7 @@ def update_ticket_from_git(
         messages.extend(msgs)
 
     for comment in json_data["comments"]:
-        usercomment = get_user_from_json(session, comment)
+        usercomment = get_user_from_json(session, comment, cache=cache)
         commentobj = pagure.lib.query.get_issue_comment_by_user_and_comment(
             session, issue_uid, usercomment.id, comment["comment"]
         )
@@ -793,7 +1050,7 @@ def update_ticket_from_git(
 
 
 def update_request_from_git(
-    session, reponame, namespace, username, request_uid, json_data
+    session, reponame, namespace, username, request_uid, json_data, cache=None
 ):
     """Update the specified request (identified by its unique identifier)
     with the data present in the json blob provided.
@@ -805,11 +1062,13 @@ def update_request_from_git(
     :arg request_uid: the unique identifier of the issue to update
     :arg json_data: the json representation of the issue taken from the git
         and used to update the data in the database.
+    :kwarg cache: a dict in which the projects and the users are kept, to
+        not look them up again for every pull-request of an import
 
     """
 
-    repo = pagure.lib.query._get_project(
-        session, reponame, user=username, namespace=namespace
+    repo = _get_import_project(
+        session, reponame, namespace, username, cache=cache
     )
 
     if not repo:
@@ -818,16 +1077,20 @@ def update_request_from_git(
             % (reponame, username, namespace)
         )
 
-    user = get_user_from_json(session, json_data)
+    user = get_user_from_json(session, json_data, cache=cache)
 
     request = pagure.lib.query.get_request_by_uid(
         session, request_uid=request_uid
     )
 
     if not request:
-        repo_from = get_project_from_json(session, json_data.get("repo_from"))
+        repo_from = get_project_from_json(
+            session, json_data.get("repo_from"), cache=cache
+        )
 
-        repo_to = get_project_from_json(session, json_data.get("project"))
+        repo_to = get_project_from_json(
+            session, json_data.get("project"), cache=cache
+        )
 
         status = json_data.get("status")
         if pagure.utils.is_true(status):
@@ -861,14 +1124,16 @@ def update_request_from_git(
     request.commit_stop = json_data.get("commit_stop")
 
     # Update assignee
-    assignee = get_user_from_json(session, json_data, key="assignee")
+    assignee = get_user_from_json(
+        session, json_data, key="assignee", cache=cache
+    )
     if assignee:
         pagure.lib.query.add_pull_request_assignee(
             session, request, assignee.username, user=user.user
         )
 
     for comment in json_data["comments"]:
-        user = get_user_from_json(session, comment)
+        user = get_user_from_json(session, comment, cache=cache)
         commentobj = pagure.lib.query.get_request_comment(
             session, request_uid, comment["id"]
         )
@@ -888,7 +1153,7 @@ def update_request_from_git(
     # Add/update tags:
     tags = json_data.get("tags") or []
     if tags:
-        user = get_user_from_json(session, json_data)
+        user = get_user_from_json(session, json_data, cache=cache)
         pagure.lib.query.add_tag_obj(session, request, tags, user.username)
 
     session.commit()
@@ -1481,6 +1746,502 @@ def get_commit_subject(commit, abspath):
     return subject
 
 
+def get_commits_info(commits, abspath):
+    """Return the author name, author email and subject of the specified
+    commits, read from a single ``git log`` call.
+
+    :arg commits: the list of commit hashes to retrieve the info of
+    :arg abspath: the path of the git repository the commits are in
+    :return: a dict associating each commit hash to a dict with the
+        ``author``, ``email`` and ``subject`` of that commit
+
+    """
+    output = {}
+    if not commits:
+        return output
+
+    lines = pagure.lib.git.read_git_output(
+        [
+            "log",
+            "--no-walk=unsorted",
+            "--stdin",
+            "--format=%H%x00%an%x00%ae%x00%s",
+        ],
+        abspath,
+        input="\n".join(commits).encode("utf-8"),
+    ).splitlines()
+    for line in lines:
+        commit, author, email, subject = line.split("\x00", 3)
+        output[commit] = {
+            "author": author,
+            "email": email,
+            "subject": subject,
+        }
+    return output
+
+
+# Per repository index of the commits of each branch that are not in the
+# default branch, see get_branches_of_commit. It is bounded both in number
+# of repositories and in total number of commits.
+_BRANCHES_INDEX = collections.OrderedDict()
+_BRANCHES_INDEX_SIZE = 64
+_BRANCHES_INDEX_MAX_COMMITS = 200000
+_BRANCHES_INDEX_LOCK = threading.Lock()
+
+
+def get_branches_of_commit(repo_obj, commit_id):
+    """Return the list of branches having the specified commit and which
+    are not merged in the default branch. If there are none, the default
+    branch is returned.
+
+    The commits of each branch that are not in the default branch are
+    indexed and kept in memory, along with the head of the branch. The
+    index of a branch is only rebuilt when its head (or the one of the
+    default branch) moved, for example after a push. The repositories
+    whose branches have too many commits of their own are not indexed, the
+    commits of their branches are walked every time.
+
+    :arg repo_obj: the git repository to look into
+    :type repo_obj: pygit2.Repository
+    :arg commit_id: the full hash of the commit to look for
+    :type commit_id: str
+    :return: the list of the branches having this commit
+    :return type: list
+
+    """
+    if repo_obj.is_empty:
+        return []
+
+    default = None
+    if not repo_obj.head_is_unborn:
+        default = repo_obj.lookup_branch(repo_obj.head.shorthand)
+    default_head = default.peel().hex if default else None
+
+    with _BRANCHES_INDEX_LOCK:
+        index = _BRANCHES_INDEX.pop(repo_obj.path, None)
+    if index is None or index["default"] != default_head:
+        index = {"default": default_head, "branches": {}}
+
+    branches = collections.OrderedDict()
+    for branchname in repo_obj.listall_branches():
+        if default and branchname == default.branch_name:
+            continue
+        head = repo_obj.lookup_branch(branchname).peel().hex
+        cached = index["branches"].get(branchname)
+        if cached and cached[0] == head:
+            branches[branchname] = cached
+            continue
+        walker = repo_obj.walk(head, pygit2.GIT_SORT_NONE)
+        if default_head:
+            walker.hide(default_head)
+        branches[branchname] = (head, frozenset(c.oid.hex for c in walker))
+
+    index["branches"] = branches
+    index["commits"] = sum(len(commits) for _, commits in branches.values())
+    with _BRANCHES_INDEX_LOCK:
+        if index["commits"] <= _BRANCHES_INDEX_MAX_COMMITS:
+            _BRANCHES_INDEX[repo_obj.path] = index
+        total = sum(entry["commits"] for entry in _BRANCHES_INDEX.values())
+        # Drop the index of the repositories used the longest ago
+        while (
+            len(_BRANCHES_INDEX) > _BRANCHES_INDEX_SIZE
+            or total > _BRANCHES_INDEX_MAX_COMMITS
+        ):
+            total -= _BRANCHES_INDEX.popitem(last=False)[1]["commits"]
+
+    output = [
+        branchname
+        for branchname, (_, commits) in branches.items()
+        if commit_id in commits
+    ]
+    if not output and default:
+        output.append(default.branch_name)
+    return output
+
+
+# Name of the file, stored in the git repository, holding its commit stats
+COMMITS_STATS_FILE = "pagure_commits_stats.json"
+# Version of the format of the commit stats, bump it to force a rebuild
+COMMITS_STATS_VERSION = 1
+
+
+def load_commits_stats(repopath):
+    """Return the commit statistics stored in the specified git repository
+    or None if there are none (or they can not be read).
+
+    :arg repopath: the path of the git repository
+    :return: a dict as built by ``update_commits_stats`` or None
+
+    """
+    stats_file = os.path.join(repopath, COMMITS_STATS_FILE)
+    if not os.path.exists(stats_file):
+        return None
+
+    try:
+        with open(stats_file) as stream:
+            stats = json.load(stream)
+    except (IOError, OSError, ValueError):
+        _log.exception("Could not read the commit stats of %s", repopath)
+        return None
+
+    if stats.get("version") != COMMITS_STATS_VERSION:
+        return None
+    return stats
+
+
+def save_commits_stats(repopath, stats):
+    """Atomically store the commit statistics in the specified git
+    repository.
+
+    :arg repopath: the path of the git repository
+    :arg stats: the dict as built by ``update_commits_stats``
+
+    """
+    fd, tmpfile = tempfile.mkstemp(
+        prefix=COMMITS_STATS_FILE, dir=repopath, text=True
+    )
+    with os.fdopen(fd, "w") as stream:
+        json.dump(stats, stream)
+    os.rename(tmpfile, os.path.join(repopath, COMMITS_STATS_FILE))
+
+
+def update_commits_stats(repopath, create=True):
+    """Bring the commit statistics of the specified git repository up to
+    date with its HEAD and return them.
+
+    The statistics are stored in the repository, keyed by the last HEAD
+    they were computed for. If that commit is an ancestor of the current
+    HEAD, only the new commits are walked, otherwise (force-push, new
+    default branch...) the statistics are rebuilt from scratch.
+
+    :arg repopath: the path of the git repository
+    :kwarg create: whether to compute the statistics if none are stored
+        yet in the repository
+    :return: a dict containing the HEAD the statistics were computed for
+        (``head``), the number of commits (``commits``), the time of the
+        oldest commit walked (``last_commit_time``), a list of
+        ``[name, email, number of commits]`` (``authors``) and the number
+        of commits per day (``dates``), or None if there are no stored
+        statistics and ``create`` is False
+
+    """
+    stats = load_commits_stats(repopath)
+    if stats is None and not create:
+        return None
+
+    repo_obj = pygit2.Repository(repopath)
+    head = repo_obj.head.peel().oid.hex
+    if stats and stats["head"] == head:
+        return stats
+
+    if (
+        stats
+        and stats["head"] in repo_obj
+        and repo_obj.descendant_of(head, stats["head"])
+    ):
+        walker = repo_obj.walk(head, pygit2.GIT_SORT_NONE)
+        walker.hide(stats["head"])
+    else:
+        walker = repo_obj.walk(head, pygit2.GIT_SORT_NONE)
+        stats = {
+            "version": COMMITS_STATS_VERSION,
+            "head": None,
+            "commits": 0,
+            "last_commit_time": None,
+            "authors": [],
+            "dates": {},
+        }
+
+    authors = collections.OrderedDict(
+        ((name, email), cnt) for name, email, cnt in stats["authors"]
+    )
+    dates = stats["dates"]
+    commit = None
+    for commit in walker:
+        # For each commit record how many times each combination of name and
+        # e-mail appears in the git history.
+        stats["commits"] += 1
+        key = (commit.author.name, commit.author.email)
+        authors[key] = authors.get(key, 0) + 1
+        date = arrow.get(commit.commit_time).date().isoformat()
+        dates[date] = dates.get(date, 0) + 1
+
+    if stats["head"] is None and commit is not None:
+        stats["last_commit_time"] = commit.commit_time
+    stats["head"] = head
+    stats["authors"] = [
+        [name, email, cnt] for (name, email), cnt in authors.items()
+    ]
+
+    try:
+        save_commits_stats(repopath, stats)
+    except (IOError, OSError):
+        _log.exception("Could not store the commit stats of %s", repopath)
+
+    return stats
+
+
+# Name of the folder, stored in the git repository, holding the index of
+# the commits of its branches
+COMMITS_INDEX_FOLDER = "pagure_commits_index"
+# Version of the format of the commits index, bump it to force a rebuild
+COMMITS_INDEX_VERSION = 1
+# Size of the hash of a commit, as stored in the commits index
+_OID_SIZE = 20
+
+
+def _get_commits_index_file(repopath, branchname, extension):
+    """Return the path of the specified file of the commits index of a
+    branch.
+    """
+    return os.path.join(
+        repopath, COMMITS_INDEX_FOLDER, quote(branchname, safe="") + extension
+    )
+
+
+def _save_commits_index_file(repopath, branchname, extension, data):
+    """Atomically write the specified file of the commits index of a
+    branch.
+    """
+    filename = _get_commits_index_file(repopath, branchname, extension)
+    fd, tmpfile = tempfile.mkstemp(
+        prefix=os.path.basename(filename), dir=os.path.dirname(filename)
+    )
+    with os.fdopen(fd, "wb") as stream:
+        stream.write(data)
+    os.rename(tmpfile, filename)
+
+
+def load_commits_index(repopath, branchname):
+    """Return the description of the commits index of the specified branch
+    or None if there is none (or it can not be read).
+
+    :arg repopath: the path of the git repository
+    :arg branchname: the name of the branch
+    :return: a dict as built by ``update_commits_index`` or None
+
+    """
+    index_file = _get_commits_index_file(repopath, branchname, ".json")
+    if not os.path.exists(index_file):
+        return None
+
+    try:
+        with open(index_file) as stream:
+            index = json.load(stream)
+    except (IOError, OSError, ValueError):
+        _log.exception("Could not read the commits index of %s", repopath)
+        return None
+
+    if index.get("version") != COMMITS_INDEX_VERSION:
+        return None
+    return index
+
+
+def _load_commits_index_authors(repopath, branchname):
+    """Return the positions of the commits of each author, as stored in the
+    commits index of the specified branch.
+    """
+    with open(
+        _get_commits_index_file(repopath, branchname, ".authors")
+    ) as stream:
+        return json.load(stream)
+
+
+def update_commits_index(repopath, branchname, create=True):
+    """Bring the commits index of the specified branch up to date with its
+    head and return its description.
+
+    The index stores the hashes of all the commits of the branch, oldest
+    first, so a range of them can be read without walking the git history,
+    as well as the position of the commits of each author (by e-mail).
+    If the head it was built for is an ancestor of the current head of the
+    branch, only the new commits are walked and appended, otherwise
+    (force-push...) the index is rebuilt from scratch.
+
+    :arg repopath: the path of the git repository
+    :arg branchname: the name of the branch
+    :kwarg create: whether to build the index if there is none stored yet
+        in the repository
+    :return: a dict containing the head the index was built for (``head``)
+        and the number of commits (``count``), or None if the branch does
+        not exist or there is no stored index and ``create`` is False
+
+    """
+    index = load_commits_index(repopath, branchname)
+    if index is None and not create:
+        return None
+
+    repo_obj = pygit2.Repository(repopath)
+    branch = repo_obj.lookup_branch(branchname)
+    if branch is None:
+        return None
+    head = branch.peel(pygit2.Commit).oid.hex
+    if index and index["head"] == head:
+        return index
+
+    try:
+        folder = os.path.join(repopath, COMMITS_INDEX_FOLDER)
+        if not os.path.exists(folder):
+            os.mkdir(folder)
+        # The web application and the workers may update the index at the
+        # same time, the updates of a branch are serialized
+        with open(
+            _get_commits_index_file(repopath, branchname, ".lock"), "a"
+        ) as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                return _update_commits_index(
+                    repo_obj, repopath, branchname, head
+                )
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+    except (IOError, OSError):
+        _log.exception("Could not store the commits index of %s", repopath)
+        return None
+
+
+def _update_commits_index(repo_obj, repopath, branchname, head):
+    """Bring the commits index of the specified branch up to date with the
+    specified head, the caller holds the lock of the index.
+    """
+    # The index may have been updated while waiting for the lock
+    index = load_commits_index(repopath, branchname)
+    if index and index["head"] == head:
+        return index
+
+    walker = repo_obj.walk(
+        head,
+        pygit2.GIT_SORT_TOPOLOGICAL
+        | pygit2.GIT_SORT_TIME
+        | pygit2.GIT_SORT_REVERSE,
+    )
+    authors = None
+    if (
+        index
+        and index["head"] in repo_obj
+        and repo_obj.descendant_of(head, index["head"])
+    ):
+        try:
+            authors = _load_commits_index_authors(repopath, branchname)
+        except (IOError, OSError, ValueError):
+            _log.exception("Could not read the commits index of %s", repopath)
+    if authors is not None:
+        walker.hide(index["head"])
+    else:
+        index = {"version": COMMITS_INDEX_VERSION, "head": None, "count": 0}
+        authors = {}
+
+    oids = []
+    for position, commit in enumerate(walker, index["count"]):
+        oids.append(commit.oid.raw)
+        authors.setdefault(commit.author.email, []).append(position)
+
+    if index["head"] is None:
+        _save_commits_index_file(repopath, branchname, ".oids", b"".join(oids))
+    else:
+        # Readers only look at the number of commits the description of the
+        # index lists, so the new ones can be appended in place
+        with open(
+            _get_commits_index_file(repopath, branchname, ".oids"), "r+b"
+        ) as stream:
+            stream.truncate(index["count"] * _OID_SIZE)
+            stream.seek(0, os.SEEK_END)
+            stream.write(b"".join(oids))
+    index["head"] = head
+    index["count"] += len(oids)
+    _save_commits_index_file(
+        repopath,
+        branchname,
+        ".authors",
+        json.dumps(authors).encode("utf-8"),
+    )
+    _save_commits_index_file(
+        repopath, branchname, ".json", json.dumps(index).encode("utf-8")
+    )
+
+    return index
+
+
+def remove_commits_index(repopath, branchname):
+    """Remove the commits index of the specified branch, if there is one.
+
+    :arg repopath: the path of the git repository
+    :arg branchname: the name of the branch
+
+    """
+    for extension in (".json", ".authors", ".oids", ".lock"):
+        filename = _get_commits_index_file(repopath, branchname, extension)
+        if os.path.exists(filename):
+            os.unlink(filename)
+
+
+def get_commits_page(repo_obj, branchname, start, end, emails=None):
+    """Return the commits of the specified branch between the positions
+    ``start`` and ``end`` (both included), most recent first, using its
+    commits index (which is built or updated if needed).
+
+    :arg repo_obj: the git repository
+    :type repo_obj: pygit2.Repository
+    :arg branchname: the name of the branch
+    :arg start: the position of the first commit to return
+    :arg end: the position of the last commit to return
+    :kwarg emails: if specified, only the commits whose author has one of
+        these e-mail addresses are considered
+    :return: a tuple of the total number of commits considered and of the
+        list of pygit2.Commit, or None if the index could not be used
+    :return type: tuple
+
+    """
+    index = update_commits_index(repo_obj.path, branchname)
+    if index is None:
+        return None
+    count = index["count"]
+
+    try:
+        if emails is not None:
+            authors = _load_commits_index_authors(repo_obj.path, branchname)
+            positions = sorted(
+                (
+                    position
+                    for email in set(emails)
+                    for position in authors.get(email, [])
+                    if position < count
+                ),
+                reverse=True,
+            )
+            count = len(positions)
+
+        oids = []
+        with open(
+            _get_commits_index_file(repo_obj.path, branchname, ".oids"), "rb"
+        ) as stream:
+            # Check that the index was not rebuilt since it was loaded
+            stream.seek((index["count"] - 1) * _OID_SIZE)
+            if stream.read(_OID_SIZE) != pygit2.Oid(hex=index["head"]).raw:
+                return None
+
+            if emails is not None:
+                for position in positions[start : end + 1]:
+                    stream.seek(position * _OID_SIZE)
+                    oids.append(stream.read(_OID_SIZE))
+            else:
+                # The commits are stored oldest first
+                first = max(count - 1 - end, 0)
+                last = max(count - start, 0)
+                stream.seek(first * _OID_SIZE)
+                data = stream.read((last - first) * _OID_SIZE)
+                oids = [
+                    data[idx : idx + _OID_SIZE]
+                    for idx in range(0, len(data), _OID_SIZE)
+                ]
+                oids.reverse()
+    except (IOError, OSError, ValueError):
+        _log.exception("Could not read the commits index of %s", repo_obj.path)
+        return None
+
+    return count, [repo_obj[pygit2.Oid(raw=oid)] for oid in oids]
+
+
 def get_repo_info_from_path(gitdir, hide_notfound=False):
     """Returns the name, username, namespace and type of a git directory
 
@@ -2086,6 +2847,115 @@ def rebase_pull_request(session, request, username):
     return "Pull-request rebased"
 
 
+# Commits that are in a branch but not in another, see _get_diff_commits
+_DIFF_COMMITS_CACHE = collections.OrderedDict()
+_DIFF_COMMITS_CACHE_SIZE = 64
+
+
+def _get_diff_commits(repo_obj, orig_repo, from_sha, to_sha):
+    """Return the list of the commits of ``repo_obj`` reachable from the
+    commit ``from_sha`` but not from the commit ``to_sha`` of ``orig_repo``,
+    most recent first.
+
+    The commits are found walking from ``from_sha`` down to its merge base
+    with ``to_sha``, so this is linear in the number of commits returned.
+    Since commits are identified by their hash, the result only depends on
+    the two hashes and it is kept in memory for the next calls.
+
+    :arg repo_obj: the git repository having the ``from_sha`` commit
+    :type repo_obj: pygit2.Repository
+    :arg orig_repo: the git repository having the ``to_sha`` commit
+    :type orig_repo: pygit2.Repository
+    :arg from_sha: the hash of the head of the branch with the changes
+    :arg to_sha: the hash of the head of the branch to merge them into, if
+        None all the commits reachable from ``from_sha`` are returned
+    :return: the list of the commits, as pygit2.Commit of ``repo_obj``
+    :return type: list
+
+    """
+    key = (from_sha, to_sha)
+    commits = _DIFF_COMMITS_CACHE.pop(key, None)
+    if commits is None:
+        commits = _walk_diff_commits(repo_obj, orig_repo, from_sha, to_sha)
+    _DIFF_COMMITS_CACHE[key] = commits
+    while len(_DIFF_COMMITS_CACHE) > _DIFF_COMMITS_CACHE_SIZE:
+        _DIFF_COMMITS_CACHE.popitem(last=False)
+
+    return [repo_obj[commit] for commit in commits]
+
+
+def _walk_diff_commits(repo_obj, orig_repo, from_sha, to_sha):
+    """Walk the git history and return the hashes of the commits as
+    returned by _get_diff_commits.
+    """
+    if to_sha is None:
+        walker = repo_obj.walk(from_sha, pygit2.GIT_SORT_NONE)
+        return tuple(commit.oid.hex for commit in walker)
+
+    # Both commits need to be in the same repository to find their merge
+    # base, for a fork it usually is the fork itself
+    for repo in (repo_obj, orig_repo):
+        if from_sha in repo and to_sha in repo:
+            break
+    else:
+        return _walk_diff_commits_lockstep(
+            repo_obj, orig_repo, from_sha, to_sha
+        )
+
+    base = repo.merge_base(from_sha, to_sha)
+    if base is not None and base.hex == from_sha:
+        # Everything is already in the target branch
+        return ()
+
+    walker = repo.walk(from_sha, pygit2.GIT_SORT_NONE)
+    walker.hide(to_sha)
+    return tuple(commit.oid.hex for commit in walker)
+
+
+def _walk_diff_commits_lockstep(repo_obj, orig_repo, from_sha, to_sha):
+    """Find the commits as _walk_diff_commits does when the two commits are
+    not in the same repository: walk both branches at the same time until
+    one of them reaches a commit the other branch has.
+    """
+    main_walker = orig_repo.walk(to_sha, pygit2.GIT_SORT_NONE)
+    branch_walker = repo_obj.walk(from_sha, pygit2.GIT_SORT_NONE)
+
+    main_commits = set()
+    branch_commits = set()
+    diff_commits = []
+    main_done = branch_done = False
+    while not (main_done and branch_done):
+        if not main_done:
+            try:
+                commit = next(main_walker).oid.hex
+            except StopIteration:
+                main_done = True
+            else:
+                main_commits.add(commit)
+                if commit in branch_commits:
+                    break
+
+        if not branch_done:
+            try:
+                commit = next(branch_walker).oid.hex
+            except StopIteration:
+                branch_done = True
+            else:
+                branch_commits.add(commit)
+                diff_commits.append(commit)
+                if commit in main_commits:
+                    break
+
+    # If master is ahead of branch, we need to remove the commits
+    # that are after the first one found in master
+    for idx, commit in enumerate(diff_commits):
+        if commit in main_commits:
+            diff_commits = diff_commits[:idx]
+            break
+
+    return tuple(diff_commits)
+
+
 def get_diff_info(repo_obj, orig_repo, branch_from, branch_to, prid=None):
     """Return the info needed to see a diff or make a Pull-Request between
     the two specified repo.
@@ -2157,51 +3027,14 @@ def get_diff_info(repo_obj, orig_repo, branch_from, branch_to, prid=None):
         )
         if branch:
             orig_commit = orig_repo[branch.peel().hex]
-            main_walker = orig_repo.walk(
-                orig_commit.oid.hex, pygit2.GIT_SORT_NONE
-            )
 
-        repo_commit = repo_obj[commitid]
-        branch_walker = repo_obj.walk(
-            repo_commit.oid.hex, pygit2.GIT_SORT_NONE
+        diff_commits = _get_diff_commits(
+            repo_obj,
+            orig_repo,
+            commitid,
+            orig_commit.oid.hex if orig_commit else None,
         )
 
-        main_commits = set()
-        branch_commits = set()
-
-        while 1:
-            com = None
-            if branch:
-                try:
-                    com = next(main_walker)
-                    main_commits.add(com.oid.hex)
-                except StopIteration:
-                    com = None
-
-            try:
-                branch_commit = next(branch_walker)
-            except StopIteration:
-                branch_commit = None
-
-            # We sure never end up here but better safe than sorry
-            if com is None and branch_commit is None:
-                break
-
-            if branch_commit:
-                branch_commits.add(branch_commit.oid.hex)
-                diff_commits.append(branch_commit)
-            if main_commits.intersection(branch_commits):
-                break
-
-        # If master is ahead of branch, we need to remove the commits
-        # that are after the first one found in master
-        i = 0
-        if diff_commits and main_commits:
-            for i in range(len(diff_commits)):
-                if diff_commits[i].oid.hex in main_commits:
-                    break
-            diff_commits = diff_commits[:i]
-
         _log.debug("Diff commits: %s", diff_commits)
         if diff_commits:
             first_commit = repo_obj[diff_commits[-1].oid.hex]
@@ -3000,6 +3833,246 @@ def get_stats_patch(patch):
     return output
 
 
+ARCHIVE_FORMATS = ["tar", "tar.gz", "zip"]
+
+
+class _ArchiveSink(object):
+    """Write-only file-like object collecting what the archive writers
+    write, for it to be handed over as soon as an entry is written."""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        """Return what was written since the last call and forget it."""
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def _walk_archive_tree(repo_obj, tree, path):
+    """Yield the path and entry of every object of the specified tree,
+    recursively, each folder before its content."""
+    for entry in tree:
+        entry_path = "%s/%s" % (path, entry.name)
+        yield entry_path, entry
+        if entry.filemode == pygit2.GIT_FILEMODE_TREE:
+            for item in _walk_archive_tree(
+                repo_obj, repo_obj[entry.id], entry_path
+            ):
+                yield item
+
+
+def stream_archive(repo_obj, commit, name, archive_fmt):
+    """Generate the archive of the specified commit, reading the files
+    directly from the objects of the git repository (no clone, no
+    checkout), and yield it as it is written, entry after entry.
+
+    Args:
+        repo_obj (pygit2.Repository): the git repository of the project
+        commit (str): the commit hash to generate the archive of
+        name (str): the name of the folder the files are in, in the archive
+        archive_fmt (str): the format of the archive to generate, can be
+            either tar, tar.gz or zip
+    Returns: a generator of the chunks of bytes of the archive
+    Raises (pagure.exceptions.PagureException): if an un-supported archive
+        format is specified
+
+    """
+    if archive_fmt not in ARCHIVE_FORMATS:
+        raise pagure.exceptions.PagureException(
+            "Un-support archive format requested: %s" % archive_fmt
+        )
+    commit_obj = repo_obj[commit].peel(pygit2.Commit)
+
+    def _generate():
+        sink = _ArchiveSink()
+        entries = _walk_archive_tree(repo_obj, commit_obj.tree, name)
+        if archive_fmt == "zip":
+            archive = _write_zip_entries(
+                sink, repo_obj, commit_obj, name, entries
+            )
+        else:
+            archive = _write_tar_entries(
+                sink, repo_obj, commit_obj, name, entries, archive_fmt
+            )
+        for _ in archive:
+            data = sink.drain()
+            if data:
+                yield data
+        data = sink.drain()
+        if data:
+            yield data
+
+    return _generate()
+
+
+def _write_tar_entries(sink, repo_obj, commit_obj, name, entries, fmt):
+    """Write the entries to a tar archive in the sink, yielding after each
+    of them."""
+    mode = "w|gz" if fmt == "tar.gz" else "w|"
+    with tarfile.open(fileobj=sink, mode=mode) as tar:
+
+        def _info(path, filemode, size=0):
+            info = tarfile.TarInfo(path)
+            info.mtime = commit_obj.commit_time
+            info.size = size
+            if filemode == pygit2.GIT_FILEMODE_LINK:
+                info.type = tarfile.SYMTYPE
+                info.mode = 0o777
+            elif filemode == pygit2.GIT_FILEMODE_BLOB_EXECUTABLE:
+                info.mode = 0o755
+            elif filemode == pygit2.GIT_FILEMODE_BLOB:
+                info.mode = 0o644
+            else:
+                info.type = tarfile.DIRTYPE
+                info.mode = 0o755
+            return info
+
+        tar.addfile(_info(name, pygit2.GIT_FILEMODE_TREE))
+        yield
+        for path, entry in entries:
+            if entry.filemode == pygit2.GIT_FILEMODE_LINK:
+                info = _info(path, entry.filemode)
+                # Keep the bytes of targets that are not valid UTF-8
+                info.linkname = repo_obj[entry.id].data.decode(
+                    "utf-8", "surrogateescape"
+                )
+                tar.addfile(info)
+            elif entry.filemode in (
+                pygit2.GIT_FILEMODE_BLOB,
+                pygit2.GIT_FILEMODE_BLOB_EXECUTABLE,
+            ):
+                data = repo_obj[entry.id].data
+                tar.addfile(
+                    _info(path, entry.filemode, len(data)),
+                    six.BytesIO(data),
+                )
+            else:
+                # Folders, and submodules which are left empty
+                tar.addfile(_info(path, pygit2.GIT_FILEMODE_TREE))
+            yield
+    yield
+
+
+def _write_zip_entries(sink, repo_obj, commit_obj, name, entries):
+    """Write the entries to a zip archive in the sink, yielding after each
+    of them."""
+    # The zip format does not support the dates before 1980
+    commit_time = datetime.datetime.utcfromtimestamp(commit_obj.commit_time)
+    date_time = max(commit_time.timetuple()[:6], (1980, 1, 1, 0, 0, 0))
+
+    def _info(path, filemode):
+        info = zipfile.ZipInfo(path, date_time=date_time)
+        if filemode in (
+            pygit2.GIT_FILEMODE_BLOB,
+            pygit2.GIT_FILEMODE_BLOB_EXECUTABLE,
+            pygit2.GIT_FILEMODE_LINK,
+        ):
+            info.compress_type = zipfile.ZIP_DEFLATED
+            info.external_attr = (
+                0o120777 if filemode == pygit2.GIT_FILEMODE_LINK else filemode
+            ) << 16
+        else:
+            info.filename = path + "/"
+            info.external_attr = (0o40755 << 16) | 0x10
+        return info
+
+    with zipfile.ZipFile(sink, "w") as zipstream:
+        zipstream.writestr(_info(name, pygit2.GIT_FILEMODE_TREE), b"")
+        yield
+        for path, entry in entries:
+            if entry.filemode in (
+                pygit2.GIT_FILEMODE_BLOB,
+                pygit2.GIT_FILEMODE_BLOB_EXECUTABLE,
+                pygit2.GIT_FILEMODE_LINK,
+            ):
+                data = repo_obj[entry.id].data
+            else:
+                data = b""
+            zipstream.writestr(_info(path, entry.filemode), data)
+            yield
+    yield
+
+
+def _read_umask():
+    """Return the umask of the process.
+
+    It is read from /proc when available, otherwise it can only be read by
+    setting it, which is only done when this module is imported, before
+    any other thread creates files.
+    """
+    try:
+        with open("/proc/self/status") as stream:
+            for line in stream:
+                if line.startswith("Umask:"):
+                    return int(line.split()[1], 8)
+    except (IOError, OSError, ValueError, IndexError):
+        pass
+    umask = os.umask(0o022)
+    os.umask(umask)
+    return umask
+
+
+_UMASK = _read_umask()
+
+
+def save_archive(chunks, fullpath):
+    """Write the chunks of an archive to the specified file, yielding them
+    as they are written so the archive can be sent to a client at the same
+    time.
+
+    The archive is written to a temporary file, renamed once complete, so
+    an incomplete archive is never served.
+
+    """
+    fd, tmpfile = tempfile.mkstemp(
+        prefix=".%s" % os.path.basename(fullpath),
+        dir=os.path.dirname(fullpath),
+    )
+    try:
+        with os.fdopen(fd, "wb") as stream:
+            # mkstemp creates the file readable by its owner only, give the
+            # archive the permissions of any file created by the process
+            os.fchmod(stream.fileno(), 0o666 & ~_UMASK)
+            for chunk in chunks:
+                stream.write(chunk)
+                yield chunk
+        os.rename(tmpfile, fullpath)
+    finally:
+        if os.path.exists(tmpfile):
+            os.unlink(tmpfile)
+
+
+def get_archive_path(project, commit, tag, name, archive_fmt):
+    """Return the path at which the archive of the specified project on the
+    specified commit is stored, creating its folder if needed."""
+    archive_folder = pagure_config.get("ARCHIVE_FOLDER")
+
+    tag_path = ""
+    if tag:
+        tag_path = os.path.join("tags", tag)
+    target_path = os.path.join(
+        archive_folder, project.fullname, tag_path, commit
+    )
+    if not os.path.exists(target_path):
+        _log.info("Creating folder: %s", target_path)
+        os.makedirs(target_path)
+    return os.path.join(target_path, "%s.%s" % (name, archive_fmt))
+
+
 def generate_archive(project, commit, tag, name, archive_fmt):
     """Generate the desired archive of the specified project for the
     specified commit with the given name and archive format.
@@ -3010,69 +4083,31 @@ def generate_archive(project, commit, tag, name, archive_fmt):
         commit (str): the commit hash to generate the archive of
         name (str): the name to give to the archive
         archive_fmt (str): the format of the archive to generate, can be
-            either gzip or tag or tar.gz
+            either tar, tar.gz or zip
     Returns: None
     Raises (pagure.exceptions.PagureException): if an un-supported archive
         format is specified
 
     """
-
-    def _exclude_git(filename):
-        return ".git" in filename
-
-    with TemporaryClone(project, "main", "archive", parent=name) as tempclone:
-        repo_obj = tempclone.repo
-        commit_obj = repo_obj[commit]
-        repo_obj.checkout_tree(commit_obj.tree)
-        archive_folder = pagure_config.get("ARCHIVE_FOLDER")
-
-        tag_path = ""
-        if tag:
-            tag_path = os.path.join("tags", tag)
-        target_path = os.path.join(
-            archive_folder, project.fullname, tag_path, commit
+    if archive_fmt not in ARCHIVE_FORMATS:
+        raise pagure.exceptions.PagureException(
+            "Un-support archive format requested: %s" % archive_fmt
         )
-        if not os.path.exists(target_path):
-            _log.info("Creating folder: %s", target_path)
-            os.makedirs(target_path)
-        fullpath = os.path.join(target_path, name)
-
-        if archive_fmt == "tar":
-            with tarfile.open(name=fullpath + ".tar", mode="w") as tar:
-                tar.add(
-                    name=tempclone.repopath, exclude=_exclude_git, arcname=name
-                )
-        elif archive_fmt == "tar.gz":
-            with tarfile.open(name=fullpath + ".tar.gz", mode="w:gz") as tar:
-                tar.add(
-                    name=tempclone.repopath, exclude=_exclude_git, arcname=name
-                )
-        elif archive_fmt == "zip":
-            # Code from /usr/lib64/python2.7/zipfile.py adjusted for our
-            # needs
-            def addToZip(zf, path, zippath):
-                if _exclude_git(path):
-                    return
-                if os.path.isfile(path):
-                    zf.write(path, zippath, zipfile.ZIP_DEFLATED)
-                elif os.path.isdir(path):
-                    if zippath:
-                        zf.write(path, zippath)
-                    for nm in os.listdir(path):
-                        if _exclude_git(path):
-                            continue
-                        addToZip(
-                            zf,
-                            os.path.join(path, nm),
-                            os.path.join(zippath, nm),
-                        )
 
-            with zipfile.ZipFile(fullpath + ".zip", "w") as zipstream:
-                addToZip(zipstream, tempclone.repopath, name)
-        else:
-            raise pagure.exceptions.PagureException(
-                "Un-support archive format requested: %s", archive_fmt
-            )
+    fullpath = get_archive_path(project, commit, tag, name, archive_fmt)
+    if project.is_on_repospanner:
+        # There is no local copy of the repository to read the objects from
+        with TemporaryClone(
+            project, "main", "archive", parent=name
+        ) as tempclone:
+            chunks = stream_archive(tempclone.repo, commit, name, archive_fmt)
+            for _ in save_archive(chunks, fullpath):
+                pass
+    else:
+        repo_obj = pygit2.Repository(project.repopath("main"))
+        chunks = stream_archive(repo_obj, commit, name, archive_fmt)
+        for _ in save_archive(chunks, fullpath):
+            pass
 
 
 def mirror_pull_project(session, project, debug=False):
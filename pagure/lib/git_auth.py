@@ -18,6 +18,7 @@ import subprocess
 import tempfile
 from io import open
 
+import sqlalchemy.orm
 import werkzeug.utils
 from six import with_metaclass
 from six.moves import dbm_gnu
@@ -73,6 +74,7 @@ def get_git_auth_helper(backend=None):
             "test_auth": GitAuthTestHelper,
             "gitolite2": Gitolite2Auth,
             "gitolite3": Gitolite3Auth,
+            "gitolite3_fragments": Gitolite3FragmentsAuth,
             "pagure": PagureGitAuth,
             "pagure_authorized_keys": PagureGitAuth,
         }[backend]
@@ -279,6 +281,42 @@ class Gitolite2Auth(GitAuthHelper):
 
         return config
 
+    @classmethod
+    def _iter_projects(cls, session, batch_size=1000):
+        """Iterate over all the projects, ordered by id, loading them by
+        batches with the relations used by ``_process_project`` eagerly
+        loaded.
+
+        :arg session: the session with which to connect to the database
+        :kwarg batch_size: the number of projects to load per query
+        :type batch_size: int
+
+        """
+        query = (
+            session.query(model.Project)
+            .options(
+                sqlalchemy.orm.selectinload(model.Project.user),
+                sqlalchemy.orm.selectinload(model.Project.committers),
+                sqlalchemy.orm.selectinload(model.Project.committer_groups),
+                sqlalchemy.orm.selectinload(model.Project.deploykeys),
+            )
+            .order_by(model.Project.id)
+        )
+        last_id = None
+        while True:
+            batch = query
+            if last_id is not None:
+                batch = batch.filter(model.Project.id > last_id)
+            projects = batch.limit(batch_size).all()
+            if not projects:
+                break
+            for project in projects:
+                yield project
+            last_id = projects[-1].id
+            # Do not keep the projects already processed in memory
+            for project in projects:
+                session.expunge(project)
+
     @classmethod
     def _clean_current_config(cls, current_config, project):
         """Remove the specified project from the current configuration file
@@ -487,8 +525,7 @@ class Gitolite2Auth(GitAuthHelper):
 
         if project == -1 or not os.path.exists(configfile):
             _log.info("Refreshing the configuration for all projects")
-            query = session.query(model.Project).order_by(model.Project.id)
-            for project in query.all():
+            for project in cls._iter_projects(session):
                 config = cls._process_project(project, config, global_pr_only)
         elif project:
             _log.info("Refreshing the configuration for one project")
@@ -851,6 +888,202 @@ class Gitolite3Auth(Gitolite2Auth):
             cls._run_gitolite_cmd(cmd)
 
 
+class Gitolite3FragmentsAuth(Gitolite3Auth):
+    """A gitolite 3 authentication module storing the configuration of
+    each project in its own file.
+
+    The gitolite configuration file only contains the header, the groups
+    and an ``include`` of the per-project files, which are stored in the
+    ``GITOLITE_FRAGMENTS_FOLDER`` folder. Updating the ACLs of a single
+    project thus only writes the file of this project.
+    """
+
+    @staticmethod
+    def _get_fragments_folder(configfile):
+        """Return the folder holding the configuration of each project.
+
+        :arg configfile: the path to the gitolite configuration file
+        :type configfile: str
+
+        """
+        return pagure_config.get("GITOLITE_FRAGMENTS_FOLDER") or os.path.join(
+            os.path.dirname(configfile), "pagure"
+        )
+
+    @staticmethod
+    def _get_fragment_name(project):
+        """Return the name of the file holding the configuration of the
+        specified project, in the fragments folder.
+
+        The file is named after the identifier of the project rather than
+        its name, so that renaming or moving the project replaces its
+        configuration instead of leaving the previous one in place.
+
+        :arg project: the project to get the configuration file of
+        :type project: pagure.lib.model.Project
+
+        """
+        return "%s.conf" % project.id
+
+    @classmethod
+    def _write_fragment(cls, folder, project, global_pr_only):
+        """Write the gitolite configuration of the specified project in its
+        own file.
+
+        :arg folder: the folder holding the configuration of each project
+        :type folder: str
+        :arg project: the project to write the configuration of
+        :type project: pagure.lib.model.Project
+        :arg global_pr_only: boolean on whether the pagure instance enforces
+            the PR workflow only or not
+        :type global_pr_only: bool
+        :return: the name of the file written
+        :return type: str
+
+        """
+        name = cls._get_fragment_name(project)
+        config = cls._process_project(project, [], global_pr_only)
+        fd, tmpfile = tempfile.mkstemp(prefix=".%s" % name, dir=folder)
+        with open(fd, "w", encoding="utf-8") as stream:
+            for row in config:
+                stream.write(row + "\n")
+        os.rename(tmpfile, os.path.join(folder, name))
+        return name
+
+    @classmethod
+    def _write_main_config(
+        cls, session, configfile, folder, preconfig=None, postconfig=None
+    ):
+        """Write the gitolite configuration file, including the groups and
+        the configuration of each project.
+
+        :arg session: the session with which to connect to the database
+        :arg configfile: the name of the configuration file to write
+        :type configfile: str
+        :arg folder: the folder holding the configuration of each project
+        :type folder: str
+        :kwarg preconfig: the content to include at the top of the file
+        :type preconfig: None or str
+        :kwarg postconfig: the content to include at the bottom of the file
+        :type postconfig: None or str
+
+        """
+        groups = cls._generate_groups_config(session)
+
+        include = os.path.relpath(folder, os.path.dirname(configfile))
+        if include.startswith(os.pardir):
+            include = folder
+
+        _log.info("Writing the configuration to: %s", configfile)
+        with open(configfile, "w", encoding="utf-8") as stream:
+            if preconfig:
+                stream.write(preconfig + "\n")
+                stream.write("# end of header\n")
+
+            if groups:
+                for key in sorted(groups):
+                    stream.write("@%s  = %s\n" % (key, " ".join(groups[key])))
+                stream.write("# end of groups\n\n")
+
+            stream.write('include "%s"\n\n' % os.path.join(include, "*.conf"))
+            stream.write("# end of body\n")
+
+            if postconfig:
+                stream.write(postconfig + "\n")
+
+    @classmethod
+    def write_gitolite_acls(
+        cls,
+        session,
+        configfile,
+        project,
+        preconf=None,
+        postconf=None,
+        group=None,
+    ):
+        """Generate the configuration files for gitolite.
+
+        :arg cls: the current class
+        :type: Gitolite3FragmentsAuth
+        :arg session: a session to connect to the database with
+        :arg configfile: the name of the configuration file to generate/write
+        :type configfile: str
+        :arg project: the project to update in the gitolite configuration.
+            It can be of three types/values.
+            If it is ``-1`` or if the file does not exist on disk, the
+            configuration of every project is re-generated.
+            If it is ``None``, only the groups information is updated.
+            If it is a ``pagure.lib.model.Project``, only the configuration
+            file of this project is updated.
+        :type project: None, int or spagure.lib.model.Project
+        :kwarg preconf: a file to include at the top of the configuration
+            file
+        :type preconf: None or str
+        :kwarg postconf: a file to include at the bottom of the
+            configuration file
+        :type postconf: None or str
+        :kwarg group: the group to refresh the members of
+        :type group: None or pagure.lib.model.PagureGroup
+
+        """
+        _log.info("Write down the gitolite configuration files")
+
+        folder = cls._get_fragments_folder(configfile)
+        if not os.path.exists(folder):
+            os.makedirs(folder)
+
+        global_pr_only = pagure_config.get("PR_ONLY", False)
+        full_refresh = project == -1 or not os.path.exists(configfile)
+        if full_refresh:
+            _log.info("Refreshing the configuration for all projects")
+            names = set()
+            for proj in cls._iter_projects(session):
+                names.add(cls._write_fragment(folder, proj, global_pr_only))
+            for name in os.listdir(folder):
+                if name.endswith(".conf") and name not in names:
+                    os.unlink(os.path.join(folder, name))
+        elif project:
+            _log.info("Refreshing the configuration for one project")
+            cls._write_fragment(folder, project, global_pr_only)
+
+        if full_refresh or not project or group is not None:
+            preconfig = _read_file(preconf) if preconf else None
+            postconfig = _read_file(postconf) if postconf else None
+            cls._write_main_config(
+                session, configfile, folder, preconfig, postconfig
+            )
+
+    @classmethod
+    def remove_acls(cls, session, project):
+        """Remove a project from the configuration for gitolite.
+
+        :arg cls: the current class
+        :type: Gitolite3FragmentsAuth
+        :arg session: the session with which to connect to the database
+        :arg project: the project to remove from the gitolite configuration
+        :type project: pagure.lib.model.Project
+
+        """
+        _log.info("Remove project from the gitolite configuration")
+
+        if not project:
+            raise RuntimeError("Project undefined")
+
+        configfile = pagure_config["GITOLITE_CONFIG"]
+        fragment = os.path.join(
+            cls._get_fragments_folder(configfile),
+            cls._get_fragment_name(project),
+        )
+        if os.path.exists(fragment):
+            os.unlink(fragment)
+
+        gl_cache_path = os.path.join(
+            os.path.dirname(configfile), "..", "gl-conf.cache"
+        )
+        if os.path.exists(gl_cache_path):
+            cls._remove_from_gitolite_cache(gl_cache_path, project)
+
+
 class PagureGitAuth(GitAuthHelper):
     """Standard Pagure git auth implementation."""
 
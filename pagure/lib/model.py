@@ -48,6 +48,21 @@ _log = logging.getLogger(__name__)
 # pylint: disable=too-many-lines
 
 
+def _copy_json(value):
+    """Return a copy of the dicts and lists of a value loaded from JSON."""
+    if isinstance(value, dict):
+        return {
+            key: _copy_json(val) if isinstance(val, (dict, list)) else val
+            for key, val in value.items()
+        }
+    elif isinstance(value, list):
+        return [
+            _copy_json(val) if isinstance(val, (dict, list)) else val
+            for val in value
+        ]
+    return value
+
+
 def create_tables(db_url, alembic_ini=None, acls=None, debug=False):
     """Create the tables in the database using the information from the
     url obtained.
@@ -668,10 +683,34 @@ class Project(BASE):
         """Return the list of tags in a simple text form."""
         return [tag.tag for tag in self.tags]
 
-    @property
-    def settings(self):
-        """Return the dict stored as string in the database as an actual
-        dict object.
+    def _get_json(self, name, default, convert=None):
+        """Return the value stored as JSON text in the ``_<name>`` column,
+        ``default`` if it is empty.
+
+        The text is only parsed (and the ``convert`` function applied to
+        the result) once for as long as the column keeps the same value,
+        a copy of it is returned so callers can still modify it before
+        saving it back.
+        """
+        raw = getattr(self, "_%s" % name)
+        cache = self.__dict__.setdefault("_json_cache", {})
+        cached = cache.get(name)
+        if cached is None or cached[0] != raw:
+            value = json.loads(raw) if raw else default
+            if convert is not None:
+                value = convert(value)
+            cached = cache[name] = (raw, value)
+        return _copy_json(cached[1])
+
+    def _set_json(self, name, value):
+        """Store the value as JSON text in the ``_<name>`` column."""
+        self.__dict__.get("_json_cache", {}).pop(name, None)
+        setattr(self, "_%s" % name, json.dumps(value))
+
+    @staticmethod
+    def _normalize_settings(current):
+        """Return the settings with the missing keys set to their default
+        value and the unknown ones removed.
         """
         default = {
             "issue_tracker": True,
@@ -694,174 +733,138 @@ class Project(BASE):
             "open_metadata_access_to_all": False,
         }
 
-        if self._settings:
-            current = json.loads(self._settings)
-            # Update the current dict with the new keys
-            for key in default:
-                if key not in current:
-                    current[key] = default[key]
-                elif key == "Minimum_score_to_merge_pull-request":
-                    current[key] = int(current[key])
-                elif is_true(current[key]):
-                    current[key] = True
-            # Update the current dict, removing the old keys
-            for key in sorted(current):
-                if key not in default:
-                    del current[key]
-            return current
-        else:
-            return default
+        # Update the current dict with the new keys
+        for key in default:
+            if key not in current:
+                current[key] = default[key]
+            elif key == "Minimum_score_to_merge_pull-request":
+                current[key] = int(current[key])
+            elif is_true(current[key]):
+                current[key] = True
+        # Update the current dict, removing the old keys
+        for key in sorted(current):
+            if key not in default:
+                del current[key]
+        return current
+
+    @property
+    def settings(self):
+        """Return the dict stored as string in the database as an actual
+        dict object.
+        """
+        return self._get_json("settings", {}, self._normalize_settings)
 
     @settings.setter
     def settings(self, settings):
         """Ensures the settings are properly saved."""
-        self._settings = json.dumps(settings)
+        self._set_json("settings", settings)
 
     @property
     def milestones(self):
         """Return the dict stored as string in the database as an actual
         dict object.
         """
-        milestones = {}
-
-        if self._milestones:
 
-            def _convert_to_dict(value):
-                if isinstance(value, dict):
-                    return value
-                else:
-                    return {"date": value, "active": True}
-
-            milestones = dict(
-                [
-                    (k, _convert_to_dict(v))
-                    for k, v in json.loads(self._milestones).items()
-                ]
-            )
-
-        return milestones
+        def _convert_to_dict(value):
+            if isinstance(value, dict):
+                return value
+            else:
+                return {"date": value, "active": True}
+
+        return self._get_json(
+            "milestones",
+            {},
+            lambda milestones: dict(
+                [(k, _convert_to_dict(v)) for k, v in milestones.items()]
+            ),
+        )
 
     @milestones.setter
     def milestones(self, milestones):
         """Ensures the milestones are properly saved."""
-        self._milestones = json.dumps(milestones)
+        self._set_json("milestones", milestones)
 
     @property
     def milestones_keys(self):
         """Return the list of milestones so we can keep the order consistent."""
-        milestones_keys = {}
-
-        if self._milestones_keys:
-            milestones_keys = json.loads(self._milestones_keys)
-
-        return milestones_keys
+        return self._get_json("milestones_keys", {})
 
     @milestones_keys.setter
     def milestones_keys(self, milestones_keys):
         """Ensures the milestones keys are properly saved."""
-        self._milestones_keys = json.dumps(milestones_keys)
+        self._set_json("milestones_keys", milestones_keys)
 
     @property
     def priorities(self):
         """Return the dict stored as string in the database as an actual
         dict object.
         """
-        priorities = {}
-
-        if self._priorities:
-            priorities = json.loads(self._priorities)
-
-        return priorities
+        return self._get_json("priorities", {})
 
     @priorities.setter
     def priorities(self, priorities):
         """Ensures the priorities are properly saved."""
-        self._priorities = json.dumps(priorities)
+        self._set_json("priorities", priorities)
 
     @property
     def block_users(self):
         """Return the dict stored as string in the database as an actual
         dict object.
         """
-        block_users = []
-
-        if self._block_users:
-            block_users = json.loads(self._block_users)
-
-        return block_users
+        return self._get_json("block_users", [])
 
     @block_users.setter
     def block_users(self, block_users):
         """Ensures the block_users are properly saved."""
-        self._block_users = json.dumps(block_users)
+        self._set_json("block_users", block_users)
 
     @property
     def quick_replies(self):
         """Return a list of quick replies available for pull requests and
         issues.
         """
-        quick_replies = []
-
-        if self._quick_replies:
-            quick_replies = json.loads(self._quick_replies)
-
-        return quick_replies
+        return self._get_json("quick_replies", [])
 
     @quick_replies.setter
     def quick_replies(self, quick_replies):
         """Ensures the quick replies are properly saved."""
-        self._quick_replies = json.dumps(quick_replies)
+        self._set_json("quick_replies", quick_replies)
 
     @property
     def notifications(self):
         """Return the dict stored as string in the database as an actual
         dict object.
         """
-        notifications = {}
-
-        if self._notifications:
-            notifications = json.loads(self._notifications)
-
-        return notifications
+        return self._get_json("notifications", {})
 
     @notifications.setter
     def notifications(self, notifications):
         """Ensures the notifications are properly saved."""
-        self._notifications = json.dumps(notifications)
+        self._set_json("notifications", notifications)
 
     @property
     def reports(self):
         """Return the dict stored as string in the database as an actual
         dict object.
         """
-        reports = {}
-
-        if self._reports:
-            reports = json.loads(self._reports)
-
-        return reports
+        return self._get_json("reports", {})
 
     @reports.setter
     def reports(self, reports):
         """Ensures the reports are properly saved."""
-        self._reports = json.dumps(reports)
+        self._set_json("reports", reports)
 
     @property
     def close_status(self):
         """Return the dict stored as string in the database as an actual
         dict object.
         """
-        close_status = []
-
-        if self._close_status:
-            close_status = json.loads(self._close_status)
-
-        return close_status
+        return self._get_json("close_status", [])
 
     @close_status.setter
     def close_status(self, close_status):
         """Ensures the different close status are properly saved."""
-        self._close_status = json.dumps(close_status)
+        self._set_json("close_status", close_status)
 
     @property
     def open_requests(self):
@@ -1135,6 +1138,24 @@ class Project(BASE):
         return output
 
 
+@sa.event.listens_for(Project, "expire")
+def _project_expired(target, attrs):
+    """Drop the parsed values of the JSON text columns of a project when
+    its attributes are expired.
+    """
+    # The project may have been garbage collected already
+    if target is not None:
+        target.__dict__.pop("_json_cache", None)
+
+
+@sa.event.listens_for(Project, "refresh")
+def _project_refreshed(target, context, attrs):
+    """Drop the parsed values of the JSON text columns of a project when
+    its attributes are loaded again from the database.
+    """
+    target.__dict__.pop("_json_cache", None)
+
+
 class ProjectLock(BASE):
     """Table used to define project-specific locks.
 
@@ -1332,6 +1353,12 @@ class Issue(BASE):
     """
 
     __tablename__ = "issues"
+    __table_args__ = (
+        sa.Index(
+            "ix_issues_project_id_date_created", "project_id", "date_created"
+        ),
+        sa.Index("ix_issues_project_id_closed_at", "project_id", "closed_at"),
+    )
 
     id = sa.Column(sa.Integer, primary_key=True)
     uid = sa.Column(sa.String(32), unique=True, nullable=False)
@@ -22,6 +22,7 @@ import logging
 import os
 import re
 import smtplib
+import threading
 import time
 import six
 import ssl
@@ -399,6 +400,18 @@ def _fullname_to_url(fullname):
     return fullname
 
 
+# Counters of the emails sent by this process
+MAIL_STATS = {
+    "messages": 0,
+    "recipients": 0,
+    "failures": 0,
+    "connections": 0,
+    "total_time": 0.0,
+}
+# Connection to the SMTP server kept open between two emails, per thread
+_SMTP = threading.local()
+
+
 def send_email(
     text,
     subject,
@@ -412,6 +425,9 @@ def send_email(
 ):  # pragma: no cover
     """Send an email with the specified information.
 
+    If ``EMAIL_ASYNC`` is set, the email is only queued here and sent by
+    the mail workers, see ``deliver_email``.
+
     :arg text: the content of the email to send
     :type text: unicode
     :arg subject: the subject of the email
@@ -426,6 +442,92 @@ def send_email(
     if not to_mail:
         return
 
+    if pagure_config.get("EMAIL_ASYNC", False):
+        pagure.lib.tasks_services.send_email.delay(
+            text,
+            subject,
+            to_mail,
+            mail_id=mail_id,
+            in_reply_to=in_reply_to,
+            project_name=project_name,
+            user_from=user_from,
+            reporter=reporter,
+            assignee=assignee,
+        )
+        return
+
+    return deliver_email(
+        text,
+        subject,
+        to_mail,
+        mail_id=mail_id,
+        in_reply_to=in_reply_to,
+        project_name=project_name,
+        user_from=user_from,
+        reporter=reporter,
+        assignee=assignee,
+    )
+
+
+def _connect_smtp():
+    """Open a new connection to the SMTP server, secure it and authenticate
+    on it as configured, and return it."""
+    if pagure_config["SMTP_SSL"]:
+        smtp = smtplib.SMTP_SSL(
+            pagure_config["SMTP_SERVER"], pagure_config["SMTP_PORT"]
+        )
+    else:
+        smtp = smtplib.SMTP(
+            pagure_config["SMTP_SERVER"], pagure_config["SMTP_PORT"]
+        )
+
+    if pagure_config.get("SMTP_STARTTLS"):
+        context = ssl.create_default_context()
+        keyfile = pagure_config.get("SMTP_KEYFILE") or None
+        certfile = pagure_config.get("SMTP_CERTFILE") or None
+        respcode, _ = smtp.starttls(
+            keyfile=keyfile, certfile=certfile, context=context
+        )
+        if respcode != 220:
+            _log.warning(
+                "The starttls command did not return the 220 "
+                "response code expected."
+            )
+
+    if pagure_config["SMTP_USERNAME"] and pagure_config["SMTP_PASSWORD"]:
+        smtp.login(
+            pagure_config["SMTP_USERNAME"], pagure_config["SMTP_PASSWORD"]
+        )
+
+    MAIL_STATS["connections"] += 1
+    return smtp
+
+
+def deliver_email(
+    text,
+    subject,
+    to_mail,
+    mail_id=None,
+    in_reply_to=None,
+    project_name=None,
+    user_from=None,
+    reporter=None,
+    assignee=None,
+    keep_connection=False,
+):  # pragma: no cover
+    """Send an email with the specified information to each of its
+    recipients, see ``send_email`` for the arguments.
+
+    The message is built once, only its headers specific to the recipient
+    change between two of them, and a single connection to the SMTP server
+    is used for all of them. If the server drops the connection, a new one
+    is opened.
+
+    :kwarg keep_connection: whether to keep the connection to the SMTP
+        server open, to re-use it for the next emails sent by this thread
+    :return: the message sent to the last recipient
+
+    """
     from_email = pagure_config.get("FROM_EMAIL", "pagure@fedoraproject.org")
     if isinstance(from_email, bytes):
         from_email = from_email.decode("utf-8")
@@ -444,42 +546,48 @@ def send_email(
             in_reply_to + "@%s" % pagure_config["DOMAIN_EMAIL_NOTIFICATIONS"]
         )
 
-    smtp = None
+    msg = MIMEText(text.encode("utf-8"), "plain", "utf-8")
+    msg["Subject"] = Header("[%s] %s" % (subject_tag, subject), "utf-8")
+    msg["From"] = from_email
+
+    if mail_id:
+        msg["mail-id"] = mail_id
+        msg["Message-Id"] = "<%s>" % mail_id
+
+    if in_reply_to:
+        msg["In-Reply-To"] = "<%s>" % in_reply_to
+
+    msg["X-Auto-Response-Suppress"] = "All"
+    msg["X-pagure"] = pagure_config["APP_URL"]
+    if project_name is not None:
+        msg["X-pagure-project"] = project_name
+        msg["List-ID"] = project_name
+        msg["List-Archive"] = _build_url(
+            pagure_config["APP_URL"], _fullname_to_url(project_name)
+        )
+    if reporter is not None:
+        msg["X-pagure-reporter"] = reporter
+    if assignee is not None:
+        msg["X-pagure-assignee"] = assignee
+
+    salt = pagure_config.get("SALT_EMAIL")
+    if salt and not isinstance(salt, bytes):
+        salt = salt.encode("utf-8")
+
+    start = time.time()
+    smtp = getattr(_SMTP, "connection", None) if keep_connection else None
     for mailto in to_mail.split(","):
         try:
             pagure.lib.query.allowed_emailaddress(mailto)
         except pagure.exceptions.PagureException:
             continue
-        msg = MIMEText(text.encode("utf-8"), "plain", "utf-8")
-        msg["Subject"] = Header("[%s] %s" % (subject_tag, subject), "utf-8")
-        msg["From"] = from_email
-
-        if mail_id:
-            msg["mail-id"] = mail_id
-            msg["Message-Id"] = "<%s>" % mail_id
-
-        if in_reply_to:
-            msg["In-Reply-To"] = "<%s>" % in_reply_to
-
-        msg["X-Auto-Response-Suppress"] = "All"
-        msg["X-pagure"] = pagure_config["APP_URL"]
-        if project_name is not None:
-            msg["X-pagure-project"] = project_name
-            msg["List-ID"] = project_name
-            msg["List-Archive"] = _build_url(
-                pagure_config["APP_URL"], _fullname_to_url(project_name)
-            )
-        if reporter is not None:
-            msg["X-pagure-reporter"] = reporter
-        if assignee is not None:
-            msg["X-pagure-assignee"] = assignee
 
         # Send the message via our own SMTP server, but don't include the
         # envelope header.
+        del msg["To"]
+        del msg["Reply-To"]
+        del msg["Mail-Followup-To"]
         msg["To"] = mailto
-        salt = pagure_config.get("SALT_EMAIL")
-        if salt and not isinstance(salt, bytes):
-            salt = salt.encode("utf-8")
 
         if mail_id and pagure_config["EVENTSOURCE_SOURCE"]:
 
@@ -512,47 +620,33 @@ def send_email(
             _log.debug(msg.as_string())
             _log.debug("*****/EMAIL******")
             continue
-        try:
-            if smtp is None:
-                if pagure_config["SMTP_SSL"]:
-                    smtp = smtplib.SMTP_SSL(
-                        pagure_config["SMTP_SERVER"],
-                        pagure_config["SMTP_PORT"],
-                    )
-                else:
-                    smtp = smtplib.SMTP(
-                        pagure_config["SMTP_SERVER"],
-                        pagure_config["SMTP_PORT"],
-                    )
-
-            if pagure_config.get("SMTP_STARTTLS"):
-                context = ssl.create_default_context()
-                keyfile = pagure_config.get("SMTP_KEYFILE") or None
-                certfile = pagure_config.get("SMTP_CERTFILE") or None
-                respcode, _ = smtp.starttls(
-                    keyfile=keyfile,
-                    certfile=certfile,
-                    context=context,
-                )
-                if respcode != 220:
-                    _log.warning(
-                        "The starttls command did not return the 220 "
-                        "response code expected."
-                    )
-
-            if (
-                pagure_config["SMTP_USERNAME"]
-                and pagure_config["SMTP_PASSWORD"]
-            ):
-                smtp.login(
-                    pagure_config["SMTP_USERNAME"],
-                    pagure_config["SMTP_PASSWORD"],
-                )
 
-            smtp.sendmail(from_email, [mailto], msg.as_string())
-        except smtplib.SMTPException as err:
-            _log.exception(err)
-    if smtp:
+        reconnected = smtp is None
+        while True:
+            try:
+                if smtp is None:
+                    smtp = _connect_smtp()
+                smtp.sendmail(from_email, [mailto], msg.as_string())
+                MAIL_STATS["recipients"] += 1
+            except smtplib.SMTPServerDisconnected as err:
+                # The connection was closed (likely after being idle for
+                # too long), try again once on a new one
+                smtp = None
+                if not reconnected:
+                    reconnected = True
+                    continue
+                MAIL_STATS["failures"] += 1
+                _log.exception(err)
+            except smtplib.SMTPException as err:
+                MAIL_STATS["failures"] += 1
+                _log.exception(err)
+            break
+
+    MAIL_STATS["messages"] += 1
+    MAIL_STATS["total_time"] += time.time() - start
+    if keep_connection:
+        _SMTP.connection = smtp
+    elif smtp:
         smtp.quit()
     return msg
 
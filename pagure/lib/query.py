@@ -33,8 +33,11 @@ import os
 import shutil
 import subprocess
 import tempfile
+import threading
+import time
 import uuid
 
+import collections
 from collections import Counter
 from math import ceil
 
@@ -71,6 +74,20 @@ from pagure.lib.model_base import create_session  # noqa
 
 REDIS = None
 PAGURE_CI = None
+# Issues history stats, keyed by project id then by (detailed, weeks_range)
+_ISSUES_HISTORY_STATS_CACHE = collections.OrderedDict()
+_ISSUES_HISTORY_STATS_CACHE_SIZE = 1024
+_ISSUES_HISTORY_STATS_LOCK = threading.Lock()
+_ISSUES_HISTORY_STATS_REDIS = None
+_PROJECT_ID_CACHE = collections.OrderedDict()
+_PROJECT_ID_CACHE_SIZE = 4096
+# The keys of _PROJECT_ID_CACHE of each project, by project identifier
+_PROJECT_ID_CACHE_KEYS = {}
+_PROJECT_ID_CACHE_LOCK = threading.Lock()
+# Bump to invalidate the rendered markdown cached by text2markdown
+MARKDOWN_RENDERER_VERSION = 1
+_MARKDOWN_CACHE = pagure.utils.LRUCache()
+_MARKDOWN_PROCESSORS = threading.local()
 _log = logging.getLogger(__name__)
 # List of all the possible hooks pagure could generate before it was moved
 # to the runner architecture we now use.
@@ -219,6 +236,65 @@ def search_user(session, username=None, email=None, token=None, pattern=None):
     return output
 
 
+# Maximum number of values bound in the IN clause of a query
+_IN_CHUNK_SIZE = 500
+
+
+def _query_in_chunks(query, column, values):
+    """Returns the rows of the query having one of the specified values in
+    the given column, in a single query per chunk of values to keep the
+    number of bound parameters in the IN clause reasonable.
+    """
+    values = list(values)
+    output = []
+    for idx in range(0, len(values), _IN_CHUNK_SIZE):
+        chunk = values[idx : idx + _IN_CHUNK_SIZE]
+        output.extend(query.filter(column.in_(chunk)).all())
+    return output
+
+
+def search_users_by_emails(session, emails):
+    """Returns the users owning the specified emails, in a single query
+    per chunk of emails.
+
+    :arg session: the session to use to connect to the database.
+    :arg emails: the list of emails to look the users of
+    :type emails: list of strings
+    :return: A dict associating each email that was found to its User
+    :rtype: dict
+
+    """
+    query = session.query(model.UserEmail.email, model.User).filter(
+        model.UserEmail.user_id == model.User.id
+    )
+    return dict(
+        _query_in_chunks(
+            query,
+            model.UserEmail.email,
+            set(email for email in emails if email),
+        )
+    )
+
+
+def search_users_by_usernames(session, usernames):
+    """Returns the users having the specified usernames, in a single query
+    per chunk of usernames.
+
+    :arg session: the session to use to connect to the database.
+    :arg usernames: the list of usernames to look the users of
+    :type usernames: list of strings
+    :return: A dict associating each username that was found to its User
+    :rtype: dict
+
+    """
+    users = _query_in_chunks(
+        session.query(model.User),
+        model.User.user,
+        set(username for username in usernames if username),
+    )
+    return dict((user.user, user) for user in users)
+
+
 def is_valid_ssh_key(key, fp_hash="SHA256"):
     """Validates the ssh key using ssh-keygen."""
     key = key.strip()
@@ -1854,6 +1930,8 @@ def new_issue(
 
     session.commit()
 
+    invalidate_issues_history_stats(repo.id)
+
     pagure.lib.git.update_git(issue, repo=repo)
 
     log_action(session, "created", issue, user_obj)
@@ -1901,6 +1979,8 @@ def drop_issue(session, issue, user):
 
     session.commit()
 
+    invalidate_issues_history_stats(issue.project_id)
+
     pagure.lib.git.clean_git(issue.project, repotype, uid)
 
     return issue
@@ -2189,6 +2269,7 @@ def edit_issue(
     pagure.lib.git.update_git(issue, repo=issue.project)
 
     if "status" in edit:
+        invalidate_issues_history_stats(issue.project_id)
         log_action(session, issue.status.lower(), issue, user_obj)
         pagure.lib.notify.notify_status_change_issue(issue, user_obj)
 
@@ -2395,8 +2476,18 @@ def search_projects(
     exclude_groups=None,
     private=None,
     owner=None,
+    with_count=False,
+    load_json=False,
 ):
-    """List existing projects"""
+    """List existing projects
+
+    :kwarg with_count: if True, return a tuple of the total number of
+        projects matching (regardless of ``start`` and ``limit``) and of
+        the list of projects, fetched with the same query when the
+        database supports window functions
+    :kwarg load_json: load eagerly the relations used by
+        ``Project.to_json`` for all the projects returned
+    """
     projects = session.query(sqlalchemy.distinct(model.Project.id))
 
     if owner is not None and username is not None:
@@ -2615,18 +2706,90 @@ def search_projects(
     else:
         query = query.order_by(asc(func.lower(model.Project.name)))
 
+    if load_json:
+        query = query.options(*get_project_json_loaders())
+
+    if with_count and _supports_window_functions(session):
+        page = query.add_columns(func.count().over())
+        if start is not None:
+            page = page.offset(start)
+        if limit is not None:
+            page = page.limit(limit)
+        rows = page.all()
+        if rows:
+            return rows[0][1], [row[0] for row in rows]
+        # Past the last page, there is no row to carry the total
+        return (query.count() if start else 0), []
+
+    total = query.count() if with_count else None
+
     if start is not None:
         query = query.offset(start)
 
     if limit is not None:
         query = query.limit(limit)
 
-    if count:
+    if with_count:
+        return total, query.all()
+    elif count:
         return query.count()
     else:
         return query.all()
 
 
+def _supports_window_functions(session):
+    """Return whether the database behind the session supports window
+    functions (``COUNT(*) OVER ()``).
+    """
+    dialect = session.get_bind().dialect
+    version = dialect.server_version_info or ()
+    if dialect.name == "sqlite":
+        return version >= (3, 25)
+    elif dialect.name == "mysql":
+        # MariaDB 10.2 and MySQL 8.0 introduced them
+        if getattr(dialect, "_is_mariadb", False):
+            return version >= (10, 2)
+        return version >= (8, 0)
+    return True
+
+
+def get_project_json_loaders(depth=2):
+    """Return the query options loading eagerly, with one query per
+    relation for all the projects returned, the relations used by
+    ``Project.to_json``.
+
+    :kwarg depth: the number of levels of parent projects for which to
+        load these relations
+    :type depth: int
+
+    """
+    relations = [
+        model.Project.user,
+        model.Project.issue_keys,
+        model.Project.tags,
+        model.Project.users,
+        model.Project.admins,
+        model.Project.committers,
+        model.Project.groups,
+        model.Project.admin_groups,
+        model.Project.committer_groups,
+        model.Project.collaborator_groups,
+    ]
+    loader = sqlalchemy.orm.selectinload
+    options = []
+    for _ in range(depth):
+        options.extend(loader(relation) for relation in relations)
+        options.append(
+            loader(model.Project.collaborators).selectinload(
+                model.ProjectUser.user
+            )
+        )
+        parent = loader(model.Project.parent)
+        loader = parent.selectinload
+    options.append(parent)
+    return options
+
+
 def list_users_projects(
     session,
     username,
@@ -2831,10 +2994,69 @@ def list_users_projects(
         return query.all()
 
 
+def _project_matches(project, name, user, namespace, case):
+    """Check that the specified project is the one identified by the
+    given name, user and namespace.
+    """
+    names = [(project.name, name), (project.namespace or "", namespace or "")]
+    if not case:
+        names = [(a.lower(), b.lower()) for a, b in names]
+    if any(a != b for a, b in names):
+        return False
+    if user is not None:
+        return project.is_fork and project.user.user == user
+    return not project.is_fork
+
+
+@sqlalchemy.event.listens_for(model.Project, "after_update")
+@sqlalchemy.event.listens_for(model.Project, "after_delete")
+def invalidate_project_id_cache(mapper, connection, project):
+    """Drop the cached lookups of a project that was updated or deleted."""
+    with _PROJECT_ID_CACHE_LOCK:
+        for key in _PROJECT_ID_CACHE_KEYS.pop(project.id, ()):
+            if _PROJECT_ID_CACHE.get(key, (None,))[0] == project.id:
+                del _PROJECT_ID_CACHE[key]
+
+
+def _forget_project_id_key(key, cached):
+    """Remove the key of a lookup dropped from ``_PROJECT_ID_CACHE`` from
+    the keys of its project, the caller must hold
+    ``_PROJECT_ID_CACHE_LOCK``."""
+    if cached is None:
+        return
+    keys = _PROJECT_ID_CACHE_KEYS.get(cached[0])
+    if keys is not None:
+        keys.discard(key)
+        if not keys:
+            del _PROJECT_ID_CACHE_KEYS[cached[0]]
+
+
 def _get_project(session, name, user=None, namespace=None):
-    """Get a project from the database"""
+    """Get a project from the database
+
+    The identifier of the projects found is cached for
+    ``PROJECT_ID_CACHE_TTL`` seconds, so the next lookups of the same
+    project only have to load it by its primary key (which does not hit
+    the database if it is already loaded in the session).
+    """
     case = pagure_config.get("CASE_SENSITIVE", False)
 
+    ttl = pagure_config.get("PROJECT_ID_CACHE_TTL", 0)
+    key = (name, user, namespace)
+    if not case:
+        key = tuple(k.lower() if k else k for k in key)
+    if ttl:
+        cached = _PROJECT_ID_CACHE.get(key)
+        if cached and cached[1] > time.time():
+            project = session.query(model.Project).get(cached[0])
+            # The project may have been renamed or deleted meanwhile
+            if project and _project_matches(
+                project, name, user, namespace, case
+            ):
+                return project
+        with _PROJECT_ID_CACHE_LOCK:
+            _forget_project_id_key(key, _PROJECT_ID_CACHE.pop(key, None))
+
     query = session.query(model.Project)
 
     if not case:
@@ -2862,10 +3084,20 @@ def _get_project(session, name, user=None, namespace=None):
         query = query.filter(model.Project.is_fork == False)  # noqa: E712
 
     try:
-        return query.one()
+        project = query.one()
     except sqlalchemy.orm.exc.NoResultFound:
         return None
 
+    if ttl:
+        with _PROJECT_ID_CACHE_LOCK:
+            _forget_project_id_key(key, _PROJECT_ID_CACHE.pop(key, None))
+            while len(_PROJECT_ID_CACHE) >= _PROJECT_ID_CACHE_SIZE:
+                # Evict the lookup cached first
+                _forget_project_id_key(*_PROJECT_ID_CACHE.popitem(last=False))
+            _PROJECT_ID_CACHE[key] = (project.id, time.time() + ttl)
+            _PROJECT_ID_CACHE_KEYS.setdefault(project.id, set()).add(key)
+    return project
+
 
 def search_issues(
     session,
@@ -3234,6 +3466,41 @@ def search_issues(
     return output
 
 
+def _search_by_ids(session, model_cls, references):
+    """Returns the objects of the given class (issues or pull-requests)
+    having the specified identifiers in the specified projects, in a single
+    query per chunk of references.
+    """
+    references = set(references)
+    project_ids = sorted(set(ref[0] for ref in references))
+    ids = sorted(set(ref[1] for ref in references))
+    query = session.query(model_cls).filter(
+        model_cls.project_id.in_(project_ids)
+    )
+    output = {}
+    for obj in _query_in_chunks(query, model_cls.id, ids):
+        if (obj.project_id, obj.id) in references:
+            output[(obj.project_id, obj.id)] = obj
+
+    return output
+
+
+def search_issues_by_ids(session, references):
+    """Returns the issues having the specified identifiers in the specified
+    projects, in a single query per chunk of references.
+
+    :arg session: the session to use to connect to the database.
+    :arg references: the (project_id, issue_id) tuples of the issues to
+        look for
+    :type references: list of tuples
+    :return: A dict associating each (project_id, issue_id) tuple that was
+        found to its Issue
+    :rtype: dict
+
+    """
+    return _search_by_ids(session, model.Issue, references)
+
+
 def get_tags_of_project(session, project, pattern=None):
     """Returns the list of tags associated with the issues of a project."""
     query = (
@@ -3432,6 +3699,22 @@ def search_pull_requests(
     return output
 
 
+def search_pull_requests_by_ids(session, references):
+    """Returns the pull-requests having the specified identifiers in the
+    specified projects, in a single query per chunk of references.
+
+    :arg session: the session to use to connect to the database.
+    :arg references: the (project_id, request_id) tuples of the
+        pull-requests to look for
+    :type references: list of tuples
+    :return: A dict associating each (project_id, request_id) tuple that
+        was found to its PullRequest
+    :rtype: dict
+
+    """
+    return _search_by_ids(session, model.PullRequest, references)
+
+
 def reopen_pull_request(session, request, user):
     """Re-Open the provided pull request"""
     if request.status != "Closed":
@@ -4391,8 +4674,16 @@ def _convert_markdown(md_processor, text):
     return md_processor.convert(text)
 
 
-def text2markdown(text, extended=True, readme=False):
-    """Simple text to html converter using the markdown library."""
+def _get_markdown_processor(extended, readme):
+    """Return the markdown processor of the current thread for the given
+    configuration, creating it the first time.
+    """
+    enable_tickets = pagure_config.get("ENABLE_TICKETS", True)
+    key = (extended, readme, enable_tickets)
+    processors = _MARKDOWN_PROCESSORS.__dict__.setdefault("processors", {})
+    if key in processors:
+        return processors[key].reset()
+
     extensions = [
         "markdown.extensions.def_list",
         "markdown.extensions.fenced_code",
@@ -4425,25 +4716,87 @@ def text2markdown(text, extended=True, readme=False):
         # Install our markdown modifications
         extensions.append("pagure.pfmarkdown")
 
-    md_processor = markdown.Markdown(
+    processors[key] = markdown.Markdown(
         extensions=extensions,
         extension_configs={
             "markdown.extensions.codehilite": {"guess_lang": False}
         },
         output_format="xhtml5",
     )
+    return processors[key]
+
+
+def _markdown_cache_key(text, extended, readme):
+    """Return the key under which the rendering of the given text is
+    cached, or None if it should not be cached.
+
+    The rendering of the texts with references to users, issues, pull
+    requests or commits depends on the project viewed and on the content
+    of the database, so they are only cached for ``MARKDOWN_CACHE_TTL``
+    seconds, and not at all by default.
+    """
+    if not pagure_config.get("MARKDOWN_CACHE_SIZE", 0):
+        return None
 
-    if text:
+    context = None
+    ttl = None
+    if extended and pagure.pfmarkdown.REFERENCES_RE.search(text):
+        ttl = pagure_config.get("MARKDOWN_CACHE_TTL", 0)
+        if not ttl:
+            return None
         try:
-            text = _convert_markdown(md_processor, text)
-        except Exception as err:
-            print(err)
-            _log.debug(
-                "A markdown error occured while processing: ``%s``", text
-            )
+            context = pagure.pfmarkdown._get_ns_repo_user()
+        except RuntimeError:
+            return None
+
+    digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    return (
+        (
+            MARKDOWN_RENDERER_VERSION,
+            extended,
+            readme,
+            pagure_config.get("ENABLE_TICKETS", True),
+            pagure_config.get("APP_URL"),
+            context,
+            digest,
+        ),
+        ttl,
+    )
+
+
+def text2markdown(text, extended=True, readme=False):
+    """Simple text to html converter using the markdown library.
+
+    The markdown processors are re-used across calls and the html
+    produced is cached, see ``MARKDOWN_CACHE_SIZE`` and
+    ``MARKDOWN_CACHE_TTL``.
+    """
+    if not text:
+        return ""
+
+    cache_key = _markdown_cache_key(text, extended, readme)
+    if cache_key:
+        key, ttl = cache_key
+        cached = _MARKDOWN_CACHE.lookup(key)
+        if cached and (cached[1] is None or cached[1] > time.time()):
+            return cached[0]
+
+    md_processor = _get_markdown_processor(extended, readme)
+    try:
+        html = _convert_markdown(md_processor, text)
+    except Exception as err:
+        print(err)
+        _log.debug("A markdown error occured while processing: ``%s``", text)
         return clean_input(text)
 
-    return ""
+    html = clean_input(html)
+    if cache_key:
+        _MARKDOWN_CACHE.store(
+            key,
+            (html, time.time() + ttl if ttl else None),
+            pagure_config["MARKDOWN_CACHE_SIZE"],
+        )
+    return html
 
 
 def filter_img_src(name, value):
@@ -5687,15 +6040,151 @@ def update_read_only_mode(session, repo, read_only=True):
         session.add(repo)
 
 
+def _issues_weekly_counts(session, project, column, weeks, status=None):
+    """Returns the number of issues of the specified project having the
+    given date column in each of the specified weeks, in a single GROUP BY
+    query.
+
+    :arg session: The session object to query the db with
+    :arg project: model.Project object to get the issues stats about
+    :arg column: the model.Issue date column to bucket the issues on
+    :arg weeks: list of (start, end) datetime tuples, most recent first,
+        contiguous and non-overlapping
+    :kwarg status: if specified, only count the issues with this status
+    :return: a dict associating the index of the week in ``weeks`` to the
+        number of issues found in it
+
+    """
+    week_idx = sqlalchemy.case(
+        [(column >= start, idx) for idx, (start, _) in enumerate(weeks)]
+    ).label("week")
+    query = (
+        session.query(week_idx, func.count(model.Issue.uid))
+        .filter(model.Issue.project_id == project.id)
+        .filter(column >= weeks[-1][0])
+        .filter(column < weeks[0][1])
+    )
+    if status is not None:
+        query = query.filter(model.Issue.status == status)
+
+    return dict(query.group_by(week_idx).all())
+
+
+def _get_issues_history_stats_redis():
+    """Return the redis connection of the shared cache of the issues
+    history stats."""
+    global _ISSUES_HISTORY_STATS_REDIS
+    if REDIS is not None:
+        return REDIS
+    if _ISSUES_HISTORY_STATS_REDIS is None:
+        _ISSUES_HISTORY_STATS_REDIS = redis.StrictRedis(
+            host=pagure_config["REDIS_HOST"],
+            port=pagure_config["REDIS_PORT"],
+            db=pagure_config["REDIS_DB"],
+        )
+    return _ISSUES_HISTORY_STATS_REDIS
+
+
+def _get_issues_history_stats(project_id, cache_key, cache_ttl):
+    """Return the issues history stats cached for the specified project
+    and key, None if there are none or they are older than ``cache_ttl``
+    seconds."""
+    now = time.time()
+    if pagure_config.get("ISSUES_HISTORY_STATS_CACHE_BACKEND") == "redis":
+        try:
+            data = _get_issues_history_stats_redis().hget(
+                "pagure:issues_history_stats:%s" % project_id,
+                "%s-%s" % cache_key,
+            )
+            cached = json.loads(data.decode("utf-8")) if data else None
+        except (redis.exceptions.RedisError, ValueError) as err:
+            _log.warning("Could not read the issues stats cached: %s", err)
+            return None
+        if cached and now - cached["time"] < cache_ttl:
+            return cached["stats"]
+        return None
+
+    with _ISSUES_HISTORY_STATS_LOCK:
+        cached = _ISSUES_HISTORY_STATS_CACHE.get(project_id, {}).get(cache_key)
+    if cached and now - cached[0] < cache_ttl:
+        return copy.deepcopy(cached[1])
+    return None
+
+
+def _set_issues_history_stats(project_id, cache_key, cache_ttl, stats):
+    """Cache the issues history stats of the specified project under the
+    given key."""
+    now = time.time()
+    if pagure_config.get("ISSUES_HISTORY_STATS_CACHE_BACKEND") == "redis":
+        name = "pagure:issues_history_stats:%s" % project_id
+        try:
+            pipeline = _get_issues_history_stats_redis().pipeline()
+            pipeline.hset(
+                name,
+                "%s-%s" % cache_key,
+                json.dumps({"time": now, "stats": stats}),
+            )
+            pipeline.expire(name, int(cache_ttl))
+            pipeline.execute()
+        except redis.exceptions.RedisError as err:
+            _log.warning("Could not cache the issues stats: %s", err)
+        return
+
+    with _ISSUES_HISTORY_STATS_LOCK:
+        if project_id in _ISSUES_HISTORY_STATS_CACHE:
+            _ISSUES_HISTORY_STATS_CACHE.move_to_end(project_id)
+        elif (
+            len(_ISSUES_HISTORY_STATS_CACHE)
+            >= _ISSUES_HISTORY_STATS_CACHE_SIZE
+        ):
+            # Evict the project whose stats were cached the longest ago
+            _ISSUES_HISTORY_STATS_CACHE.popitem(last=False)
+        _ISSUES_HISTORY_STATS_CACHE.setdefault(project_id, {})[cache_key] = (
+            now,
+            copy.deepcopy(stats),
+        )
+
+
+def invalidate_issues_history_stats(project_id):
+    """Drop the cached issues history stats of the specified project.
+
+    :arg project_id: the identifier of the project whose issues changed
+
+    """
+    if pagure_config.get("ISSUES_HISTORY_STATS_CACHE_BACKEND") == "redis":
+        try:
+            _get_issues_history_stats_redis().delete(
+                "pagure:issues_history_stats:%s" % project_id
+            )
+        except redis.exceptions.RedisError as err:
+            _log.warning("Could not drop the issues stats cached: %s", err)
+    with _ISSUES_HISTORY_STATS_LOCK:
+        _ISSUES_HISTORY_STATS_CACHE.pop(project_id, None)
+
+
 def issues_history_stats(session, project, detailed=False, weeks_range=53):
     """Returns the number of opened issues on the specified project over
     the last 365 days
 
+    The opened and closed histograms are computed in one GROUP BY query
+    each and the running count of open tickets is rebuilt from them. The
+    result is cached per project for ``ISSUES_HISTORY_STATS_CACHE_TTL``
+    seconds or until an issue of the project is created, edited or deleted,
+    in each process or in redis (``ISSUES_HISTORY_STATS_CACHE_BACKEND``).
+
     :arg session: The session object to query the db with
     :arg repo: model.Project object to get the issues stats about
 
     """
-    tomorrow = datetime.datetime.utcnow() + datetime.timedelta(days=1)
+    cache_ttl = pagure_config.get("ISSUES_HISTORY_STATS_CACHE_TTL", 0)
+    cache_key = (detailed, weeks_range)
+    now = datetime.datetime.utcnow()
+    if cache_ttl:
+        cached = _get_issues_history_stats(project.id, cache_key, cache_ttl)
+        if cached is not None:
+            return cached
+
+    tomorrow = now + datetime.timedelta(days=1)
     current_open = (
         session.query(model.Issue)
         .filter(model.Issue.project_id == project.id)
@@ -5707,14 +6196,12 @@ def issues_history_stats(session, project, detailed=False, weeks_range=53):
     # ago, if it is, we will assume that all tickets that were closed last year
     # have a closed_at date set.
     oldest_closed = (
-        session.query(model.Issue)
+        session.query(func.min(model.Issue.closed_at))
         .filter(model.Issue.project_id == project.id)
-        .filter(model.Issue.closed_at != None)  # noqa
-        .order_by(sqlalchemy.asc(model.Issue.closed_at))
-        .first()
+        .scalar()
     )
     a_year_ago = tomorrow - datetime.timedelta(days=(weeks_range * 7))
-    if oldest_closed and oldest_closed.closed_at < a_year_ago:
+    if oldest_closed and oldest_closed < a_year_ago:
         to_ignore = 0
     else:
         # Some ticket got imported as closed but without a closed_at date, so
@@ -5728,27 +6215,30 @@ def issues_history_stats(session, project, detailed=False, weeks_range=53):
         )
 
     # For each week from tomorrow, get the number of open tickets
-
-    output = {}
+    weeks = []
     for week in range(weeks_range):
         end = tomorrow - datetime.timedelta(days=(week * 7))
-        start = end - datetime.timedelta(days=7)
-        closed_ticket = (
-            session.query(model.Issue)
-            .filter(model.Issue.project_id == project.id)
-            .filter(model.Issue.closed_at >= start)
-            .filter(model.Issue.closed_at < end)
-        ).count()
-        query_open = (
-            session.query(model.Issue)
-            .filter(model.Issue.project_id == project.id)
-            .filter(model.Issue.date_created >= start)
-            .filter(model.Issue.date_created < end)
-        )
-        # For backward compatibility
-        if detailed is False:
-            query_open = query_open.filter(model.Issue.status == "Open")
-        open_ticket = query_open.count()
+        weeks.append((end - datetime.timedelta(days=7), end))
+
+    output = {}
+    if not weeks:
+        return output
+
+    closed_tickets = _issues_weekly_counts(
+        session, project, model.Issue.closed_at, weeks
+    )
+    # For backward compatibility
+    open_tickets = _issues_weekly_counts(
+        session,
+        project,
+        model.Issue.date_created,
+        weeks,
+        status=None if detailed else "Open",
+    )
+
+    for week, (start, _) in enumerate(weeks):
+        closed_ticket = closed_tickets.get(week, 0)
+        open_ticket = open_tickets.get(week, 0)
         cnt = open_ticket + closed_ticket - to_ignore
         current_open = current_open - open_ticket + closed_ticket
 
@@ -5765,6 +6255,9 @@ def issues_history_stats(session, project, detailed=False, weeks_range=53):
                 "count": current_open,
             }
 
+    if cache_ttl:
+        _set_issues_history_stats(project.id, cache_key, cache_ttl, output)
+
     return output
 
 
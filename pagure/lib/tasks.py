@@ -340,12 +340,24 @@ def update_git(
     )
 
     project_lock = "WORKER"
+    repotype = None
     if ticketuid is not None:
         project_lock = "WORKER_TICKET"
+        repotype = "tickets"
     elif requestuid is not None:
         project_lock = "WORKER_REQUEST"
+        repotype = "requests"
+
+    queued = repotype is not None and pagure.lib.git.queue_git_update(
+        project, repotype, ticketuid or requestuid
+    )
 
     with project.lock(project_lock):
+        if queued:
+            # Commit this update along with all the others pending for the
+            # same repository
+            return pagure.lib.git.flush_git_updates(session, project, repotype)
+
         if ticketuid is not None:
             obj = pagure.lib.query.get_issue_by_uid(session, ticketuid)
         elif requestuid is not None:
@@ -958,28 +970,23 @@ def commits_author_stats(self, session, repopath):
     if not os.path.exists(repopath):
         raise ValueError("Git repository not found.")
 
-    repo_obj = pygit2.Repository(repopath)
+    commits_stats = pagure.lib.git.update_commits_stats(repopath)
 
     stats = collections.defaultdict(int)
-    number_of_commits = 0
     authors_email = set()
-    for commit in repo_obj.walk(
-        repo_obj.head.peel().oid.hex, pygit2.GIT_SORT_NONE
-    ):
-        # For each commit record how many times each combination of name and
-        # e-mail appears in the git history.
-        number_of_commits += 1
-        email = commit.author.email
-        author = commit.author.name
-        stats[(author, email)] += 1
+    for name, email, val in commits_stats["authors"]:
+        stats[(name, email)] += val
 
+    users = pagure.lib.query.search_users_by_emails(
+        session, [email for (_, email) in stats]
+    )
     for (name, email), val in list(stats.items()):
         if not email:
             # Author email is missing in the git commit.
             continue
         # For each recorded user info, check if we know the e-mail address of
         # the user.
-        user = pagure.lib.query.search_user(session, email=email)
+        user = users.get(email)
         if user and (user.default_email != email or user.fullname != name):
             # We know the the user, but the name or e-mail used in Git commit
             # does not match their default e-mail address and full name. Let's
@@ -1004,10 +1011,10 @@ def commits_author_stats(self, session, repopath):
     ]
 
     return (
-        number_of_commits,
+        commits_stats["commits"],
         out_list,
         len(authors_email),
-        commit.commit_time,
+        commits_stats["last_commit_time"],
     )
 
 
@@ -1021,22 +1028,53 @@ def commits_history_stats(self, session, repopath):
     if not os.path.exists(repopath):
         raise ValueError("Git repository not found.")
 
-    repo_obj = pygit2.Repository(repopath)
+    commits_stats = pagure.lib.git.update_commits_stats(repopath)
 
-    dates = collections.defaultdict(int)
-    for commit in repo_obj.walk(
-        repo_obj.head.peel().oid.hex, pygit2.GIT_SORT_NONE
-    ):
-        delta = (
-            datetime.datetime.utcnow() - arrow.get(commit.commit_time).naive
-        )
+    now = datetime.datetime.utcnow()
+    dates = {}
+    for key, val in commits_stats["dates"].items():
+        delta = now - arrow.get(key).naive
         if delta.days > 365:
-            break
-        dates[arrow.get(commit.commit_time).date().isoformat()] += 1
+            continue
+        dates[key] = val
 
     return [(key, dates[key]) for key in sorted(dates)]
 
 
+@conn.task(queue=pagure_config.get("MEDIUM_CELERY_QUEUE", None), bind=True)
+@pagure_task
+def update_commits_stats(self, session, repopath):
+    """Advance the commit statistics stored in the specified git repository
+    to its current HEAD, if there are statistics stored there already.
+    """
+    if not os.path.exists(repopath):
+        return
+
+    _log.info("Updating the commits stats of repo %s", repopath)
+    pagure.lib.git.update_commits_stats(repopath, create=False)
+
+
+@conn.task(queue=pagure_config.get("MEDIUM_CELERY_QUEUE", None), bind=True)
+@pagure_task
+def update_commits_index(self, session, repopath, branches):
+    """Advance the commits index of the specified branches of the git
+    repository to their current head, if they are indexed already, and
+    remove the index of the branches that no longer exist.
+    """
+    if not os.path.exists(repopath):
+        return
+
+    _log.info("Updating the commits index of repo %s", repopath)
+    repo_obj = pygit2.Repository(repopath)
+    for branchname in branches:
+        if repo_obj.lookup_branch(branchname) is None:
+            pagure.lib.git.remove_commits_index(repopath, branchname)
+        else:
+            pagure.lib.git.update_commits_index(
+                repopath, branchname, create=False
+            )
+
+
 @conn.task(queue=pagure_config.get("MEDIUM_CELERY_QUEUE", None), bind=True)
 @pagure_task
 def link_pr_to_ticket(self, session, pr_uid):
@@ -10,17 +10,23 @@
 
 from __future__ import unicode_literals, absolute_import
 
+import collections
+import concurrent.futures
 import datetime
 import hashlib
 import hmac
 import json
 import os
 import os.path
+import threading
 import time
 import uuid
 
+import pygit2
 import requests
 import six
+import urllib3
+from six.moves.urllib.parse import urlparse
 
 from celery import Celery
 from celery.signals import after_setup_task_logger
@@ -39,6 +45,15 @@ from pagure.utils import split_project_fullname, set_up_logging
 _log = get_task_logger(__name__)
 _i = 0
 
+# Delivery counters of the web-hooks sent by this process, per URL, for the
+# URLs called the most recently
+WEBHOOK_STATS = collections.OrderedDict()
+_WEBHOOK_STATS_SIZE = 1024
+# Sessions used to send the web-hooks, per host, to re-use the connections
+_WEBHOOK_SESSIONS = {}
+_WEBHOOK_SESSIONS_SIZE = 256
+_WEBHOOK_LOCK = threading.Lock()
+
 
 if os.environ.get("PAGURE_BROKER_URL"):  # pragma: no cover
     broker_url = os.environ["PAGURE_BROKER_URL"]
@@ -96,20 +111,141 @@ def call_web_hooks(project, topic, msg, urls):
         "X-Pagure-Topic": topic,
         "Content-Type": "application/json",
     }
-    for url in sorted(urls):
-        url = url.strip()
+    urls = sorted(set(url.strip() for url in urls if url.strip()))
+    workers = min(len(urls), pagure_config.get("WEBHOOK_MAX_WORKERS", 8))
+    if workers <= 1:
+        for url in urls:
+            _deliver_web_hook(url, headers, content)
+        return
+
+    # Call the different URLs concurrently, so a slow or unreachable one
+    # does not delay the others
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as pool:
+        for url in urls:
+            pool.submit(_deliver_web_hook, url, headers, content)
+
+
+def _get_webhook_session(url):
+    """Return the requests session to use to call the specified url, there
+    is one per host so the connections to it are kept alive and re-used.
+    """
+    parsed = urlparse(url)
+    key = (parsed.scheme, parsed.netloc)
+    with _WEBHOOK_LOCK:
+        session = _WEBHOOK_SESSIONS.get(key)
+        if session is None:
+            if len(_WEBHOOK_SESSIONS) >= _WEBHOOK_SESSIONS_SIZE:
+                _WEBHOOK_SESSIONS.pop(next(iter(_WEBHOOK_SESSIONS))).close()
+            session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(
+                pool_maxsize=pagure_config.get("WEBHOOK_MAX_WORKERS", 8)
+            )
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _WEBHOOK_SESSIONS[key] = session
+    return session
+
+
+def _deliver_web_hook(url, headers, content):
+    """Send the web-hook notification to the specified url.
+
+    The notification is sent again, up to ``WEBHOOK_RETRIES`` times, if the
+    url could not be connected to or returned a server error or a 429. It
+    is not sent again when the connection failed once established (read
+    timeout, connection aborted...), the url may have received it. The
+    delay between two attempts starts at ``WEBHOOK_RETRY_BACKOFF`` seconds
+    and doubles every time.
+
+    :return: whether the notification was delivered
+    :return type: bool
+
+    """
+    retries = pagure_config.get("WEBHOOK_RETRIES", 2)
+    backoff = pagure_config.get("WEBHOOK_RETRY_BACKOFF", 1)
+    timeout = (
+        pagure_config.get("WEBHOOK_CONNECT_TIMEOUT", 10),
+        pagure_config.get("WEBHOOK_TIMEOUT", 60),
+    )
+
+    for attempt in range(retries + 1):
+        if attempt:
+            time.sleep(backoff * 2 ** (attempt - 1))
         _log.info("Calling url %s" % url)
+        start = time.time()
         try:
-            req = requests.post(url, headers=headers, data=content, timeout=60)
-            if not req:
-                _log.info(
-                    "An error occured while querying: %s - "
-                    "Error code: %s" % (url, req.status_code)
-                )
-        except (requests.exceptions.RequestException, Exception) as err:
-            _log.info(
-                "An error occured while querying: %s - Error: %s" % (url, err)
+            req = _get_webhook_session(url).post(
+                url, headers=headers, data=content, timeout=timeout
             )
+        except Exception as err:
+            # Only send the notification again if it was not sent, it may
+            # have been received if the connection failed afterwards
+            error = "Error: %s" % err
+            retry = _is_connect_error(err)
+        else:
+            if req:
+                record_webhook_stats(url, time.time() - start, None)
+                return True
+            status = getattr(req, "status_code", None)
+            error = "Error code: %s" % status
+            retry = status is None or status >= 500 or status == 429
+
+        record_webhook_stats(url, time.time() - start, error)
+        _log.info("An error occured while querying: %s - %s" % (url, error))
+        if not retry:
+            break
+
+    stats = WEBHOOK_STATS.get(url)
+    if stats:
+        _log.info(
+            "Could not deliver to %s, %s of its %s calls failed, average "
+            "time: %.3fs, max time: %.3fs",
+            url,
+            stats["failures"],
+            stats["count"],
+            stats["total_time"] / stats["count"],
+            stats["max_time"],
+        )
+    return False
+
+
+def _is_connect_error(err):
+    """Return whether the error, raised by requests, occurred while
+    connecting to the url, thus before anything was sent to it."""
+    if isinstance(err, requests.exceptions.ConnectTimeout):
+        return True
+    if not isinstance(err, requests.exceptions.ConnectionError):
+        return False
+    reason = err.args[0] if err.args else None
+    # The connection errors are wrapped in a MaxRetryError
+    reason = getattr(reason, "reason", reason)
+    return isinstance(reason, urllib3.exceptions.NewConnectionError)
+
+
+def record_webhook_stats(url, duration, error):
+    """Record the latency and outcome of a call to a web-hook.
+
+    :arg url: the url called
+    :arg duration: the time the call took, in seconds
+    :arg error: the error that occurred, None if the call succeeded
+
+    """
+    with _WEBHOOK_LOCK:
+        stats = WEBHOOK_STATS.pop(url, None) or {
+            "count": 0,
+            "failures": 0,
+            "total_time": 0.0,
+            "max_time": 0.0,
+            "last_error": None,
+        }
+        WEBHOOK_STATS[url] = stats
+        while len(WEBHOOK_STATS) > _WEBHOOK_STATS_SIZE:
+            WEBHOOK_STATS.popitem(last=False)
+        stats["count"] += 1
+        stats["total_time"] += duration
+        stats["max_time"] = max(stats["max_time"], duration)
+        if error is not None:
+            stats["failures"] += 1
+            stats["last_error"] = error
 
 
 @conn.task(queue=pagure_config.get("WEBHOOK_CELERY_QUEUE", None), bind=True)
@@ -154,6 +290,36 @@ def webhook_notification(
     call_web_hooks(project, topic, msg, urls)
 
 
+@conn.task(queue=pagure_config.get("MAIL_CELERY_QUEUE", None), bind=True)
+@pagure_task
+def send_email(self, session, text, subject, to_mail, **kwargs):
+    """Send an email queued by pagure.lib.notify.send_email, re-using the
+    connection to the SMTP server of this worker.
+
+    :arg session: SQLAlchemy session object
+    :type session: sqlalchemy.orm.session.Session
+    :arg text: the content of the email to send
+    :arg subject: the subject of the email
+    :arg to_mail: a string representing a list of recipient separated by a
+        comma
+    :kwarg kwargs: the other arguments of pagure.lib.notify.send_email
+
+    """
+    pagure.lib.notify.deliver_email(
+        text, subject, to_mail, keep_connection=True, **kwargs
+    )
+    stats = pagure.lib.notify.MAIL_STATS
+    _log.info(
+        "Sent %s emails to %s recipients in %.2fs (%s failures, %s "
+        "connections)",
+        stats["messages"],
+        stats["recipients"],
+        stats["total_time"],
+        stats["failures"],
+        stats["connections"],
+    )
+
+
 @conn.task(queue=pagure_config.get("LOGCOM_CELERY_QUEUE", None), bind=True)
 @pagure_task
 def log_commit_send_notifications(
@@ -224,9 +390,57 @@ def log_commit_send_notifications(
         session.rollback()
 
 
+def _get_changed_files(repo_obj, commits):
+    """Return the files changed by the specified commits, diffing the tree
+    of the most recent one with the trees the oldest ones started from,
+    instead of diffing every commit.
+
+    :arg repo_obj: the git repository
+    :type repo_obj: pygit2.Repository
+    :arg commits: the hashes of the commits pushed, most recent first
+    :return: the set of the paths of the files changed
+
+    """
+    commits = [repo_obj.get(commit) for commit in commits]
+    if not commits or None in commits:
+        raise KeyError("Commits not found in %s" % repo_obj.path)
+
+    # The parents of the commits pushed which were not themselves pushed,
+    # that is the heads the history was at before the push
+    pushed = set(commit.oid for commit in commits)
+    bases = set(
+        parent
+        for commit in commits
+        for parent in commit.parent_ids
+        if parent not in pushed
+    )
+
+    tree = commits[0].tree
+    if bases:
+        diffs = [repo_obj[base].tree.diff_to_tree(tree) for base in bases]
+    else:
+        diffs = [tree.diff_to_tree(swap=True)]
+
+    file_list = set()
+    for diff in diffs:
+        for delta in diff.deltas:
+            file_list.add(delta.old_file.path)
+            file_list.add(delta.new_file.path)
+    return file_list
+
+
 def get_files_to_load(title, new_commits_list, abspath):
 
     _log.info("%s: Retrieve the list of files changed" % title)
+    try:
+        return _get_changed_files(pygit2.Repository(abspath), new_commits_list)
+    except (pygit2.GitError, KeyError, ValueError):
+        _log.info(
+            "%s: Could not diff the commits with pygit2, diffing them "
+            "one at a time",
+            title,
+        )
+
     file_list = []
     new_commits_list.reverse()
     n = len(new_commits_list)
@@ -259,6 +473,28 @@ def get_files_to_load(title, new_commits_list, abspath):
     return file_list
 
 
+def _read_file_to_load(repo_obj, head_tree, filename, abspath):
+    """Return the content of the specified file at HEAD, read from the
+    tree if there is one or with ``git show`` otherwise.
+    """
+    if head_tree is None:
+        return "".join(
+            pagure.lib.git.read_git_lines(
+                ["show", "HEAD:%s" % filename], abspath
+            )
+        )
+
+    try:
+        entry = head_tree[filename]
+    except KeyError:
+        # The file was removed
+        return None
+    blob = repo_obj.get(entry.id)
+    if not isinstance(blob, pygit2.Blob):
+        return None
+    return blob.data.decode("utf-8")
+
+
 @conn.task(queue=pagure_config.get("LOADJSON_CELERY_QUEUE", None), bind=True)
 @pagure_task
 def load_json_commits_to_db(
@@ -275,6 +511,14 @@ def load_json_commits_to_db(
     """Loads into the database the specified commits that have been pushed
     to either the tickets or the pull-request repository.
 
+    The files changed are found with a single diff of the trees and read
+    directly from the git repository, the projects and users they refer to
+    are looked up once for the whole import, and the progress is reported
+    every ``LOADJSON_PROGRESS_INTERVAL`` files.
+
+    :return: a dict with the number of files processed, loaded, skipped
+        and failed and the time the import took
+
     """
 
     if data_type not in ["ticket", "pull-request"]:
@@ -305,6 +549,7 @@ def load_json_commits_to_db(
         abspath,
     )
 
+    start = time.time()
     file_list = set(get_files_to_load(project.fullname, commits, abspath))
     n = len(file_list)
     _log.info("LOADJSON: %s files to process" % n)
@@ -317,6 +562,16 @@ def load_json_commits_to_db(
         "",
     ]
 
+    repo_obj = head_tree = None
+    try:
+        repo_obj = pygit2.Repository(abspath)
+        head_tree = repo_obj.revparse_single("HEAD").peel(pygit2.Tree)
+    except (pygit2.GitError, KeyError, ValueError):
+        pass
+
+    interval = max(pagure_config.get("LOADJSON_PROGRESS_INTERVAL", 100), 1)
+    cache = {}
+    result = {"files": n, "loaded": 0, "skipped": 0, "failed": 0}
     for idx, filename in enumerate(sorted(file_list)):
         _log.info(
             "LOADJSON: Loading: %s: %s -- %s/%s",
@@ -328,11 +583,7 @@ def load_json_commits_to_db(
         tmp = "Loading: %s -- %s/%s" % (filename, idx + 1, n)
         try:
             json_data = None
-            data = "".join(
-                pagure.lib.git.read_git_lines(
-                    ["show", "HEAD:%s" % filename], abspath
-                )
-            )
+            data = _read_file_to_load(repo_obj, head_tree, filename, abspath)
             if data and not filename.startswith("files/"):
                 try:
                     json_data = json.loads(data)
@@ -348,6 +599,7 @@ def load_json_commits_to_db(
                         issue_uid=filename,
                         json_data=json_data,
                         agent=agent,
+                        cache=cache,
                     )
                 elif data_type == "pull-request":
                     pagure.lib.git.update_request_from_git(
@@ -357,21 +609,32 @@ def load_json_commits_to_db(
                         username=username,
                         request_uid=filename,
                         json_data=json_data,
+                        cache=cache,
                     )
                 tmp += " ... ... Done"
+                result["loaded"] += 1
             else:
                 tmp += " ... ... SKIPPED - No JSON data"
                 mail_body.append(tmp)
+                result["skipped"] += 1
         except Exception as err:
             _log.info("data: %s", json_data)
             session.rollback()
             _log.exception(err)
             tmp += " ... ... FAILED\n"
             tmp += format_callstack()
+            result["failed"] += 1
             break
         finally:
             mail_body.append(tmp)
 
+        if (idx + 1) % interval == 0:
+            _report_load_progress(self, project, result, idx + 1, start)
+
+    result["duration"] = time.time() - start
+    result["files_per_second"] = n / result["duration"] if n else 0
+    _report_load_progress(self, project, result, n, start)
+
     try:
         session.commit()
         _log.info(
@@ -394,6 +657,28 @@ def load_json_commits_to_db(
     except SQLAlchemyError:  # pragma: no cover
         session.rollback()
     _log.info("LOADJSON: Ready for another")
+    return result
+
+
+def _report_load_progress(task, project, result, done, start):
+    """Log how far the import of the JSON files of a project is, and report
+    it as the state of the task."""
+    duration = time.time() - start
+    rate = done / duration if duration else 0
+    _log.info(
+        "LOADJSON: %s: %s/%s files processed in %.2fs (%.1f files/s)",
+        project.fullname,
+        done,
+        result["files"],
+        duration,
+        rate,
+    )
+    if task is not None:
+        meta = dict(result, done=done, files_per_second=rate)
+        try:
+            task.update_state(state="PROGRESS", meta=meta)
+        except TypeError:
+            pass
 
 
 @conn.task(queue=pagure_config.get("CI_CELERY_QUEUE", None), bind=True)
@@ -11,16 +11,66 @@
 from __future__ import unicode_literals, absolute_import
 
 import gc
+import logging
+import time
 from functools import wraps
 
+from celery.signals import worker_process_init
+
 import pagure.lib.model_base
 from pagure.config import config as pagure_config
 
+psutil = None
+try:
+    import psutil
+except (OSError, ImportError):  # pragma: no cover
+    pass
+
+
+_log = logging.getLogger(__name__)
+
+# Session bound once per worker process when TASK_WORKER_SESSION is set
+WORKER_SESSION = None
+# Timing and memory counters of the tasks ran by this process, per task name
+TASK_STATS = {}
+# Number of tasks ran by this process, used by the "every_n" GC policy
+_TASKS_RAN = [0]
+# Engines inherited from the parent process, kept so their connections are
+# never closed (nor garbage collected) from this process
+_INHERITED_ENGINES = []
+
+
+@worker_process_init.connect
+def init_worker_session(**kwargs):
+    """Bind one engine and connection pool to this worker process when
+    the ``TASK_WORKER_SESSION`` configuration key is set.
+
+    The tasks then all use the same scoped session, which is cleaned up
+    at the end of each of them.
+    """
+    global WORKER_SESSION
+    if not pagure_config.get("TASK_WORKER_SESSION", False):
+        return
+
+    # Connections inherited from the parent process must not be shared.
+    # They are not closed either: closing them would also end them for the
+    # parent process, which still uses them.
+    if pagure.lib.model_base.SESSIONMAKER is not None:
+        _INHERITED_ENGINES.append(
+            pagure.lib.model_base.SESSIONMAKER.kw["bind"]
+        )
+        pagure.lib.model_base.SESSIONMAKER = None
+    WORKER_SESSION = pagure.lib.model_base.create_session(
+        pagure_config["DB_URL"]
+    )
+
 
 def pagure_task(function):
     """Simple decorator that is responsible for:
     * Adjusting the status of the task when it starts
     * Creating and cleaning up a SQLAlchemy session
+    * Running the garbage collector as per ``TASK_GC_POLICY``
+    * Recording the timing and memory counters of the task
     """
 
     @wraps(function)
@@ -31,7 +81,13 @@ def pagure_task(function):
                 self.update_state(state="RUNNING")
             except TypeError:
                 pass
-        session = pagure.lib.model_base.create_session(pagure_config["DB_URL"])
+        start = time.time()
+        rss_start = get_rss()
+        session = WORKER_SESSION
+        if session is None:
+            session = pagure.lib.model_base.create_session(
+                pagure_config["DB_URL"]
+            )
         try:
             return function(self, session, *args, **kwargs)
         except:  # noqa: E722
@@ -41,12 +97,107 @@ def pagure_task(function):
             raise
         finally:
             session.remove()
-            gc_clean()
+            collected = gc_after_task()
+            record_task_stats(
+                function.__name__,
+                time.time() - start,
+                rss_start,
+                get_rss(),
+                collected,
+            )
 
     return decorated_function
 
 
+def get_rss():
+    """Return the resident set size of the current process in bytes, or
+    None if psutil is not available.
+    """
+    if not psutil:
+        return None
+    return psutil.Process().memory_info().rss
+
+
 def gc_clean():
     """Force a run of the garbage collector."""
     # https://pagure.io/pagure/issue/2302
-    gc.collect()
+    return gc.collect()
+
+
+def gc_after_task():
+    """Run the garbage collector at the end of a task according to the
+    ``TASK_GC_POLICY`` configuration key:
+
+    * ``always``: run a full collection after every task (default)
+    * ``every_n``: run a full collection every ``TASK_GC_EVERY_N`` tasks
+    * ``rss``: run a full collection when the resident set size of the
+      process is above ``TASK_GC_RSS_THRESHOLD`` bytes
+    * ``gen0``: only collect the youngest generation
+    * ``never``: leave it to the automatic garbage collection
+
+    :return: the number of unreachable objects found, or None if the
+        garbage collector was not run
+
+    """
+    policy = pagure_config.get("TASK_GC_POLICY", "always")
+    _TASKS_RAN[0] += 1
+
+    if policy == "never":
+        return None
+    elif policy == "gen0":
+        return gc.collect(0)
+    elif policy == "every_n":
+        if _TASKS_RAN[0] % max(pagure_config["TASK_GC_EVERY_N"], 1):
+            return None
+    elif policy == "rss":
+        rss = get_rss()
+        if rss is not None and rss < pagure_config["TASK_GC_RSS_THRESHOLD"]:
+            return None
+    elif policy != "always":
+        _log.warning("Unknown TASK_GC_POLICY %r, collecting", policy)
+
+    return gc_clean()
+
+
+def record_task_stats(name, duration, rss_start, rss_end, collected):
+    """Record the timing and memory counters of a task that just ran.
+
+    :arg name: the name of the task
+    :arg duration: the time the task took, in seconds
+    :arg rss_start: the resident set size at the start of the task, in bytes
+    :arg rss_end: the resident set size at the end of the task, in bytes
+    :arg collected: the value returned by ``gc_after_task``
+
+    """
+    stats = TASK_STATS.setdefault(
+        name,
+        {
+            "count": 0,
+            "total_time": 0.0,
+            "max_time": 0.0,
+            "max_rss": 0,
+            "max_rss_growth": 0,
+            "gc_runs": 0,
+            "gc_collected": 0,
+        },
+    )
+    stats["count"] += 1
+    stats["total_time"] += duration
+    stats["max_time"] = max(stats["max_time"], duration)
+    if rss_start is not None and rss_end is not None:
+        stats["max_rss"] = max(stats["max_rss"], rss_end)
+        stats["max_rss_growth"] = max(
+            stats["max_rss_growth"], rss_end - rss_start
+        )
+    if collected is not None:
+        stats["gc_runs"] += 1
+        stats["gc_collected"] += collected
+
+    _log.debug(
+        "Task %s ran in %.3fs, RSS: %s -> %s, GC collected: %s",
+        name,
+        duration,
+        rss_start,
+        rss_end,
+        collected,
+    )
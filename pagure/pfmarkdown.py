@@ -87,9 +87,185 @@ IMPLICIT_ISSUE_RE = r"(?<!\w)(?:PREPROCIMPLLINK|#)([0-9]+)"
 IMPLICIT_PR_RE = r"(?<!\w)PR#([0-9]+)"
 IMPLICIT_COMMIT_RE = r"(?<![<\w#])([a-f0-9]{7,40})"
 STRIKE_THROUGH_RE = r"~~(.*?)~~"
+# Matches the texts whose rendering depends on the database or on the
+# project being viewed, i.e. the texts with mentions or references
+REFERENCES_RE = re.compile(
+    "|".join(
+        [
+            MENTION_RE,
+            EXPLICIT_LINK_RE.replace("?P<id>", ""),
+            COMMIT_LINK_RE.replace("?P<id>", ""),
+            IMPLICIT_ISSUE_RE,
+            IMPLICIT_PR_RE,
+            IMPLICIT_COMMIT_RE,
+        ]
+    )
+)
+
+
+class References(object):
+    """The users, projects, issues, pull-requests and commits referenced
+    in a document.
+
+    All the references found in the document are looked up before it is
+    rendered: the users in a single query, the projects once each and
+    their issues and pull-requests in a single query per type, so that
+    rendering the document then only looks them up in what was loaded.
+    The references which were not found beforehand are looked up one at
+    a time.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        """Forget the references of the previous document."""
+        self._users = {}
+        self._projects = {}
+        self._searches = {}
+        self._objects = {}
+        self._git_repos = {}
+
+    def prefetch(self, text):
+        """Look up in bulk the references found in the given text."""
+        self.reset()
+
+        usernames = set(
+            match.group(1) for match in re.finditer(MENTION_RE, text)
+        )
+        keys = set()
+        for match in re.finditer(EXPLICIT_LINK_RE, text):
+            user, namespace = _get_user_namespace(*match.group(1, 2, 3))
+            keys.add((user, namespace, match.group(4), int(match.group(5))))
+        ids = set(
+            int(match.group(1))
+            for regex in (IMPLICIT_ISSUE_RE, IMPLICIT_PR_RE)
+            for match in re.finditer(regex, text)
+        )
+        if not usernames and not keys and not ids:
+            return
+
+        try:
+            if ids:
+                namespace, repo, user = _get_ns_repo_user()
+                keys.update((user, namespace, repo, idx) for idx in ids)
+        except RuntimeError:
+            _log.debug("No repo found associated with this context")
+
+        try:
+            self.load_users(usernames)
+            self.load_objects(keys)
+        except RuntimeError:
+            # Not rendering the document for a request, the references
+            # will be looked up as they are rendered
+            _log.debug("No app context, not prefetching the references")
+
+    def load_users(self, usernames):
+        """Look up in a single query the users of the given usernames."""
+        usernames = set(usernames).difference(self._users)
+        if not usernames:
+            return
+        users = pagure.lib.query.search_users_by_usernames(
+            flask.g.session, usernames
+        )
+        for username in usernames:
+            self._users[username] = users.get(username)
+
+    def load_objects(self, keys):
+        """Look up the issues and pull-requests of the given
+        (user, namespace, repo, id) references, in a single query per type.
+        """
+        references = {}
+        for key in set(keys).difference(self._objects):
+            self._objects[key] = None
+            project = self.get_project(*key[:3])
+            if project:
+                references.setdefault((project.id, key[3]), []).append(key)
+        if not references:
+            return
+
+        issues = pagure.lib.query.search_issues_by_ids(
+            flask.g.session, references
+        )
+        requests = {}
+        missing = [ref for ref in references if ref not in issues]
+        if missing:
+            requests = pagure.lib.query.search_pull_requests_by_ids(
+                flask.g.session, missing
+            )
+        for ref, ref_keys in references.items():
+            for key in ref_keys:
+                self._objects[key] = issues.get(ref) or requests.get(ref)
+
+    def get_user(self, username):
+        """Return the user of the given username, if any."""
+        self.load_users([username])
+        return self._users[username]
+
+    def get_project(self, user, namespace, repo):
+        """Return the project of the given name, if the current user can
+        access it.
+        """
+        key = (user, namespace, repo)
+        if key not in self._projects:
+            self._projects[key] = pagure.lib.query.get_authorized_project(
+                flask.g.session,
+                project_name=repo,
+                user=user,
+                namespace=namespace,
+            )
+        return self._projects[key]
+
+    def get_object(self, user, namespace, repo, idx):
+        """Return the issue or, if there is no such issue, the pull-request
+        of the given project with the given identifier, if any.
+        """
+        key = (user, namespace, repo, idx)
+        self.load_objects([key])
+        return self._objects[key]
+
+    def project_exists(self, user, is_fork, namespace, repo):
+        """Return whether projects of the given name are found."""
+        key = (user, is_fork, namespace, repo)
+        if key not in self._searches:
+            self._searches[key] = bool(
+                pagure.lib.query.search_projects(
+                    flask.g.session,
+                    username=user,
+                    fork=is_fork,
+                    namespace=namespace,
+                    pattern=repo,
+                )
+            )
+        return self._searches[key]
+
+    def commit_exists(self, user, namespace, repo, githash):
+        """Return whether the given commit exists in the git repository of
+        the given project, opened once for all its commits.
+        """
+        key = (user, namespace, repo)
+        if key not in self._git_repos:
+            project = self.get_project(user, namespace, repo)
+            self._git_repos[key] = None
+            if project:
+                self._git_repos[key] = pygit2.Repository(
+                    pagure.utils.get_repo_path(project)
+                )
+        git_repo = self._git_repos[key]
+        return git_repo is not None and githash in git_repo
+
+
+class ReferencePattern(markdown.inlinepatterns.Pattern):
+    """Base class of the patterns rendering references, looking them up
+    in the references of the document.
+    """
 
+    def __init__(self, pattern, references):
+        super(ReferencePattern, self).__init__(pattern)
+        self.references = references
 
-class MentionPattern(markdown.inlinepatterns.Pattern):
+
+class MentionPattern(ReferencePattern):
     """@user pattern class."""
 
     def handleMatch(self, m):
@@ -98,7 +274,7 @@ class MentionPattern(markdown.inlinepatterns.Pattern):
 
         name = markdown.util.AtomicString(m.group(2))
         text = "@%s" % name
-        user = pagure.lib.query.search_user(flask.g.session, username=name)
+        user = self.references.get_user(name)
         if not user:
             return text
 
@@ -112,48 +288,31 @@ class MentionPattern(markdown.inlinepatterns.Pattern):
         return element
 
 
-class ExplicitLinkPattern(markdown.inlinepatterns.Pattern):
+class ExplicitLinkPattern(ReferencePattern):
     """Explicit link pattern."""
 
     def handleMatch(self, m):
         """When the pattern matches, update the text."""
         _log.debug("ExplicitLinkPattern: %s", m.groups())
 
-        is_fork = m.group(2)
-        user = m.group(3)
-        namespace = m.group(4)
+        user, namespace = _get_user_namespace(*m.group(2, 3, 4))
         repo = m.group(5)
         idx = m.group(6)
-        text = "%s#%s" % (repo, idx)
-
-        if not is_fork and user:
-            namespace = user
-            user = None
-
-        if namespace:
-            namespace = namespace.rstrip("/")
-            text = "%s/%s" % (namespace, text)
-        if user:
-            user = user.rstrip("/")
-            text = "%s/%s" % (user.rstrip("/"), text)
+        text = _reference_text(user, namespace, repo, idx)
 
         try:
             idx = int(idx)
         except (ValueError, TypeError):
             return text
 
-        issue = _issue_exists(user, namespace, repo, idx)
-        if issue:
-            return _obj_anchor_tag(user, namespace, repo, issue, text)
-
-        request = _pr_exists(user, namespace, repo, idx)
-        if request:
-            return _obj_anchor_tag(user, namespace, repo, request, text)
+        obj = self.references.get_object(user, namespace, repo, idx)
+        if obj:
+            return _obj_anchor_tag(user, namespace, repo, obj, text)
 
         return text
 
 
-class CommitLinkPattern(markdown.inlinepatterns.Pattern):
+class CommitLinkPattern(ReferencePattern):
     """Commit link pattern."""
 
     def handleMatch(self, m):
@@ -161,35 +320,34 @@ class CommitLinkPattern(markdown.inlinepatterns.Pattern):
         _log.debug("CommitLinkPattern: %s", m.groups())
 
         is_fork = m.group(2)
-        user = m.group(3)
-        namespace = m.group(4)
+        user, namespace = _get_user_namespace(*m.group(2, 3, 4))
         repo = m.group(5)
         commitid = m.group(6)
-        text = "%s#%s" % (repo, commitid)
+        text = _reference_text(user, namespace, repo, commitid)
 
-        if not is_fork and user:
-            namespace = user
-            user = None
-
-        if namespace:
-            namespace = namespace.rstrip("/")
-            text = "%s/%s" % (namespace, text)
-        if user:
-            user = user.rstrip("/")
-            text = "%s/%s" % (user.rstrip("/"), text)
-
-        if pagure.lib.query.search_projects(
-            flask.g.session,
-            username=user,
-            fork=is_fork,
-            namespace=namespace,
-            pattern=repo,
-        ):
+        if self.references.project_exists(user, is_fork, namespace, repo):
             return _obj_anchor_tag(user, namespace, repo, commitid, text)
 
         return text
 
 
+class ReferencesPreprocessor(markdown.preprocessors.Preprocessor):
+    """
+    Preprocessor looking up in bulk all the references of the document
+    before it is rendered.
+    """
+
+    def __init__(self, references):
+        super(ReferencesPreprocessor, self).__init__()
+        self.references = references
+
+    def run(self, lines):
+        """Prefetch the references found in the lines, unchanged."""
+        _log.debug("ReferencesPreprocessor")
+        self.references.prefetch("\n".join(lines))
+        return lines
+
+
 class ImplicitIssuePreprocessor(markdown.preprocessors.Preprocessor):
     """
     Preprocessor which handles lines starting with an implicit
@@ -197,6 +355,10 @@ class ImplicitIssuePreprocessor(markdown.preprocessors.Preprocessor):
     them as headers.
     """
 
+    def __init__(self, references):
+        super(ImplicitIssuePreprocessor, self).__init__()
+        self.references = references
+
     def run(self, lines):
         """
         If a line starts with an implicit issue link like #152,
@@ -225,9 +387,7 @@ class ImplicitIssuePreprocessor(markdown.preprocessors.Preprocessor):
                         # non-match path, keep original line
                         new_lines.append(line)
                         continue
-                    if _issue_exists(user, namespace, repo, idx) or _pr_exists(
-                        user, namespace, repo, idx
-                    ):
+                    if self.references.get_object(user, namespace, repo, idx):
                         # tweak the text
                         new_lines.append("PREPROCIMPLLINK" + line[1:])
                         continue
@@ -237,7 +397,7 @@ class ImplicitIssuePreprocessor(markdown.preprocessors.Preprocessor):
         return new_lines
 
 
-class ImplicitIssuePattern(markdown.inlinepatterns.Pattern):
+class ImplicitIssuePattern(ReferencePattern):
     """Implicit issue pattern."""
 
     def handleMatch(self, m):
@@ -265,21 +425,16 @@ class ImplicitIssuePattern(markdown.inlinepatterns.Pattern):
             idx,
         )
 
-        issue = _issue_exists(user, namespace, repo, idx)
-        if issue:
-            _log.debug("Linking to an issue")
-            return _obj_anchor_tag(user, namespace, repo, issue, text)
-
-        request = _pr_exists(user, namespace, repo, idx)
-        if request:
-            _log.debug("Linking to an PR")
-            return _obj_anchor_tag(user, namespace, repo, request, text)
+        obj = self.references.get_object(user, namespace, repo, idx)
+        if obj:
+            _log.debug("Linking to the %s", obj.isa)
+            return _obj_anchor_tag(user, namespace, repo, obj, text)
 
         _log.debug("Bailing, return text as is")
         return text
 
 
-class ImplicitPRPattern(markdown.inlinepatterns.Pattern):
+class ImplicitPRPattern(ReferencePattern):
     """Implicit pull-request pattern."""
 
     def handleMatch(self, m):
@@ -297,18 +452,14 @@ class ImplicitPRPattern(markdown.inlinepatterns.Pattern):
         except RuntimeError:
             return text
 
-        issue = _issue_exists(user, namespace, repo, idx)
-        if issue:
-            return _obj_anchor_tag(user, namespace, repo, issue, text)
-
-        request = _pr_exists(user, namespace, repo, idx)
-        if request:
-            return _obj_anchor_tag(user, namespace, repo, request, text)
+        obj = self.references.get_object(user, namespace, repo, idx)
+        if obj:
+            return _obj_anchor_tag(user, namespace, repo, obj, text)
 
         return text
 
 
-class ImplicitCommitPattern(markdown.inlinepatterns.Pattern):
+class ImplicitCommitPattern(ReferencePattern):
     """Implicit commit pattern."""
 
     def handleMatch(self, m):
@@ -323,9 +474,9 @@ class ImplicitCommitPattern(markdown.inlinepatterns.Pattern):
         except RuntimeError:
             return text
 
-        if pagure.lib.query.search_projects(
-            flask.g.session, username=user, namespace=namespace, pattern=repo
-        ) and _commit_exists(user, namespace, repo, githash):
+        if self.references.project_exists(
+            user, None, namespace, repo
+        ) and self.references.commit_exists(user, namespace, repo, githash):
             return _obj_anchor_tag(user, namespace, repo, githash, text[:7])
 
         return text
@@ -407,7 +558,18 @@ class EncapsulateMarkdownPostprocessor(markdown.postprocessors.Postprocessor):
 
 
 class PagureExtension(markdown.extensions.Extension):
+    def __init__(self, **kwargs):
+        super(PagureExtension, self).__init__(**kwargs)
+        # The references of the document being rendered, shared by the
+        # processors and patterns below
+        self.references = References()
+
+    def reset(self):
+        self.references.reset()
+
     def extendMarkdown(self, md, *args):
+        references = self.references
+
         # First, make it so that bare links get automatically linkified.
         AUTOLINK_RE = "(%s)" % "|".join(
             [
@@ -420,28 +582,33 @@ class PagureExtension(markdown.extensions.Extension):
 
         def _old_mardkown_way():
             markdown.inlinepatterns.AUTOLINK_RE = AUTOLINK_RE
-            md.preprocessors["implicit_issue"] = ImplicitIssuePreprocessor()
-            md.inlinePatterns["mention"] = MentionPattern(MENTION_RE)
+            md.preprocessors["references"] = ReferencesPreprocessor(references)
+            md.preprocessors["implicit_issue"] = ImplicitIssuePreprocessor(
+                references
+            )
+            md.inlinePatterns["mention"] = MentionPattern(
+                MENTION_RE, references
+            )
             # Customize the image linking to support lazy loading
             md.inlinePatterns["image_link"] = ImagePatternLazyLoad(
                 markdown.inlinepatterns.IMAGE_LINK_RE, md
             )
             md.inlinePatterns["implicit_commit"] = ImplicitCommitPattern(
-                IMPLICIT_COMMIT_RE
+                IMPLICIT_COMMIT_RE, references
             )
             md.inlinePatterns["commit_links"] = CommitLinkPattern(
-                COMMIT_LINK_RE
+                COMMIT_LINK_RE, references
             )
             md.inlinePatterns["autolink"] = AutolinkPattern2(AUTOLINK_RE, md)
             if pagure_config.get("ENABLE_TICKETS", True):
                 md.inlinePatterns["implicit_pr"] = ImplicitPRPattern(
-                    IMPLICIT_PR_RE
+                    IMPLICIT_PR_RE, references
                 )
                 md.inlinePatterns["explicit_fork_issue"] = ExplicitLinkPattern(
-                    EXPLICIT_LINK_RE
+                    EXPLICIT_LINK_RE, references
                 )
                 md.inlinePatterns["implicit_issue"] = ImplicitIssuePattern(
-                    IMPLICIT_ISSUE_RE
+                    IMPLICIT_ISSUE_RE, references
                 )
             md.inlinePatterns["striked"] = StrikeThroughPattern(
                 STRIKE_THROUGH_RE
@@ -458,10 +625,13 @@ class PagureExtension(markdown.extensions.Extension):
             # processed first.
 
             md.preprocessors.register(
-                ImplicitIssuePreprocessor(), "implicit_issue", 100
+                ReferencesPreprocessor(references), "references", 105
+            )
+            md.preprocessors.register(
+                ImplicitIssuePreprocessor(references), "implicit_issue", 100
             )
             md.inlinePatterns.register(
-                MentionPattern(MENTION_RE), "mention", 95
+                MentionPattern(MENTION_RE, references), "mention", 95
             )
             # Customize the image linking to support lazy loading
             md.inlinePatterns.register(
@@ -472,27 +642,29 @@ class PagureExtension(markdown.extensions.Extension):
                 90,
             )
             md.inlinePatterns.register(
-                ImplicitCommitPattern(IMPLICIT_COMMIT_RE),
+                ImplicitCommitPattern(IMPLICIT_COMMIT_RE, references),
                 "implicit_commit",
                 85,
             )
             md.inlinePatterns.register(
-                CommitLinkPattern(COMMIT_LINK_RE), "autolink2", 80
+                CommitLinkPattern(COMMIT_LINK_RE, references), "autolink2", 80
             )
             md.inlinePatterns.register(
                 AutolinkPattern2(AUTOLINK_RE, md), "commit_links", 75
             )
             if pagure_config.get("ENABLE_TICKETS", True):
                 md.inlinePatterns.register(
-                    ImplicitPRPattern(IMPLICIT_PR_RE), "implicit_pr", 70
+                    ImplicitPRPattern(IMPLICIT_PR_RE, references),
+                    "implicit_pr",
+                    70,
                 )
                 md.inlinePatterns.register(
-                    ExplicitLinkPattern(EXPLICIT_LINK_RE),
+                    ExplicitLinkPattern(EXPLICIT_LINK_RE, references),
                     "explicit_fork_issue",
                     65,
                 )
                 md.inlinePatterns.register(
-                    ImplicitIssuePattern(IMPLICIT_ISSUE_RE),
+                    ImplicitIssuePattern(IMPLICIT_ISSUE_RE, references),
                     "implicit_issue",
                     60,
                 )
@@ -515,54 +687,30 @@ def makeExtension(*arg, **kwargs):
     return PagureExtension(**kwargs)
 
 
-def _issue_exists(user, namespace, repo, idx):
-    """Utility method checking if a given issue exists."""
-
-    repo_obj = pagure.lib.query.get_authorized_project(
-        flask.g.session, project_name=repo, user=user, namespace=namespace
-    )
-
-    if not repo_obj:
-        return False
-
-    issue_obj = pagure.lib.query.search_issues(
-        flask.g.session, repo=repo_obj, issueid=idx
-    )
-    if not issue_obj:
-        return False
-
-    return issue_obj
-
-
-def _pr_exists(user, namespace, repo, idx):
-    """Utility method checking if a given PR exists."""
-    repo_obj = pagure.lib.query.get_authorized_project(
-        flask.g.session, project_name=repo, user=user, namespace=namespace
-    )
-
-    if not repo_obj:
-        return False
-
-    pr_obj = pagure.lib.query.search_pull_requests(
-        flask.g.session, project_id=repo_obj.id, requestid=idx
-    )
-    if not pr_obj:
-        return False
-
-    return pr_obj
-
-
-def _commit_exists(user, namespace, repo, githash):
-    """Utility method checking if a given commit exists."""
-    repo_obj = pagure.lib.query.get_authorized_project(
-        flask.g.session, project_name=repo, user=user, namespace=namespace
-    )
-    if not repo_obj:
-        return False
-
-    reponame = pagure.utils.get_repo_path(repo_obj)
-    git_repo = pygit2.Repository(reponame)
-    return githash in git_repo
+def _get_user_namespace(is_fork, user, namespace):
+    """Return the user and namespace of a project referenced explicitly,
+    from the groups matched by EXPLICIT_LINK_RE or COMMIT_LINK_RE.
+    """
+    if not is_fork and user:
+        namespace = user
+        user = None
+
+    if namespace:
+        namespace = namespace.rstrip("/")
+    if user:
+        user = user.rstrip("/")
+
+    return (user, namespace)
+
+
+def _reference_text(user, namespace, repo, identifier):
+    """Return the text of a reference to an object of a project."""
+    text = "%s#%s" % (repo, identifier)
+    if namespace:
+        text = "%s/%s" % (namespace, text)
+    if user:
+        text = "%s/%s" % (user, text)
+    return text
 
 
 def _obj_anchor_tag(user, namespace, repo, obj, text):
@@ -14,6 +14,7 @@ import base64
 import logging
 import subprocess
 import tempfile
+import threading
 import os
 
 import flask
@@ -174,56 +175,111 @@ def proxy_raw_git(project):
         _log.debug("Running git via git directly")
         cmd = ["/usr/bin/git", "http-backend"]
 
-    # Note: using a temporary files to buffer the input contents
-    # is non-ideal, but it is a way to make sure we don't need to have
-    # the full input (which can be very long) in memory.
-    # Ideally, we'd directly stream, but that's an RFE for the future,
-    # since that needs to happen in other threads so as to not block.
-    # (See the warnings in the subprocess module)
-    with tempfile.SpooledTemporaryFile() as infile:
-        while True:
-            block = flask.request.stream.read(4096)
-            if not block:
-                break
-            infile.write(block)
-        infile.seek(0)
-
+    buffer_size = pagure_config.get("HTTP_REPO_ACCESS_BUFFER_SIZE", 65536)
+    if pagure_config.get("HTTP_REPO_ACCESS_STREAMING", False):
+        # Stream the input to the subprocess from another thread, so we
+        # do not block reading its output (see the warnings in the
+        # subprocess module). The writes to the pipe block while git
+        # does not keep up, which in turn stops reading from the client.
         _log.debug("Calling: %s", cmd)
         proc = subprocess.Popen(
-            cmd, stdin=infile, stdout=subprocess.PIPE, stderr=None, env=gitenv
+            cmd,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=None,
+            env=gitenv,
+            bufsize=buffer_size,
+        )
+        feeder = threading.Thread(
+            target=_feed_stdin,
+            args=(flask.request.stream, proc.stdin, buffer_size),
+            name="pagure-git-stdin",
         )
+        feeder.daemon = True
+        feeder.start()
+    else:
+        # Note: using a temporary files to buffer the input contents
+        # makes sure we don't need to have the full input (which can be
+        # very long) in memory, at the cost of writing it all to disk
+        # before git starts. See HTTP_REPO_ACCESS_STREAMING.
+        with tempfile.SpooledTemporaryFile() as infile:
+            while True:
+                block = flask.request.stream.read(buffer_size)
+                if not block:
+                    break
+                infile.write(block)
+            infile.seek(0)
+
+            _log.debug("Calling: %s", cmd)
+            proc = subprocess.Popen(
+                cmd,
+                stdin=infile,
+                stdout=subprocess.PIPE,
+                stderr=None,
+                env=gitenv,
+                bufsize=buffer_size,
+            )
 
-        out = proc.stdout
+    out = proc.stdout
+
+    # First, gather the response head
+    headers = {}
+    while True:
+        line = out.readline()
+        if not line:
+            raise Exception("End of file while reading headers?")
+        # This strips the \n, meaning end-of-headers
+        line = line.strip()
+        if not line:
+            break
+        header = line.split(b": ", 1)
+        header[0] = header[0].decode("utf-8")
+        headers[str(header[0].lower())] = header[1]
+
+    if len(headers) == 0:
+        raise Exception("No response at all received")
+
+    if "status" not in headers:
+        # If no status provided, assume 200 OK as per RFC3875
+        headers[str("status")] = "200 OK"
+
+    respcode, respmsg = headers.pop("status").split(" ", 1)
+    wrapout = werkzeug.wsgi.wrap_file(
+        flask.request.environ, out, buffer_size=buffer_size
+    )
+    return flask.Response(
+        wrapout,
+        status=int(respcode),
+        headers=headers,
+        direct_passthrough=True,
+    )
+
+
+def _feed_stdin(stream, stdin, buffer_size):
+    """Copy the content of the request stream to the stdin of the git
+    subprocess, closing it once the request has been entirely read.
 
-        # First, gather the response head
-        headers = {}
+    :arg stream: the stream of the request body
+    :arg stdin: the stdin pipe of the git subprocess
+    :arg buffer_size: the size of the blocks to copy
+    :type buffer_size: int
+
+    """
+    try:
         while True:
-            line = out.readline()
-            if not line:
-                raise Exception("End of file while reading headers?")
-            # This strips the \n, meaning end-of-headers
-            line = line.strip()
-            if not line:
+            block = stream.read(buffer_size)
+            if not block:
                 break
-            header = line.split(b": ", 1)
-            header[0] = header[0].decode("utf-8")
-            headers[str(header[0].lower())] = header[1]
-
-        if len(headers) == 0:
-            raise Exception("No response at all received")
-
-        if "status" not in headers:
-            # If no status provided, assume 200 OK as per RFC3875
-            headers[str("status")] = "200 OK"
-
-        respcode, respmsg = headers.pop("status").split(" ", 1)
-        wrapout = werkzeug.wsgi.wrap_file(flask.request.environ, out)
-        return flask.Response(
-            wrapout,
-            status=int(respcode),
-            headers=headers,
-            direct_passthrough=True,
-        )
+            stdin.write(block)
+    except (IOError, OSError) as err:
+        # git exited before reading everything or the client went away,
+        # either way the subprocess will report the error
+        _log.info("Could not stream the request to git: %s", err)
+    finally:
+        try:
+            stdin.close()
+        except (IOError, OSError):
+            pass
 
 
 def proxy_repospanner(project, service):
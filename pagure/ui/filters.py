@@ -15,9 +15,11 @@
 
 from __future__ import unicode_literals, absolute_import
 
+import collections
 import textwrap
 import logging
 import os
+import time
 from os.path import splitext
 
 import arrow
@@ -32,12 +34,104 @@ from jinja2 import escape
 import pagure.exceptions
 import pagure.lib.query
 import pagure.forms
+import pagure.utils
 from pagure.config import config as pagure_config
 from pagure.ui import UI_NS
 from pagure.utils import authenticated, is_repo_committer, is_true
 
 
 _log = logging.getLogger(__name__)
+
+# What the templates need to know about a user
+Identity = collections.namedtuple("Identity", ["username", "default_email"])
+
+# Users looked up by the filters, shared by the requests served by this
+# process: ("email"|"username", value) -> (Identity or None, expiration)
+_IDENTITY_CACHE = pagure.utils.LRUCache()
+
+
+def resolve_identities(emails=(), usernames=()):
+    """Look up the users owning the specified emails or having the specified
+    usernames, all at once.
+
+    The users found (and the emails and usernames which do not match any
+    user) are remembered until the end of the request, so the template
+    filters showing them do not query the database again, as well as
+    for ``IDENTITY_CACHE_TTL`` seconds by the process.
+    Views should call this with all the authors they are about to display.
+
+    :kwarg emails: the emails to look the users of
+    :kwarg usernames: the usernames to look the users of
+    :return: a dict associating each ``("email", email)`` and
+        ``("username", username)`` looked up to its Identity, or None if
+        there is no such user
+    :rtype: dict
+
+    """
+    resolved = flask.g.get("identities")
+    if resolved is None:
+        resolved = flask.g.identities = {}
+
+    missing = set(("email", email) for email in emails if email)
+    missing.update(("username", name) for name in usernames if name)
+    missing.difference_update(resolved)
+    if not missing:
+        return resolved
+
+    ttl = pagure_config.get("IDENTITY_CACHE_TTL", 0)
+    now = time.time()
+    if ttl:
+        for key in list(missing):
+            cached = _IDENTITY_CACHE.lookup(key)
+            if cached and cached[1] > now:
+                resolved[key] = cached[0]
+                missing.discard(key)
+    if not missing:
+        return resolved
+
+    found = {}
+    by_email = pagure.lib.query.search_users_by_emails(
+        flask.g.session, [value for kind, value in missing if kind == "email"]
+    )
+    by_username = pagure.lib.query.search_users_by_usernames(
+        flask.g.session,
+        [value for kind, value in missing if kind == "username"],
+    )
+    for kind, users in (("email", by_email), ("username", by_username)):
+        for value, user in users.items():
+            found[(kind, value)] = Identity(user.username, user.default_email)
+
+    for key in missing:
+        resolved[key] = found.get(key)
+        if ttl:
+            _IDENTITY_CACHE.store(
+                key,
+                (resolved[key], now + ttl),
+                pagure_config["IDENTITY_CACHE_SIZE"],
+            )
+    return resolved
+
+
+def resolve_authors(commits):
+    """Look up, all at once, the users who authored or committed the
+    specified commits, see ``resolve_identities``.
+    """
+    emails = set()
+    for commit in commits:
+        emails.add(commit.author.email)
+        emails.add(commit.committer.email)
+    resolve_identities(emails=emails)
+
+
+def _get_identity(email=None, username=None):
+    """Return the Identity of the user owning the specified email or having
+    the specified username, None if there is no such user.
+    """
+    if email:
+        return resolve_identities(emails=[email])[("email", email)]
+    return resolve_identities(usernames=[username])[("username", username)]
+
+
 # Jinja filters
 
 
@@ -434,6 +528,16 @@ def blame_loc(loc, repo, username, blame):
 
     output = ['<div class="highlight">', '<table class="code_table">']
 
+    emails = []
+    for hunk in blame:
+        try:
+            committer = hunk.orig_committer
+        except ValueError:
+            continue
+        if committer:
+            emails.append(committer.email)
+    resolve_identities(emails=emails)
+
     for idx, line in enumerate(loc.split("\n")):
         if line == "</pre></div>":
             break
@@ -506,7 +610,7 @@ def avatar(packager, size=64, css_class=None, src_tag="src"):
         packager = packager.decode("utf-8")
 
     if "@" not in packager:
-        user = pagure.lib.query.search_user(flask.g.session, username=packager)
+        user = _get_identity(username=packager)
         if user:
             packager = user.default_email
 
@@ -578,7 +682,7 @@ def author_to_user(author, size=16, cssclass=None, with_name=True):
     output = escape(author.name)
     if not author.email:
         return output
-    user = pagure.lib.query.search_user(flask.g.session, email=author.email)
+    user = _get_identity(email=author.email)
     if user:
         output = (
             "%(avatar)s <a title='%(name)s' href='%(url)s' "
@@ -610,7 +714,7 @@ def author_to_avatar(author, size=32):
     """Template filter transforming a pygit2 Author object into an avatar."""
     if not author.email:
         return ""
-    user = pagure.lib.query.search_user(flask.g.session, email=author.email)
+    user = _get_identity(email=author.email)
     output = user.default_email if user else author.email
     return avatar(output.encode("utf-8"), size)
 
@@ -623,7 +727,7 @@ def author_to_user_commits(author, link, size=16, cssclass=None):
     output = author.name
     if not author.email:
         return output
-    user = pagure.lib.query.search_user(flask.g.session, email=author.email)
+    user = _get_identity(email=author.email)
     if user:
         output = "<a href='%s'>%s</a> <a href='%s' %s>%s</a>" % (
             flask.url_for("ui_ns.view_user", username=user.username),
@@ -35,6 +35,7 @@ import pagure.lib.plugins
 import pagure.lib.query
 import pagure.lib.tasks
 import pagure.forms
+import pagure.ui.filters
 from pagure.config import config as pagure_config
 from pagure.ui import UI_NS
 from pagure.utils import (
@@ -355,6 +356,7 @@ def request_pull(repo, requestid, username=None, namespace=None):
     can_delete_branch = (
         pagure_config.get("ALLOW_DELETE_BRANCH", True) and can_rebase_branch
     )
+    pagure.ui.filters.resolve_authors(diff_commits)
     return flask.render_template(
         "repo_pull_request.html",
         select="requests",
@@ -1813,6 +1815,7 @@ def new_request_pull(
     if diff:
         diff.find_similar()
 
+    pagure.ui.filters.resolve_authors(diff_commits)
     return flask.render_template(
         "repo_new_pull_request.html",
         select="requests",
@@ -1926,6 +1929,7 @@ def new_remote_request_pull(repo, username=None, namespace=None):
 
         if not confirm:
             flask.g.branches = sorted(orig_repo.listall_branches())
+            pagure.ui.filters.resolve_authors(diff_commits)
             return flask.render_template(
                 "repo_new_pull_request.html",
                 select="requests",
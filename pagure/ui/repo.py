@@ -45,6 +45,7 @@ import pagure.lib.plugins
 import pagure.lib.query
 import pagure.lib.tasks
 import pagure.forms
+import pagure.ui.filters
 import pagure.ui.plugins
 from pagure.config import config as pagure_config
 from pagure.flask_app import _get_user
@@ -52,6 +53,8 @@ from pagure.lib import encoding_utils
 from pagure.ui import UI_NS
 from pagure.utils import (
     __get_file_in_tree,
+    get_not_modified_response,
+    get_object_cache_headers,
     login_required,
     is_true,
     stream_template,
@@ -158,11 +161,11 @@ def view_repo(repo, username=None, namespace=None):
     readmefile = get_preferred_readme(tree)
     if readmefile:
         name, ext = os.path.splitext(readmefile.name)
-        content = __get_file_in_tree(
+        readme_blob = __get_file_in_tree(
             repo_obj, last_commits[0].tree, [readmefile.name]
-        ).data
+        )
         readme, safe = pagure.doc_utils.convert_readme(
-            content,
+            readme_blob.data,
             ext,
             view_file_url=flask.url_for(
                 "ui_ns.view_raw_file",
@@ -171,6 +174,7 @@ def view_repo(repo, username=None, namespace=None):
                 identifier=branchname,
                 filename="",
             ),
+            blob_id=readme_blob.oid.hex,
         )
     return flask.render_template(
         "repo_info.html",
@@ -359,7 +363,22 @@ def view_commits(repo, branchname=None, username=None, namespace=None):
 
     n_commits = 0
     last_commits = []
-    if commit:
+    page_info = None
+    if commit and branch:
+        # Use the index of the commits of the branch rather than walking
+        # its whole history
+        page_info = pagure.lib.git.get_commits_page(
+            repo_obj,
+            branch.branch_name,
+            start,
+            end,
+            emails=[email.email for email in author_obj.emails]
+            if author_obj
+            else None,
+        )
+    if page_info:
+        n_commits, last_commits = page_info
+    elif commit:
         for commit in repo_obj.walk(commit.hex, pygit2.GIT_SORT_NONE):
 
             # Filters the commits for a user
@@ -413,6 +432,7 @@ def view_commits(repo, branchname=None, username=None, namespace=None):
             for commit in diff_commits_full:
                 diff_commits.append(commit.oid.hex)
 
+    pagure.ui.filters.resolve_authors(last_commits + diff_commits_full)
     return flask.render_template(
         "commits.html",
         select="commits",
@@ -486,6 +506,7 @@ def compare_commits(repo, commit1, commit2, username=None, namespace=None):
     if first_commit == commit2:
         diff_commits.reverse()
 
+    pagure.ui.filters.resolve_authors(diff_commits)
     return flask.render_template(
         "repo_comparecommits.html",
         select="commits",
@@ -589,13 +610,15 @@ def view_file(repo, identifier, filename, username=None, namespace=None):
                 _log.debug("Failed to load image %s, error: %s", filename, err)
                 output_type = "binary"
         elif ext in (".rst", ".mk", ".md", ".markdown") and not rawtext:
-            content, safe = pagure.doc_utils.convert_readme(content.data, ext)
+            content, safe = pagure.doc_utils.convert_readme(
+                content.data, ext, blob_id=content.oid.hex
+            )
             output_type = "markup"
         elif "data" in dir(content) and not isbinary:
             file_content = None
             try:
                 file_content = encoding_utils.decode(
-                    ktc.to_bytes(content.data)
+                    ktc.to_bytes(content.data), blob_id=content.oid.hex
                 )
             except pagure.exceptions.PagureException:
                 # We cannot decode the file, so let's pretend it's a binary
@@ -604,7 +627,7 @@ def view_file(repo, identifier, filename, username=None, namespace=None):
                 output_type = "binary"
             if file_content is not None:
                 output_type = "file"
-                content = encoding_utils.decode(content.data)
+                content = file_content
             else:
                 output_type = "binary"
         elif not isbinary:
@@ -623,12 +646,10 @@ def view_file(repo, identifier, filename, username=None, namespace=None):
             if not isinstance(name, six.text_type):
                 name = name.decode("utf-8")
             if name == "README":
-                readme_file = __get_file_in_tree(
-                    repo_obj, content, [i.name]
-                ).data
+                readme_file = __get_file_in_tree(repo_obj, content, [i.name])
 
                 readme, safe = pagure.doc_utils.convert_readme(
-                    readme_file, ext
+                    readme_file.data, ext, blob_id=readme_file.oid.hex
                 )
 
                 readme_ext = ext
@@ -699,10 +720,35 @@ def view_raw_file(
     if not commit:
         flask.abort(404, description="Commit %s not found" % (identifier))
 
+    # The content of the URLs addressed by the identifier of a git object
+    # never changes
+    immutable = identifier == commit.oid.hex
+    private = flask.g.repo.private
+
     if isinstance(commit, pygit2.Tag):
         commit = commit.peel(pygit2.Commit)
 
     if filename:
+        if flask.request.if_none_match and not isinstance(commit, pygit2.Blob):
+            # Answer the clients having the file already without reading it
+            try:
+                entry = commit.tree[filename]
+            except (KeyError, ValueError):
+                entry = None
+            if entry is not None and entry.filemode in (
+                pygit2.GIT_FILEMODE_BLOB,
+                pygit2.GIT_FILEMODE_BLOB_EXECUTABLE,
+            ):
+                etag = entry.oid.hex
+                not_modified = get_not_modified_response(
+                    etag,
+                    get_object_cache_headers(
+                        etag, immutable=immutable, private=private
+                    ),
+                )
+                if not_modified:
+                    return not_modified
+
         if isinstance(commit, pygit2.Blob):
             content = commit
         else:
@@ -711,7 +757,18 @@ def view_raw_file(
             )
         if not content or isinstance(content, pygit2.Tree):
             flask.abort(404, description="File not found")
+        etag = content.oid.hex
+    else:
+        etag = commit.oid.hex
+
+    headers = get_object_cache_headers(
+        etag, immutable=immutable, private=private
+    )
+    not_modified = get_not_modified_response(etag, headers)
+    if not_modified:
+        return not_modified
 
+    if filename:
         data = repo_obj[content.oid].data
     else:
         if commit.parents:
@@ -730,7 +787,14 @@ def view_raw_file(
     if not data:
         flask.abort(404, description="No content found")
 
-    return (data, 200, pagure.lib.mimetype.get_type_headers(filename, data))
+    headers.update(pagure.lib.mimetype.get_type_headers(filename, data) or {})
+    # Let the clients download large files in several parts
+    headers["Accept-Ranges"] = "bytes"
+    data = ktc.to_bytes(data)
+    response = flask.Response(data, headers=headers)
+    return response.make_conditional(
+        flask.request, accept_ranges=True, complete_length=len(data)
+    )
 
 
 @UI_NS.route("/<repo>/blame/<path:filename>")
@@ -793,7 +857,7 @@ def view_blame_file(repo, filename, username=None, namespace=None):
         flask.abort(400, description="Binary files cannot be blamed")
 
     try:
-        content = encoding_utils.decode(content.data)
+        content = encoding_utils.decode(content.data, blob_id=content.oid.hex)
     except pagure.exceptions.PagureException:
         # We cannot decode the file, so bail but warn the admins
         _log.exception("File could not be decoded")
@@ -850,6 +914,7 @@ def view_history_file(repo, filename, username=None, namespace=None):
         log = []
     if not log:
         flask.abort(400, description="No history could be found for this file")
+    pagure.ui.filters.resolve_authors(repo_obj[line[0]] for line in log)
 
     return flask.render_template(
         "file_history.html",
@@ -924,6 +989,7 @@ def view_commit(repo, commitid, username=None, namespace=None):
     if diff:
         diff.find_similar()
 
+    pagure.ui.filters.resolve_authors([commit])
     return flask.render_template(
         "commit.html",
         select="commits",
@@ -1003,10 +1069,22 @@ def view_commit_patch_or_diff(
 
         return flask.jsonify(diffs)
     else:
+        etag = "%s.%s" % (commit.oid.hex, "diff" if diff else "patch")
+        headers = get_object_cache_headers(
+            etag,
+            immutable=commitid == commit.oid.hex,
+            private=flask.g.repo.private,
+        )
+        not_modified = get_not_modified_response(etag, headers)
+        if not_modified:
+            return not_modified
+
         patch = pagure.lib.git.commit_to_patch(
             repo_obj, commit, diff_view=diff
         )
-        return flask.Response(patch, content_type="text/plain;charset=UTF-8")
+        return flask.Response(
+            patch, content_type="text/plain;charset=UTF-8", headers=headers
+        )
 
 
 @UI_NS.route("/<repo>/tree/")
@@ -1066,10 +1144,10 @@ def view_tree(repo, identifier=None, username=None, namespace=None):
                 if name == "README":
                     readme_file = __get_file_in_tree(
                         repo_obj, commit.tree, [i.name]
-                    ).data
+                    )
 
                     readme, safe = pagure.doc_utils.convert_readme(
-                        readme_file, ext
+                        readme_file.data, ext, blob_id=readme_file.oid.hex
                     )
 
                     readme_ext = ext
@@ -3568,6 +3646,16 @@ def get_project_archive_zip(repo, ref, name, namespace=None, username=None):
     )
 
 
+def _read_archive(path, chunk_size=65536):
+    """Yield the content of the specified archive, chunk by chunk."""
+    with open(path, "rb") as stream:
+        while True:
+            chunk = stream.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+
+
 def generate_project_archive(
     repo, ref, name, extension, namespace=None, username=None
 ):
@@ -3641,14 +3729,26 @@ def generate_project_archive(
         str("Content-Type"): "application/x-gzip",
     }
     if os.path.exists(path):
-
-        def _send_data():
-            with open(path, "rb") as stream:
-                yield stream.read()
-
         _log.info("Sending the existing archive")
         return flask.Response(
-            flask.stream_with_context(_send_data()), headers=headers
+            flask.stream_with_context(_read_archive(path)), headers=headers
+        )
+
+    if pagure_config.get("ARCHIVE_STREAM", False):
+        # Send the archive while it is generated, storing it at the same
+        # time for the next requests
+        _log.info("Streaming the archive")
+        chunks = pagure.lib.git.stream_archive(
+            repo_obj, commit.oid.hex, name, extension
+        )
+        path = pagure.lib.git.get_archive_path(
+            flask.g.repo, commit.oid.hex, tag_filename, name, extension
+        )
+        return flask.Response(
+            flask.stream_with_context(
+                pagure.lib.git.save_archive(chunks, path)
+            ),
+            headers=headers,
         )
 
     _log.info("Re-generating the archive")
@@ -3668,8 +3768,8 @@ def generate_project_archive(
 
             _log.info("waiting")
             time.sleep(0.5)
-        with open(path, "rb") as stream:
-            yield stream.read()
+        for chunk in _read_archive(path):
+            yield chunk
 
     _log.info("Sending the existing archive")
     return flask.Response(
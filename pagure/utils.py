@@ -10,12 +10,14 @@
 
 from __future__ import unicode_literals, absolute_import
 
+import collections
 import datetime
 import fnmatch
 import logging
 import logging.config
 import os
 import re
+import threading
 from six.moves.urllib.parse import urlparse, urljoin
 from functools import wraps
 
@@ -938,3 +940,81 @@ def parse_path(path):
         )
 
     return username, namespace, repo, objtype, objid
+
+
+def get_object_cache_headers(etag, immutable=False, private=False):
+    """Return the ETag and Cache-Control headers of a response whose
+    content only depends on git objects, identified by the given etag.
+
+    :arg etag: the (strong) entity tag of the content, derived from the
+        identifier of the git objects it is made of
+    :arg immutable: whether the URL of the content is addressed by the
+        identifier of the git object, in which case the content can be
+        cached for ``IMMUTABLE_CACHE_MAX_AGE`` seconds. Otherwise (for
+        example the URL contains a branch name) it has to be revalidated
+        before being re-used
+    :arg private: whether the content is private, in which case it can
+        only be cached by the client
+    :return: a dictionary of the headers
+
+    """
+    max_age = pagure_config.get("IMMUTABLE_CACHE_MAX_AGE", 0)
+    scope = "private" if private else "public"
+    if immutable and max_age:
+        cache_control = "%s, max-age=%d, immutable" % (scope, max_age)
+    else:
+        cache_control = "%s, no-cache" % scope
+    return {"ETag": '"%s"' % etag, "Cache-Control": cache_control}
+
+
+def get_not_modified_response(etag, headers):
+    """Return a 304 (Not Modified) response if the client already has the
+    content of the given etag, as announced by its If-None-Match header,
+    None otherwise.
+
+    :arg etag: the (strong) entity tag of the content requested
+    :arg headers: the headers returned by ``get_object_cache_headers`` for
+        that content
+
+    """
+    if flask.request.if_none_match.contains_weak(etag):
+        return flask.Response(status=304, headers=headers)
+    return None
+
+
+class LRUCache(collections.OrderedDict):
+    """An in-memory cache keeping the entries used the most recently.
+
+    It can be shared by the threads of a process as long as it is only
+    read and updated through its ``lookup``, ``store`` and ``discard``
+    methods.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(LRUCache, self).__init__(*args, **kwargs)
+        self.lock = threading.Lock()
+
+    def lookup(self, key, default=None):
+        """Return the entry cached under the given key, marked as the most
+        recently used, or the default if there is none."""
+        with self.lock:
+            try:
+                value = self[key]
+            except KeyError:
+                return default
+            self.move_to_end(key)
+            return value
+
+    def store(self, key, value, size):
+        """Cache the value under the given key, dropping the entries used
+        the longest ago to keep at most ``size`` of them."""
+        with self.lock:
+            self[key] = value
+            self.move_to_end(key)
+            while len(self) > size:
+                self.popitem(last=False)
+
+    def discard(self, key):
+        """Drop the entry cached under the given key, if any."""
+        with self.lock:
+            self.pop(key, None)
@@ -62,6 +62,7 @@ setup(
     test_auth = pagure.lib.git_auth:GitAuthTestHelper
     gitolite2 = pagure.lib.git_auth:Gitolite2Auth
     gitolite3 = pagure.lib.git_auth:Gitolite3Auth
+    gitolite3_fragments = pagure.lib.git_auth:Gitolite3FragmentsAuth
     pagure = pagure.lib.git_auth:PagureGitAuth
     pagure_authorized_keys = pagure.lib.git_auth:PagureGitAuth
     """,
@@ -56,13 +56,16 @@ sys.path.insert(
 import pagure
 import pagure.api
 from pagure.api.ci import jenkins
+import pagure.doc_utils
 import pagure.flask_app
+import pagure.lib.encoding_utils
 import pagure.lib.git
 import pagure.lib.login
 import pagure.lib.model
 import pagure.lib.query
 import pagure.lib.tasks_mirror
 import pagure.perfrepo as perfrepo
+import pagure.ui.filters
 from pagure.config import config as pagure_config, reload_config
 from pagure.lib.repo import PagureRepo
 
@@ -379,6 +382,13 @@ class SimplePagureTest(unittest.TestCase):
         if hasattr(pagure.lib.query, "REDIS") and pagure.lib.query.REDIS:
             pagure.lib.query.REDIS.connection_pool.disconnect()
             pagure.lib.query.REDIS = None
+        pagure.lib.query._ISSUES_HISTORY_STATS_CACHE.clear()
+        pagure.lib.query._PROJECT_ID_CACHE.clear()
+        pagure.lib.query._PROJECT_ID_CACHE_KEYS.clear()
+        pagure.lib.query._MARKDOWN_CACHE.clear()
+        pagure.ui.filters._IDENTITY_CACHE.clear()
+        pagure.lib.encoding_utils._ENCODING_CACHE.clear()
+        pagure.doc_utils._RENDERED_CACHE.clear()
 
         # Database
         self._prepare_db()
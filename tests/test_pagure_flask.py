@@ -15,6 +15,7 @@ import shutil
 import sys
 import os
 
+import flask
 import mock
 import munch
 import pygit2
@@ -502,5 +503,41 @@ class PagureGetRemoteRepoPath(tests.SimplePagureTest):
             self.assertTrue(output)
 
 
+class PagureGlobalsTests(tests.SimplePagureTest):
+    """Tests for the lazy attributes of flask.g"""
+
+    def test_set_lazy(self):
+        """Test that lazy attributes are only computed when accessed."""
+        function = mock.MagicMock(return_value="value")
+        with self._app.app_context():
+            flask.g.set_lazy("lazy", function)
+            self.assertIn("lazy", flask.g)
+            function.assert_not_called()
+
+            self.assertEqual(flask.g.lazy, "value")
+            self.assertEqual(flask.g.get("lazy"), "value")
+            function.assert_called_once_with()
+
+            flask.g.set_lazy("other", function)
+            flask.g.other = "overridden"
+            self.assertEqual(flask.g.other, "overridden")
+            self.assertEqual(flask.g.get("other"), "overridden")
+            self.assertEqual(function.call_count, 1)
+
+            self.assertFalse(hasattr(flask.g, "unknown"))
+            self.assertIsNone(flask.g.get("unknown"))
+
+    def test_set_request_lazy_repo_attributes(self):
+        """Test that the repository is not opened when no endpoint uses
+        it."""
+        tests.create_projects(self.session)
+        tests.create_projects_git(os.path.join(self.path, "repos"), bare=True)
+
+        with mock.patch("pagure.flask_app.pygit2.Repository") as repo:
+            output = self.app.get("/test/issues")
+            self.assertEqual(output.status_code, 200)
+            repo.assert_not_called()
+
+
 if __name__ == "__main__":
     unittest.main(verbosity=2)
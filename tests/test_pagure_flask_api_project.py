@@ -21,6 +21,7 @@ import tempfile
 import os
 
 import pygit2
+import sqlalchemy
 from celery.result import EagerResult
 from fedora_messaging import api, testing
 from mock import ANY, patch, Mock
@@ -30,6 +31,7 @@ sys.path.insert(
 )
 
 import pagure.flask_app
+import pagure.lib.model
 import pagure.lib.query
 import tests
 from pagure.lib.repo import PagureRepo
@@ -1269,6 +1271,110 @@ class PagureFlaskApiProjecttests(tests.Modeltests):
         }
         self.assertDictEqual(data, expected_data)
 
+    def _add_projects_with_relations(self, start, stop):
+        """Add projects with a tag, a committer and a fork each."""
+        for idx in range(start, stop):
+            project = pagure.lib.model.Project(
+                user_id=1,  # pingou
+                name="bulk%s" % idx,
+                description="bulk project #%s" % idx,
+                hook_token="bulk%s" % idx,
+            )
+            self.session.add(project)
+            self.session.add(pagure.lib.model.Tag(tag="bulk%s" % idx))
+            self.session.flush()
+            self.session.add(
+                pagure.lib.model.TagProject(
+                    project_id=project.id, tag="bulk%s" % idx
+                )
+            )
+            self.session.add(
+                pagure.lib.model.ProjectUser(
+                    project_id=project.id, user_id=2, access="commit"
+                )
+            )
+            self.session.add(
+                pagure.lib.model.Project(
+                    user_id=2,  # foo
+                    name="bulk%s" % idx,
+                    description="bulk project #%s" % idx,
+                    hook_token="bulkfork%s" % idx,
+                    is_fork=True,
+                    parent_id=project.id,
+                )
+            )
+        self.session.commit()
+
+    def _count_api_projects_queries(self, url):
+        """Return the number of SQL queries run to answer the request and
+        its JSON output."""
+        statements = []
+
+        def count(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        sqlalchemy.event.listen(
+            sqlalchemy.engine.Engine, "before_cursor_execute", count
+        )
+        try:
+            output = self.app.get(url)
+        finally:
+            sqlalchemy.event.remove(
+                sqlalchemy.engine.Engine, "before_cursor_execute", count
+            )
+        self.assertEqual(output.status_code, 200)
+        return len(statements), json.loads(output.get_data(as_text=True))
+
+    def test_api_projects_query_count(self):
+        """Test that the number of SQL queries run by the api_projects
+        method of the flask api does not depend on the number of projects
+        returned."""
+        tests.create_projects(self.session)
+        self._add_projects_with_relations(0, 2)
+        # Get the session cookie set
+        self.app.get("/api/0/projects")
+
+        nb_queries, data = self._count_api_projects_queries(
+            "/api/0/projects?per_page=100"
+        )
+        self.assertEqual(data["total_projects"], 7)
+        self.assertEqual(len(data["projects"]), 7)
+
+        self._add_projects_with_relations(2, 20)
+
+        output = self._count_api_projects_queries(
+            "/api/0/projects?per_page=100"
+        )
+        self.assertEqual(output[0], nb_queries)
+        data = output[1]
+        self.assertEqual(data["total_projects"], 43)
+        self.assertEqual(len(data["projects"]), 43)
+
+        # The output is the same as serializing the projects one by one
+        projects = pagure.lib.query.search_projects(self.session)
+        self.assertEqual(
+            data["projects"],
+            [
+                json.loads(json.dumps(project.to_json(api=True, public=True)))
+                for project in projects
+            ],
+        )
+
+        # The count is right past the first page
+        nb_queries, data = self._count_api_projects_queries(
+            "/api/0/projects?per_page=10&page=5"
+        )
+        self.assertEqual(data["total_projects"], 43)
+        self.assertEqual(len(data["projects"]), 3)
+        self.assertEqual(data["pagination"]["pages"], 5)
+
+        # And past the last page
+        nb_queries, data = self._count_api_projects_queries(
+            "/api/0/projects?per_page=10&page=6"
+        )
+        self.assertEqual(data["total_projects"], 43)
+        self.assertEqual(data["projects"], [])
+
     def test_api_projects_pagination(self):
         """Test the api_projects method of the flask api with pagination."""
         tests.create_projects(self.session)
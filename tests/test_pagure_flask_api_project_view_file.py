@@ -150,6 +150,32 @@ class PagureFlaskApiProjectViewFiletests(tests.Modeltests):
             },
         )
 
+    def test_view_file_etag(self):
+        repo = pygit2.Repository(os.path.join(self.path, "repos", "test.git"))
+        commit = repo.revparse_single("HEAD")
+        blob = commit.tree["README.rst"]
+
+        output = self.app.get("/api/0/test/tree/master/f/README.rst")
+        self.assertEqual(output.status_code, 200)
+        self.assertEqual(output.headers["ETag"], '"%s"' % blob.hex)
+        self.assertEqual(output.headers["Cache-Control"], "public, no-cache")
+
+        output = self.app.get(
+            "/api/0/test/tree/master/f/README.rst",
+            headers={"If-None-Match": '"%s"' % blob.hex},
+        )
+        self.assertEqual(output.status_code, 304)
+        self.assertEqual(output.get_data(as_text=True), "")
+
+        # The content at a given commit never changes
+        output = self.app.get("/api/0/test/tree/%s" % commit.oid.hex)
+        self.assertEqual(output.status_code, 200)
+        self.assertEqual(output.headers["ETag"], '"%s"' % commit.tree.hex)
+        self.assertEqual(
+            output.headers["Cache-Control"],
+            "public, max-age=31536000, immutable",
+        )
+
     def test_view_file_invalid_ref(self):
         tests.add_content_git_repo(
             os.path.join(self.path, "repos", "test.git")
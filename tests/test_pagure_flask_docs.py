@@ -16,6 +16,7 @@ import shutil
 import sys
 import os
 
+import docutils.core
 import mock
 import pygit2
 from mock import patch
@@ -24,6 +25,7 @@ sys.path.insert(
     0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
 )
 
+import pagure.doc_utils
 import pagure.docs_server
 import pagure.lib.query
 import tests
@@ -263,6 +265,191 @@ class PagureFlaskDocstests(tests.SimplePagureTest):
         output = self.app.get("/test/folder1")
         self.assertEqual(output.status_code, 200)
 
+    def test_view_docs_cache_headers(self):
+        """Test the caching headers of the view_docs endpoint."""
+        tests.create_projects(self.session)
+        repo = pygit2.init_repository(
+            os.path.join(self.path, "repos", "docs", "test.git"), bare=True
+        )
+        self._set_up_doc()
+        commit = repo.revparse_single("HEAD")
+        etag = '"%s-%s"' % (
+            commit.tree["sources"].hex,
+            pagure.doc_utils.get_renderer_version(),
+        )
+
+        output = self.app.get("/test/sources")
+        self.assertEqual(output.status_code, 200)
+        self.assertEqual(output.headers["ETag"], etag)
+        self.assertEqual(output.headers["Cache-Control"], "public, no-cache")
+
+        output = self.app.get("/test/folder1")
+        self.assertEqual(output.status_code, 200)
+        self.assertEqual(
+            output.headers["ETag"],
+            '"%s-%s"'
+            % (
+                commit.tree["folder1"].hex,
+                pagure.doc_utils.get_renderer_version(),
+            ),
+        )
+
+        # The file is not rendered again if the client has it already
+        with patch("pagure.doc_utils.convert_readme") as convert_readme:
+            output = self.app.get(
+                "/test/sources", headers={"If-None-Match": etag}
+            )
+            self.assertEqual(output.status_code, 304)
+            self.assertEqual(output.get_data(as_text=True), "")
+            convert_readme.assert_not_called()
+
+    def test_view_docs_cache_headers_references(self):
+        """Test that the documents linking to the issues, users... they
+        mention get no ETag, their rendering depends on the database."""
+        tests.create_projects(self.session)
+        repo = pygit2.init_repository(
+            os.path.join(self.path, "repos", "docs", "test.git"), bare=True
+        )
+        self._set_up_doc()
+        parent = repo.revparse_single("HEAD")
+        builder = repo.TreeBuilder(parent.tree)
+        for name, data in (
+            ("refs.md", b"Fixes #1, thanks @pingou"),
+            ("plain.md", b"Some *text*"),
+        ):
+            builder.insert(
+                name, repo.create_blob(data), pygit2.GIT_FILEMODE_BLOB
+            )
+        author = pygit2.Signature("Alice Author", "alice@authors.tld")
+        repo.create_commit(
+            "refs/heads/master",
+            author,
+            author,
+            "Add markdown files",
+            builder.write(),
+            [parent.oid.hex],
+        )
+        commit = repo.revparse_single("HEAD")
+
+        output = self.app.get("/test/refs.md")
+        self.assertEqual(output.status_code, 200)
+        self.assertNotIn("ETag", output.headers)
+
+        etag = '"%s-%s"' % (
+            commit.tree["refs.md"].hex,
+            pagure.doc_utils.get_renderer_version(),
+        )
+        output = self.app.get("/test/refs.md", headers={"If-None-Match": etag})
+        self.assertEqual(output.status_code, 200)
+
+        output = self.app.get("/test/plain.md")
+        self.assertEqual(output.status_code, 200)
+        self.assertEqual(
+            output.headers["ETag"],
+            '"%s-%s"'
+            % (
+                commit.tree["plain.md"].hex,
+                pagure.doc_utils.get_renderer_version(),
+            ),
+        )
+
+    def test_view_docs_rendered_cache(self):
+        """Test that the documents rendered are cached."""
+        tests.create_projects(self.session)
+        pygit2.init_repository(
+            os.path.join(self.path, "repos", "docs", "test.git"), bare=True
+        )
+        self._set_up_doc()
+
+        with patch(
+            "pagure.lib.encoding_utils.decode",
+            wraps=pagure.lib.encoding_utils.decode,
+        ) as decode:
+            for _ in range(2):
+                output = self.app.get("/test/sources")
+                self.assertEqual(output.status_code, 200)
+                self.assertEqual(
+                    "<pre>foo\n bar</pre>", output.get_data(as_text=True)
+                )
+            self.assertEqual(decode.call_count, 1)
+
+    def test_view_docs_rendered_cache_disk(self):
+        """Test that the documents rendered are shared on disk."""
+        tests.create_projects(self.session)
+        pygit2.init_repository(
+            os.path.join(self.path, "repos", "docs", "test.git"), bare=True
+        )
+        self._set_up_doc()
+        folder = os.path.join(self.path, "rendered")
+        os.mkdir(folder)
+
+        with patch.dict(
+            "pagure.config.config",
+            {
+                "RENDERED_CACHE_BACKEND": "disk",
+                "RENDERED_CACHE_FOLDER": folder,
+            },
+        ):
+            output = self.app.get("/test/sources")
+            self.assertEqual(output.status_code, 200)
+            self.assertEqual(len(os.listdir(folder)), 1)
+
+            # Another process finds it on disk
+            pagure.doc_utils._RENDERED_CACHE.clear()
+            with patch(
+                "pagure.lib.encoding_utils.decode",
+                mock.MagicMock(side_effect=IOError),
+            ):
+                output = self.app.get("/test/sources")
+            self.assertEqual(output.status_code, 200)
+            self.assertEqual(
+                "<pre>foo\n bar</pre>", output.get_data(as_text=True)
+            )
+
+    def test_convert_readme_cache(self):
+        """Test the caching of the documents rendered by convert_readme."""
+        with patch(
+            "docutils.core.publish_parts", wraps=docutils.core.publish_parts
+        ) as publish_parts:
+            for _ in range(2):
+                html, safe = pagure.doc_utils.convert_readme(
+                    b"Title\n=====\n\nSome *text*", ".rst", blob_id="abc"
+                )
+                self.assertTrue(safe)
+                self.assertIn("<em>text</em>", html)
+            self.assertEqual(publish_parts.call_count, 1)
+
+            # Images are relative to the URL of the file viewed
+            pagure.doc_utils.convert_readme(
+                b"Title\n=====\n\nSome *text*",
+                ".rst",
+                view_file_url="/test/raw/master/f/",
+                blob_id="abc",
+            )
+            self.assertEqual(publish_parts.call_count, 2)
+
+        # The documents mentioning issues, users... are not cached
+        with patch(
+            "pagure.lib.query.text2markdown", return_value="<p>html</p>"
+        ) as text2markdown:
+            for _ in range(2):
+                pagure.doc_utils.convert_readme(
+                    b"Fixes #3", ".md", blob_id="def"
+                )
+                pagure.doc_utils.convert_readme(
+                    b"Some *text*", ".md", blob_id="ghi"
+                )
+            self.assertEqual(text2markdown.call_count, 3)
+
+            # The links rendered depend on the configuration
+            with patch.dict(
+                "pagure.config.config", {"APP_URL": "https://other.org/"}
+            ):
+                pagure.doc_utils.convert_readme(
+                    b"Some *text*", ".md", blob_id="ghi"
+                )
+            self.assertEqual(text2markdown.call_count, 4)
+
 
 if __name__ == "__main__":
     unittest.main(verbosity=2)
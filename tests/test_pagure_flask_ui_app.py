@@ -20,6 +20,7 @@ import os
 import six
 import json
 import pygit2
+import sqlalchemy
 from mock import patch, MagicMock
 
 sys.path.insert(
@@ -847,7 +848,7 @@ class PagureFlaskApptests(tests.Modeltests):
             self.assertIn("SSH key removed", output_text)
 
     def patched_commit_exists(user, namespace, repo, githash):
-        """Patched version of pagure.pfmarkdown._commit_exists to enforce
+        """Patched version of References.commit_exists to enforce
         returning true on some given hash without having us actually check
         the git repos.
         """
@@ -861,7 +862,7 @@ class PagureFlaskApptests(tests.Modeltests):
             return False
 
     @patch(
-        "pagure.pfmarkdown._commit_exists",
+        "pagure.pfmarkdown.References.commit_exists",
         MagicMock(side_effect=patched_commit_exists),
     )
     def test_patched_markdown_preview(self):
@@ -994,6 +995,71 @@ class PagureFlaskApptests(tests.Modeltests):
             self.assertEqual(output.status_code, 200)
             self.assertEqual(exp, output.get_data(as_text=True))
 
+    def test_markdown_preview_references_in_bulk(self):
+        """Test the markdown_preview endpoint with many references, looked
+        up in bulk."""
+
+        user = tests.FakeUser()
+        user.username = "foo"
+        with tests.user_set(self.app.application, user):
+            output = self.app.get("/settings/")
+            self.assertEqual(output.status_code, 200)
+            csrf_token = self.get_csrf(output=output)
+
+        tests.create_projects(self.session)
+        for name, idx in (("test", 1), ("test", 2), ("test", 3), ("test2", 1)):
+            pagure.lib.query.new_issue(
+                issue_id=idx,
+                session=self.session,
+                repo=pagure.lib.query._get_project(self.session, name),
+                title="Issue %s of %s" % (idx, name),
+                content="content",
+                user="pingou",
+            )
+        self.session.commit()
+
+        text = "\n\n".join(
+            [
+                "@pingou, @foo and @nobody",
+                "#1 #2 #3 #42 PR#3 test2#1 test2#2",
+                "See #1, #2, #3 and test2#1 again @pingou",
+            ]
+        )
+
+        statements = []
+
+        def record(conn, cursor, statement, parameters, context, many):
+            statements.append(statement)
+
+        engine = self.session.get_bind()
+        sqlalchemy.event.listen(engine, "before_cursor_execute", record)
+        try:
+            with self.app.application.app_context():
+                data = {"content": text, "csrf_token": csrf_token}
+                output = self.app.post("/markdown/?repo=test", data=data)
+        finally:
+            sqlalchemy.event.remove(engine, "before_cursor_execute", record)
+        self.assertEqual(output.status_code, 200)
+        output_text = output.get_data(as_text=True)
+
+        self.assertEqual(output_text.count('href="/test/issue/1"'), 2)
+        self.assertEqual(output_text.count('href="/test/issue/3"'), 3)
+        self.assertEqual(output_text.count('href="/test2/issue/1"'), 2)
+        self.assertEqual(output_text.count('/user/pingou"'), 2)
+        self.assertEqual(output_text.count('/user/foo"'), 1)
+        self.assertIn("@nobody", output_text)
+        self.assertNotIn('/user/nobody"', output_text)
+        self.assertIn("#42", output_text)
+        self.assertNotIn('href="/test/issue/42"', output_text)
+        self.assertNotIn("test2/issue/2", output_text)
+
+        def count(needle):
+            return len([stmt for stmt in statements if needle in stmt])
+
+        self.assertEqual(count("FROM issues"), 1)
+        self.assertEqual(count("FROM pull_requests"), 1)
+        self.assertEqual(count("users.user IN"), 1)
+
     @patch("pagure.ui.app.admin_session_timedout")
     def test_remove_user_email(self, ast):
         """Test the remove_user_email endpoint."""
@@ -13,15 +13,19 @@ from __future__ import unicode_literals, absolute_import
 import unittest
 import sys
 import os
+import tarfile
 import time
+import zipfile
 
 import mock
 import pygit2
+import six
 
 sys.path.insert(
     0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
 )
 
+import pagure.exceptions
 import pagure.lib.git
 import pagure.lib.query
 import tests
@@ -342,6 +346,209 @@ class PagureFlaskUiArchivesTest(tests.Modeltests):
             ["test-v1.0.tar.gz"],
         )
 
+    def _add_archive_commit(self):
+        """Add a commit with folders, an executable and a symlink to the
+        test project, return its hash."""
+        repopath = os.path.join(self.path, "repos", "test.git")
+        repo = pygit2.Repository(repopath)
+        parent = repo.head.target
+
+        subtree = repo.TreeBuilder()
+        subtree.insert(
+            "script.sh",
+            repo.create_blob(b"#!/bin/sh\necho hello\n"),
+            pygit2.GIT_FILEMODE_BLOB_EXECUTABLE,
+        )
+        builder = repo.TreeBuilder(repo[parent].tree)
+        builder.insert("bin", subtree.write(), pygit2.GIT_FILEMODE_TREE)
+        builder.insert(
+            "link", repo.create_blob(b"README.rst"), pygit2.GIT_FILEMODE_LINK
+        )
+        builder.insert(
+            "data.txt",
+            repo.create_blob(b"0123456789abcdef\n" * 8192),
+            pygit2.GIT_FILEMODE_BLOB,
+        )
+        builder.insert(
+            ".gitignore",
+            repo.create_blob(b"*.pyc\n"),
+            pygit2.GIT_FILEMODE_BLOB,
+        )
+        author = pygit2.Signature("Alice Author", "alice@authors.tld")
+        return repo.create_commit(
+            "refs/heads/master",
+            author,
+            author,
+            "Add some files",
+            builder.write(),
+            [parent],
+        ).hex
+
+    def test_generate_archive_content(self):
+        """Test the content of the archives generated from the objects of
+        the git repository."""
+        commit = self._add_archive_commit()
+        project = pagure.lib.query._get_project(self.session, "test")
+
+        with mock.patch.dict(
+            "pagure.config.config", {"ARCHIVE_FOLDER": self.archive_path}
+        ):
+            for fmt in ("tar", "tar.gz", "zip"):
+                pagure.lib.git.generate_archive(
+                    project, commit, None, "test-1", fmt
+                )
+
+        folder = os.path.join(self.archive_path, "test", commit)
+        self.assertEqual(
+            sorted(os.listdir(folder)),
+            ["test-1.tar", "test-1.tar.gz", "test-1.zip"],
+        )
+
+        expected = [
+            "test-1",
+            "test-1/.gitignore",
+            "test-1/README.rst",
+            "test-1/bin",
+            "test-1/bin/script.sh",
+            "test-1/data.txt",
+            "test-1/link",
+            "test-1/sources",
+        ]
+        for fmt in ("tar", "tar.gz"):
+            with tarfile.open(os.path.join(folder, "test-1." + fmt)) as tar:
+                self.assertEqual(sorted(tar.getnames()), expected)
+                self.assertTrue(tar.getmember("test-1/bin").isdir())
+                self.assertEqual(
+                    tar.getmember("test-1/bin/script.sh").mode, 0o755
+                )
+                self.assertEqual(
+                    tar.getmember("test-1/README.rst").mode, 0o644
+                )
+                self.assertEqual(
+                    tar.getmember("test-1/link").linkname, "README.rst"
+                )
+                self.assertEqual(
+                    tar.extractfile("test-1/bin/script.sh").read(),
+                    b"#!/bin/sh\necho hello\n",
+                )
+
+        with zipfile.ZipFile(os.path.join(folder, "test-1.zip")) as zipf:
+            self.assertEqual(
+                sorted(zipf.namelist()),
+                [
+                    "test-1/",
+                    "test-1/.gitignore",
+                    "test-1/README.rst",
+                    "test-1/bin/",
+                    "test-1/bin/script.sh",
+                    "test-1/data.txt",
+                    "test-1/link",
+                    "test-1/sources",
+                ],
+            )
+            self.assertEqual(
+                zipf.read("test-1/bin/script.sh"),
+                b"#!/bin/sh\necho hello\n",
+            )
+            self.assertEqual(
+                zipf.getinfo("test-1/bin/script.sh").external_attr >> 16,
+                0o100755,
+            )
+
+    def test_stream_archive_old_commit(self):
+        """Test the archives of a commit dated before 1980 with a symlink
+        whose target is not valid UTF-8."""
+        repo = pygit2.Repository(os.path.join(self.path, "repos", "test.git"))
+        builder = repo.TreeBuilder()
+        builder.insert(
+            "link", repo.create_blob(b"caf\xe9"), pygit2.GIT_FILEMODE_LINK
+        )
+        author = pygit2.Signature("Alice Author", "alice@authors.tld", 0, 0)
+        commit = repo.create_commit(
+            None, author, author, "Converted", builder.write(), []
+        ).hex
+
+        data = b"".join(
+            pagure.lib.git.stream_archive(repo, commit, "test-1", "zip")
+        )
+        with zipfile.ZipFile(six.BytesIO(data)) as zipf:
+            info = zipf.getinfo("test-1/link")
+            self.assertEqual(info.date_time, (1980, 1, 1, 0, 0, 0))
+            self.assertEqual(zipf.read(info), b"caf\xe9")
+
+        data = b"".join(
+            pagure.lib.git.stream_archive(repo, commit, "test-1", "tar")
+        )
+        with tarfile.open(fileobj=six.BytesIO(data)) as tar:
+            member = tar.getmember("test-1/link")
+            self.assertEqual(member.mtime, 0)
+            self.assertEqual(
+                member.linkname.encode("utf-8", "surrogateescape"),
+                b"caf\xe9",
+            )
+
+    def test_read_umask(self):
+        """Test reading the umask of the process, without /proc too."""
+        umask = os.umask(0o027)
+        try:
+            self.assertEqual(pagure.lib.git._read_umask(), 0o027)
+            with mock.patch("pagure.lib.git.open", side_effect=IOError):
+                self.assertEqual(pagure.lib.git._read_umask(), 0o027)
+            self.assertEqual(os.umask(umask), 0o027)
+        finally:
+            os.umask(umask)
+
+    def test_stream_archive(self):
+        """Test that the archive is yielded entry after entry."""
+        commit = self._add_archive_commit()
+        repo = pygit2.Repository(os.path.join(self.path, "repos", "test.git"))
+
+        chunks = list(
+            pagure.lib.git.stream_archive(repo, commit, "test-1", "tar")
+        )
+        # The archive is sent as its entries are written, not once complete
+        self.assertGreater(len(chunks), 1)
+        with tarfile.open(fileobj=six.BytesIO(b"".join(chunks))) as tar:
+            self.assertIn("test-1/bin/script.sh", tar.getnames())
+
+        self.assertRaises(
+            pagure.exceptions.PagureException,
+            pagure.lib.git.stream_archive,
+            repo,
+            commit,
+            "test-1",
+            "rar",
+        )
+
+    @mock.patch("pagure.lib.tasks.generate_archive")
+    def test_project_archive_stream(self, generate):
+        """Test getting an archive streamed while it is generated."""
+        commit = self._add_archive_commit()
+        with mock.patch.dict(
+            "pagure.config.config",
+            {"ARCHIVE_FOLDER": self.archive_path, "ARCHIVE_STREAM": True},
+        ):
+            output = self.app.get("/test/archive/%s/test-1.zip" % commit)
+            self.assertEqual(output.status_code, 200)
+            data = output.get_data()
+
+        generate.delay.assert_not_called()
+        with zipfile.ZipFile(six.BytesIO(data)) as zipf:
+            self.assertIn("test-1/bin/script.sh", zipf.namelist())
+
+        # The archive was stored, and only it
+        path = os.path.join(self.archive_path, "test", commit)
+        self.assertEqual(os.listdir(path), ["test-1.zip"])
+        with open(os.path.join(path, "test-1.zip"), "rb") as stream:
+            self.assertEqual(stream.read(), data)
+        # It can be served by the web server, as the generated archives
+        umask = os.umask(0o022)
+        os.umask(umask)
+        self.assertEqual(
+            os.stat(os.path.join(path, "test-1.zip")).st_mode & 0o777,
+            0o666 & ~umask,
+        )
+
 
 if __name__ == "__main__":
     unittest.main(verbosity=2)
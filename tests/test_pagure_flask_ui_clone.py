@@ -12,6 +12,7 @@ from __future__ import unicode_literals, absolute_import
 
 import base64
 import datetime
+import io
 import unittest
 import shutil
 import sys
@@ -28,6 +29,7 @@ sys.path.insert(
 )
 
 import pagure.lib.query
+import pagure.ui.clone
 import tests
 
 
@@ -156,6 +158,51 @@ class PagureFlaskAppClonetests(tests.Modeltests):
         # Either means we didn't fully crash when returning the response
         self.assertIn(output.status_code, (200, 415))
 
+    @patch.dict(
+        "pagure.config.config",
+        {
+            "ALLOW_HTTP_PULL_PUSH": True,
+            "ALLOW_HTTP_PUSH": False,
+            "HTTP_REPO_ACCESS_GITOLITE": None,
+            "HTTP_REPO_ACCESS_STREAMING": True,
+        },
+    )
+    def test_http_clone_streaming(self):
+        """Test that HTTP cloning works when streaming the request."""
+        output = self.app.get(
+            "/clonetest.git/info/refs?service=git-upload-pack"
+        )
+        self.assertEqual(output.status_code, 200)
+        self.assertIn(
+            "# service=git-upload-pack", output.get_data(as_text=True)
+        )
+
+        output = self.app.post(
+            "/clonetest.git/git-upload-pack",
+            headers={"Content-Type": "application/x-git-upload-pack-request"},
+            data=b"0000",
+        )
+        self.assertIn(output.status_code, (200, 415))
+
+    def test_feed_stdin(self):
+        """Test that the request stream is copied to the subprocess by
+        blocks and that its stdin gets closed."""
+        stream = io.BytesIO(b"a" * 10)
+        stdin = MagicMock()
+        pagure.ui.clone._feed_stdin(stream, stdin, 4)
+        self.assertEqual(
+            [c[0][0] for c in stdin.write.call_args_list],
+            [b"aaaa", b"aaaa", b"aa"],
+        )
+        stdin.close.assert_called_once_with()
+
+        # git went away before reading everything
+        stdin = MagicMock()
+        stdin.write.side_effect = BrokenPipeError()
+        pagure.ui.clone._feed_stdin(io.BytesIO(b"a" * 10), stdin, 4)
+        self.assertEqual(stdin.write.call_count, 1)
+        stdin.close.assert_called_once_with()
+
     @patch.dict(
         "pagure.config.config",
         {
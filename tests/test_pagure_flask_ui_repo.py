@@ -29,6 +29,7 @@ except ImportError:
 import pagure_messages
 import pygit2
 import six
+import sqlalchemy
 from fedora_messaging import testing
 from mock import ANY, patch, MagicMock
 
@@ -38,6 +39,7 @@ sys.path.insert(
 
 import pagure.lib.query
 import tests
+from pagure.config import config as pagure_config
 from pagure.lib.repo import PagureRepo
 from pagure.utils import __get_file_in_tree as get_file_in_tree
 
@@ -2665,6 +2667,57 @@ class PagureFlaskRepotests(tests.Modeltests):
         self.assertIn("<title>Commits - test3 - Pagure</title>", output_text)
         self.assertIn("Forked from", output_text)
 
+    def _get_user_queries(self, url):
+        """Return the queries looking up users by their email made when
+        loading the given url."""
+        statements = []
+
+        def record(conn, cursor, statement, parameters, context, many):
+            if "user_emails.email" in statement:
+                statements.append(statement)
+
+        engine = self.session.get_bind()
+        sqlalchemy.event.listen(engine, "before_cursor_execute", record)
+        try:
+            output = self.app.get(url)
+        finally:
+            sqlalchemy.event.remove(engine, "before_cursor_execute", record)
+        self.assertEqual(output.status_code, 200)
+        return output.get_data(as_text=True), statements
+
+    def test_view_commits_resolve_users_once(self):
+        """Test that the view_commits endpoint looks up the authors of all
+        the commits at once and caches them."""
+        tests.create_projects(self.session)
+        tests.create_projects_git(os.path.join(self.path, "repos"), bare=True)
+        repopath = os.path.join(self.path, "repos", "test.git")
+        for author in (
+            ("PY C", "bar@pingou.com"),
+            ("foo", "foo@bar.com"),
+            ("PY C", "bar@pingou.com"),
+            ("Someone", "someone@example.com"),
+        ):
+            tests.add_content_to_git(
+                repopath, content=author[1], author=author, commiter=author
+            )
+
+        output_text, statements = self._get_user_queries("/test/commits")
+        self.assertEqual(len(statements), 1)
+        self.assertEqual(output_text.count("href='/user/pingou'"), 2)
+        self.assertEqual(output_text.count("href='/user/foo'"), 1)
+        self.assertIn("Someone", output_text)
+
+        # The users are now cached
+        output_text, statements = self._get_user_queries("/test/commits")
+        self.assertEqual(len(statements), 0)
+        self.assertEqual(output_text.count("href='/user/pingou'"), 2)
+
+        # Unless the cache is disabled
+        with patch.dict(pagure_config, {"IDENTITY_CACHE_TTL": 0}):
+            output_text, statements = self._get_user_queries("/test/commits")
+        self.assertEqual(len(statements), 1)
+        self.assertEqual(output_text.count("href='/user/foo'"), 1)
+
     def test_view_commits_from_tag(self):
         """Test the view_commits endpoint given a tag."""
 
@@ -3299,6 +3352,73 @@ class PagureFlaskRepotests(tests.Modeltests):
         )
         self.assertIn("foo\n bar", output_text)
 
+    def test_view_raw_file_cache_headers(self):
+        """Test the caching headers of the view_raw_file endpoint."""
+        tests.create_projects(self.session)
+        tests.create_projects_git(os.path.join(self.path, "repos"), bare=True)
+        tests.add_content_to_git(
+            os.path.join(self.path, "repos", "test.git"),
+            filename="data.json",
+            content='{"foo": "bar"}',
+        )
+        repo = pygit2.Repository(os.path.join(self.path, "repos", "test.git"))
+        commit = repo.revparse_single("HEAD")
+        etag = '"%s"' % commit.tree["data.json"].hex
+
+        output = self.app.get("/test/raw/master/f/data.json")
+        self.assertEqual(output.status_code, 200)
+        self.assertEqual(output.get_data(as_text=True), '{"foo": "bar"}\n')
+        self.assertEqual(output.headers["ETag"], etag)
+        self.assertEqual(output.headers["Cache-Control"], "public, no-cache")
+        self.assertEqual(output.headers["Accept-Ranges"], "bytes")
+
+        # The content at a given commit never changes
+        output = self.app.get("/test/raw/%s/f/data.json" % commit.oid.hex)
+        self.assertEqual(output.status_code, 200)
+        self.assertEqual(output.headers["ETag"], etag)
+        self.assertEqual(
+            output.headers["Cache-Control"],
+            "public, max-age=31536000, immutable",
+        )
+
+        # The file is not read again if the client has it already
+        with patch("pagure.ui.repo.__get_file_in_tree") as get_file:
+            output = self.app.get(
+                "/test/raw/master/f/data.json",
+                headers={"If-None-Match": etag},
+            )
+            self.assertEqual(output.status_code, 304)
+            self.assertEqual(output.get_data(as_text=True), "")
+            self.assertEqual(output.headers["ETag"], etag)
+            get_file.assert_not_called()
+
+        output = self.app.get(
+            "/test/raw/master/f/data.json",
+            headers={"If-None-Match": '"0123456789"'},
+        )
+        self.assertEqual(output.status_code, 200)
+
+        # Partial content
+        output = self.app.get(
+            "/test/raw/master/f/data.json", headers={"Range": "bytes=1-5"}
+        )
+        self.assertEqual(output.status_code, 206)
+        self.assertEqual(output.get_data(as_text=True), '"foo"')
+        self.assertEqual(output.headers["Content-Range"], "bytes 1-5/15")
+
+        # Private projects are only cached by the clients
+        project = pagure.lib.query._get_project(self.session, "test")
+        project.private = True
+        self.session.add(project)
+        self.session.commit()
+        user = tests.FakeUser(username="pingou")
+        with tests.user_set(self.app.application, user):
+            output = self.app.get("/test/raw/master/f/data.json")
+            self.assertEqual(output.status_code, 200)
+            self.assertEqual(
+                output.headers["Cache-Control"], "private, no-cache"
+            )
+
     def test_view_commit(self):
         """Test the view_commit endpoint."""
         output = self.app.get("/foo/c/bar")
@@ -3700,6 +3820,37 @@ index 0000000..fb7093d
             output_text,
         )
 
+    def test_view_commit_patch_cache_headers(self):
+        """Test the caching headers of the view_commit_patch endpoint."""
+        tests.create_projects(self.session)
+        tests.create_projects_git(os.path.join(self.path, "repos"), bare=True)
+        tests.add_readme_git_repo(os.path.join(self.path, "repos", "test.git"))
+        repo = pygit2.Repository(os.path.join(self.path, "repos", "test.git"))
+        commit = repo.revparse_single("HEAD")
+        etag = '"%s.patch"' % commit.oid.hex
+
+        output = self.app.get("/test/c/%s.patch" % commit.oid.hex)
+        self.assertEqual(output.status_code, 200)
+        self.assertEqual(output.headers["ETag"], etag)
+        self.assertEqual(
+            output.headers["Cache-Control"],
+            "public, max-age=31536000, immutable",
+        )
+
+        output = self.app.get("/test/c/%s.diff" % commit.oid.hex)
+        self.assertEqual(output.status_code, 200)
+        self.assertEqual(output.headers["ETag"], '"%s.diff"' % commit.oid.hex)
+
+        # The patch is not generated again if the client has it already
+        with patch("pagure.lib.git.commit_to_patch") as commit_to_patch:
+            output = self.app.get(
+                "/test/c/%s.patch" % commit.oid.hex,
+                headers={"If-None-Match": etag},
+            )
+            self.assertEqual(output.status_code, 304)
+            self.assertEqual(output.get_data(as_text=True), "")
+            commit_to_patch.assert_not_called()
+
     def test_view_commit_diff(self):
         """Test the view_commit_diff endpoint."""
 
@@ -16,9 +16,11 @@ import shutil
 import sys
 import os
 
+import flask
 import six
 import pygit2
 import markdown
+import redis
 from mock import patch, MagicMock, Mock
 
 sys.path.insert(
@@ -95,6 +97,40 @@ class PagureLibtests_search_user(tests.Modeltests):
             sorted([email.email for email in item.emails]),
         )
 
+    def test_search_users_by_emails(self):
+        """
+        Test the method returns the users for a list of email addresses
+        """
+        items = pagure.lib.query.search_users_by_emails(self.session, [])
+        self.assertEqual({}, items)
+
+        items = pagure.lib.query.search_users_by_emails(
+            self.session,
+            ["foo@foo.com", "foo@bar.com", "foo@pingou.com", "bar@pingou.com"],
+        )
+        self.assertEqual(
+            sorted(items), ["bar@pingou.com", "foo@bar.com", "foo@pingou.com"]
+        )
+        self.assertEqual("foo", items["foo@bar.com"].user)
+        self.assertEqual("pingou", items["foo@pingou.com"].user)
+        self.assertEqual("pingou", items["bar@pingou.com"].user)
+
+    @patch("pagure.lib.query._IN_CHUNK_SIZE", 1)
+    def test_search_users_in_chunks(self):
+        """
+        Test the users are found when looked up in several queries
+        """
+        items = pagure.lib.query.search_users_by_emails(
+            self.session, ["foo@bar.com", "foo@pingou.com", "foo@foo.com"]
+        )
+        self.assertEqual(sorted(items), ["foo@bar.com", "foo@pingou.com"])
+
+        items = pagure.lib.query.search_users_by_usernames(
+            self.session, ["foo", "pingou", "bar", None]
+        )
+        self.assertEqual(sorted(items), ["foo", "pingou"])
+        self.assertEqual("pingou", items["pingou"].user)
+
     def test_search_user_token(self):
         """
         Test the method returns a user for a given token
@@ -171,6 +207,74 @@ class PagureLibtests_search_projects(tests.Modeltests):
         self.assertEqual(projects[0].id, 1)
         self.assertEqual(projects[1].id, 2)
 
+    def test__get_project_id_cache(self):
+        """
+        Test that _get_project caches the identifier of the projects found
+        and does not return them once renamed
+        """
+        project = pagure.lib.query._get_project(
+            self.session, "TEST3", namespace="SomeNamespace"
+        )
+        self.assertEqual(project.fullname, "somenamespace/test3")
+        self.assertEqual(
+            pagure.lib.query._PROJECT_ID_CACHE[
+                ("test3", None, "somenamespace")
+            ][0],
+            project.id,
+        )
+        self.assertIsNone(pagure.lib.query._get_project(self.session, "foo"))
+        self.assertEqual(len(pagure.lib.query._PROJECT_ID_CACHE), 1)
+        self.assertEqual(
+            pagure.lib.query._PROJECT_ID_CACHE_KEYS,
+            {project.id: set([("test3", None, "somenamespace")])},
+        )
+
+        project2 = pagure.lib.query._get_project(
+            self.session, "test3", namespace="somenamespace"
+        )
+        self.assertIs(project2, project)
+
+        project.name = "test4"
+        self.session.add(project)
+        self.session.commit()
+        self.assertEqual(pagure.lib.query._PROJECT_ID_CACHE, {})
+        self.assertEqual(pagure.lib.query._PROJECT_ID_CACHE_KEYS, {})
+        self.assertIsNone(
+            pagure.lib.query._get_project(
+                self.session, "test3", namespace="somenamespace"
+            )
+        )
+        self.assertEqual(
+            pagure.lib.query._get_project(
+                self.session, "test4", namespace="somenamespace"
+            ).id,
+            project.id,
+        )
+
+        # A stale entry does not return a project that no longer matches
+        pagure.lib.query._PROJECT_ID_CACHE[("test", None, None)] = (
+            project.id,
+            float("inf"),
+        )
+        self.assertEqual(
+            pagure.lib.query._get_project(self.session, "test").id, 1
+        )
+
+        # The lookups cached first are evicted
+        with patch("pagure.lib.query._PROJECT_ID_CACHE_SIZE", 2):
+            pagure.lib.query._get_project(self.session, "test2")
+            self.assertEqual(
+                list(pagure.lib.query._PROJECT_ID_CACHE),
+                [("test", None, None), ("test2", None, None)],
+            )
+            self.assertEqual(
+                pagure.lib.query._PROJECT_ID_CACHE_KEYS,
+                {
+                    1: set([("test", None, None)]),
+                    2: set([("test2", None, None)]),
+                },
+            )
+
     def test_search_projects_username(self):
         """
         Test the method returns all the projects for the given username
@@ -725,6 +829,122 @@ class PagureLibtests(tests.Modeltests):
         self.assertEqual(repo.open_tickets, 2)
         self.assertEqual(repo.open_tickets_public, 2)
 
+    @patch("pagure.lib.git.update_git")
+    @patch("pagure.lib.notify.send_email")
+    def test_issues_history_stats(self, p_send_email, p_ugt):
+        """Test the issues_history_stats of pagure.lib.query."""
+        p_send_email.return_value = True
+        p_ugt.return_value = True
+
+        self.test_new_issue()
+
+        repo = pagure.lib.query._get_project(self.session, "test")
+        # Backdate the first ticket and close it two weeks ago
+        issue = pagure.lib.query.search_issues(self.session, repo, issueid=1)
+        now = datetime.datetime.utcnow()
+        issue.date_created = now - datetime.timedelta(days=30)
+        issue.status = "Closed"
+        issue.closed_at = now - datetime.timedelta(days=14)
+        self.session.add(issue)
+        self.session.commit()
+        pagure.lib.query.invalidate_issues_history_stats(repo.id)
+
+        stats = pagure.lib.query.issues_history_stats(
+            self.session, repo, detailed=True, weeks_range=6
+        )
+        self.assertEqual(len(stats), 6)
+        self.assertEqual(
+            [stats[key] for key in sorted(stats, reverse=True)],
+            [
+                {"closed_ticket": 0, "count": 0, "open_ticket": 1},
+                {"closed_ticket": 0, "count": 0, "open_ticket": 0},
+                {"closed_ticket": 1, "count": 1, "open_ticket": 0},
+                {"closed_ticket": 0, "count": 1, "open_ticket": 0},
+                {"closed_ticket": 0, "count": 0, "open_ticket": 1},
+                {"closed_ticket": 0, "count": 0, "open_ticket": 0},
+            ],
+        )
+
+        stats = pagure.lib.query.issues_history_stats(
+            self.session, repo, weeks_range=6
+        )
+        self.assertEqual(
+            [stats[key] for key in sorted(stats, reverse=True)],
+            [1, 0, 1, 0, 0, 0],
+        )
+
+        # The stats are cached until the issues of the project change
+        self.assertIn(repo.id, pagure.lib.query._ISSUES_HISTORY_STATS_CACHE)
+        pagure.lib.query.new_issue(
+            session=self.session,
+            repo=repo,
+            title="Test issue #3",
+            content="We should work on this for the third time",
+            user="pingou",
+        )
+        self.session.commit()
+        self.assertNotIn(repo.id, pagure.lib.query._ISSUES_HISTORY_STATS_CACHE)
+
+        stats = pagure.lib.query.issues_history_stats(
+            self.session, repo, weeks_range=6
+        )
+        self.assertEqual(
+            [stats[key] for key in sorted(stats, reverse=True)],
+            [2, 0, 1, 0, 0, 0],
+        )
+
+    @patch.dict(
+        "pagure.config.config",
+        {"ISSUES_HISTORY_STATS_CACHE_BACKEND": "redis"},
+    )
+    @patch("pagure.lib.query._get_issues_history_stats_redis")
+    def test_issues_history_stats_redis(self, get_redis):
+        """Test that the issues history stats can be cached in redis, to
+        be shared by all the processes."""
+        stored = {}
+        redis_obj = get_redis.return_value
+        redis_obj.hget.side_effect = lambda name, key: stored.get((name, key))
+        pipeline = redis_obj.pipeline.return_value
+        pipeline.hset.side_effect = lambda name, key, value: stored.update(
+            {(name, key): value.encode("utf-8")}
+        )
+
+        tests.create_projects(self.session)
+        repo = pagure.lib.query._get_project(self.session, "test")
+        stats = pagure.lib.query.issues_history_stats(
+            self.session, repo, weeks_range=6
+        )
+        self.assertEqual(list(stats.values()), [0] * 6)
+        self.assertEqual(
+            list(stored), [("pagure:issues_history_stats:1", "False-6")]
+        )
+        pipeline.expire.assert_called_once_with(
+            "pagure:issues_history_stats:1", 300
+        )
+        self.assertEqual(pagure.lib.query._ISSUES_HISTORY_STATS_CACHE, {})
+
+        # The stats are read from redis, not from the database
+        session = MagicMock()
+        self.assertEqual(
+            pagure.lib.query.issues_history_stats(
+                session, repo, weeks_range=6
+            ),
+            stats,
+        )
+        session.query.assert_not_called()
+
+        pagure.lib.query.invalidate_issues_history_stats(repo.id)
+        redis_obj.delete.assert_called_once_with(
+            "pagure:issues_history_stats:1"
+        )
+
+        # The stats are computed when redis cannot be reached
+        redis_obj.hget.side_effect = redis.exceptions.ConnectionError()
+        stats = pagure.lib.query.issues_history_stats(
+            self.session, repo, weeks_range=6
+        )
+        self.assertEqual(list(stats.values()), [0] * 6)
+
     @patch("pagure.lib.git.update_git")
     @patch("pagure.lib.notify.send_email")
     def test_edit_issue_priority(self, p_send_email, p_ugt):
@@ -4084,7 +4304,10 @@ class PagureLibtests(tests.Modeltests):
     @patch("pagure.lib.tasks.update_git", MagicMock(return_value=True))
     @patch("pagure.lib.tasks.sync_pull_ref", MagicMock(return_value=True))
     @patch("pagure.lib.notify.send_email", MagicMock(return_value=True))
-    @patch("pagure.pfmarkdown._commit_exists", MagicMock(return_value=True))
+    @patch(
+        "pagure.pfmarkdown.References.commit_exists",
+        MagicMock(return_value=True),
+    )
     def test_text2markdown(self):
         """Test the text2markdown method in pagure.lib.query."""
         pagure.config.config["TESTING"] = True
@@ -4412,6 +4635,41 @@ class PagureLibtests(tests.Modeltests):
             html = pagure.lib.query.text2markdown(text)
             self.assertEqual(html, expected_html)
 
+    def test_text2markdown_cache(self):
+        """Test that text2markdown re-uses its processors and caches the
+        texts without references."""
+        with patch(
+            "pagure.lib.query._convert_markdown",
+            side_effect=pagure.lib.query._convert_markdown,
+        ) as convert:
+            with self.app.application.test_request_context("/test/issue/1"):
+                flask.g.session = self.session
+                html = pagure.lib.query.text2markdown("**foo**")
+                self.assertEqual(
+                    html,
+                    '<div class="markdown"><p><strong>foo</strong></p></div>',
+                )
+                self.assertEqual(
+                    pagure.lib.query.text2markdown("**foo**"), html
+                )
+                self.assertEqual(convert.call_count, 1)
+
+                # Texts with references are rendered every time
+                pagure.lib.query.text2markdown("see #1")
+                pagure.lib.query.text2markdown("see #1")
+                self.assertEqual(convert.call_count, 3)
+
+                # ... unless asked otherwise
+                with patch.dict(
+                    pagure.config.config, {"MARKDOWN_CACHE_TTL": 60}
+                ):
+                    pagure.lib.query.text2markdown("see #2")
+                    pagure.lib.query.text2markdown("see #2")
+                self.assertEqual(convert.call_count, 4)
+
+        processors = set(c[0][0] for c in convert.call_args_list)
+        self.assertEqual(len(processors), 1)
+
     def test_text2markdown_empty_string(self):
         """Test the text2markdown method in pagure.lib.query."""
 
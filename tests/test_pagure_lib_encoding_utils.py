@@ -16,6 +16,7 @@ except ImportError:
     pass
 
 import chardet
+from mock import patch
 
 sys.path.insert(
     0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
@@ -136,6 +137,63 @@ class TestDecode(unittest.TestCase):
         )
         self.assertEqual(data, encoding_utils.decode(data.encode("utf-8")))
 
+    @patch("pagure.lib.encoding_utils.guess_encodings")
+    def test_decode_utf8(self, guess):
+        """Test encoding_utils.decode() does not guess the encoding of
+        UTF-8 data"""
+        data = "Šabata's encoding, français, gagné!"
+        self.assertEqual(data, encoding_utils.decode(data.encode("utf-8")))
+        self.assertEqual("ascii only", encoding_utils.decode(b"ascii only"))
+        # The byte order mark is not part of the text
+        self.assertEqual(
+            data, encoding_utils.decode(b"\xef\xbb\xbf" + data.encode("utf-8"))
+        )
+        guess.assert_not_called()
+
+    def test_decode_utf8_bom_cached(self):
+        """Test encoding_utils.decode() strips the byte order mark of the
+        blobs whose encoding is cached"""
+        encoding_utils._ENCODING_CACHE.clear()
+        self.addCleanup(encoding_utils._ENCODING_CACHE.clear)
+        for _ in range(2):
+            self.assertEqual(
+                "gagné!",
+                encoding_utils.decode(
+                    b"\xef\xbb\xbf" + "gagné!".encode("utf-8"), blob_id="abc"
+                ),
+            )
+        self.assertEqual(encoding_utils._ENCODING_CACHE, {"abc": "utf-8-sig"})
+
+    @patch("pagure.lib.encoding_utils.guess_encodings")
+    def test_decode_sample(self, guess):
+        """Test encoding_utils.decode() guesses the encoding of large data
+        from a sample of it"""
+        guess.return_value = [
+            encoding_utils.Guess("ISO-8859-1", 0.8),
+            encoding_utils.Guess("ascii", 0.2),
+        ]
+        data = "français, gagné! " * 10000
+        self.assertEqual(data, encoding_utils.decode(data.encode("latin-1")))
+        guess.assert_called_once()
+        self.assertEqual(
+            len(guess.call_args[0][0]), encoding_utils.DETECTION_SAMPLE_SIZE
+        )
+
+    @patch("pagure.lib.encoding_utils.guess_encodings")
+    def test_decode_cached(self, guess):
+        """Test encoding_utils.decode() caches the encoding of the blobs"""
+        guess.return_value = [encoding_utils.Guess("ISO-8859-1", 0.8)]
+        encoding_utils._ENCODING_CACHE.clear()
+        data = "français, gagné!"
+        for _ in range(3):
+            self.assertEqual(
+                data,
+                encoding_utils.decode(data.encode("latin-1"), blob_id="abc"),
+            )
+        guess.assert_called_once()
+        self.assertEqual(encoding_utils._ENCODING_CACHE, {"abc": "ISO-8859-1"})
+        encoding_utils._ENCODING_CACHE.clear()
+
 
 if __name__ == "__main__":
     unittest.main(verbosity=2)
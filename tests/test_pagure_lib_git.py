@@ -11,6 +11,8 @@
 from __future__ import unicode_literals, absolute_import
 
 import datetime
+import fcntl
+import json
 import os
 import shutil
 import sys
@@ -1626,6 +1628,138 @@ index 458821a..77674a8
         files = [entry.name for entry in commit.tree]
         self.assertEqual(files, [])
 
+    @patch.dict("pagure.config.config", {"DIRECT_METADATA_COMMITS": True})
+    @patch("pagure.lib.notify.send_email")
+    def test_update_git_direct(self, email_f):
+        """Test the update_git and clean_git of pagure.lib.git when the
+        JSON files are committed directly to the git repository."""
+        email_f.return_value = True
+
+        item = pagure.lib.model.Project(
+            user_id=1,  # pingou
+            name="test_ticket_repo",
+            description="test project for ticket",
+            hook_token="aaabbbwww",
+        )
+        self.session.add(item)
+        self.session.commit()
+        gitpath = os.path.join(
+            self.path, "repos", "tickets", "test_ticket_repo.git"
+        )
+        gitrepo = pygit2.init_repository(gitpath, bare=True)
+
+        repo = pagure.lib.query.get_authorized_project(
+            self.session, "test_ticket_repo"
+        )
+        for idx in range(2):
+            pagure.lib.query.new_issue(
+                session=self.session,
+                repo=repo,
+                title="Test issue %s" % idx,
+                content="We should work on this",
+                user="pingou",
+            )
+        self.session.commit()
+        issues = [
+            pagure.lib.query.search_issues(self.session, repo, issueid=idx)
+            for idx in (1, 2)
+        ]
+
+        # One commit per issue created, straight to the bare repository
+        head = gitrepo.revparse_single("HEAD")
+        self.assertEqual(len(list(gitrepo.walk(head.oid))), 2)
+        self.assertEqual(
+            head.message, "Updated issue %s: Test issue 1" % issues[1].uid
+        )
+        self.assertEqual(
+            sorted(entry.name for entry in head.tree),
+            sorted(issue.uid for issue in issues),
+        )
+        self.assertFalse(
+            os.listdir(
+                os.path.join(gitpath, pagure.lib.git.PENDING_UPDATES_FOLDER)
+            )
+        )
+
+        # Updates pending for the same repository make a single commit
+        for issue in issues:
+            issue.title = "Edited %s" % issue.id
+            self.session.add(issue)
+        self.session.commit()
+        for issue in issues + issues:
+            self.assertTrue(
+                pagure.lib.git.queue_git_update(repo, "tickets", issue.uid)
+            )
+        pagure.lib.git.update_git(issues[0], repo).get()
+
+        head = gitrepo.revparse_single("HEAD")
+        self.assertEqual(len(list(gitrepo.walk(head.oid))), 3)
+        self.assertEqual(len(head.parents), 1)
+        self.assertTrue(head.message.startswith("Updated 2 objects\n\n"))
+        for issue in issues:
+            data = json.loads(head.tree[issue.uid].data.decode("utf-8"))
+            self.assertEqual(data["title"], "Edited %s" % issue.id)
+
+        # Nothing pending, nothing changed: no commit
+        pagure.lib.git.update_git(issues[0], repo).get()
+        self.assertEqual(gitrepo.revparse_single("HEAD").oid, head.oid)
+
+        # The updates are kept if they could not be committed
+        pending = os.path.join(gitpath, pagure.lib.git.PENDING_UPDATES_FOLDER)
+        issues[0].title = "Edited again"
+        self.session.add(issues[0])
+        self.session.commit()
+        pagure.lib.git.queue_git_update(repo, "tickets", issues[0].uid)
+        with patch(
+            "pagure.lib.git._commit_files",
+            side_effect=pygit2.GitError("current tip is not the first parent"),
+        ) as commit_files:
+            self.assertRaises(
+                pygit2.GitError,
+                pagure.lib.git.flush_git_updates,
+                self.session,
+                repo,
+                "tickets",
+            )
+            self.assertEqual(commit_files.call_count, 2)
+        self.assertEqual(os.listdir(pending), [issues[0].uid])
+        self.assertEqual(gitrepo.revparse_single("HEAD").oid, head.oid)
+
+        # And committed on top of the new tip if the branch moved meanwhile
+        commit_files = pagure.lib.git._commit_files
+        calls = []
+
+        def move_then_commit(repopath, files, message):
+            calls.append(files)
+            if len(calls) == 1:
+                tip = gitrepo.revparse_single("HEAD")
+                author = pygit2.Signature("Alice Author", "alice@authors.tld")
+                gitrepo.create_commit(
+                    "refs/heads/master",
+                    author,
+                    author,
+                    "Moved",
+                    tip.tree.oid,
+                    [tip.oid],
+                )
+                raise pygit2.GitError("current tip is not the first parent")
+            return commit_files(repopath, files, message)
+
+        with patch(
+            "pagure.lib.git._commit_files", side_effect=move_then_commit
+        ):
+            pagure.lib.git.flush_git_updates(self.session, repo, "tickets")
+        self.assertEqual(len(calls), 2)
+        self.assertFalse(os.listdir(pending))
+        head = gitrepo.revparse_single("HEAD")
+        self.assertEqual(head.parents[0].message, "Moved")
+        data = json.loads(head.tree[issues[0].uid].data.decode("utf-8"))
+        self.assertEqual(data["title"], "Edited again")
+
+        pagure.lib.git.clean_git(repo, "tickets", issues[0].uid).get()
+        head = gitrepo.revparse_single("HEAD")
+        self.assertEqual([entry.name for entry in head.tree], [issues[1].uid])
+
     @patch("pagure.lib.notify.send_email")
     def test_update_git_requests(self, email_f):
         """Test the update_git of pagure.lib.git for pull-requests."""
@@ -2032,6 +2166,10 @@ index 0000000..60f7480
         )
         self.session.commit()
 
+        # The issues history stats cached are dropped when the issue changes
+        pagure.lib.query.issues_history_stats(self.session, repo)
+        self.assertIn(repo.id, pagure.lib.query._ISSUES_HISTORY_STATS_CACHE)
+
         # Edit the issue
         data = {
             "status": "Closed",
@@ -2058,6 +2196,7 @@ index 0000000..60f7480
             agent="pingou",
         )
         self.session.commit()
+        self.assertNotIn(repo.id, pagure.lib.query._ISSUES_HISTORY_STATS_CACHE)
 
         self.assertEqual(len(repo.issues), 1)
         self.assertEqual(repo.issues[0].id, 1)
@@ -3195,6 +3334,286 @@ index 0000000..60f7480
             output = pagure.lib.git.get_author(githash, gitrepo)
             self.assertEqual(output, "pagure")
 
+    def test_get_commits_info(self):
+        """Test the get_commits_info method of pagure.lib.git."""
+
+        self.test_update_git()
+
+        gitrepo = os.path.join(
+            self.path, "repos", "tickets", "test_ticket_repo.git"
+        )
+        commits = pagure.lib.git.read_git_lines(
+            ["log", "-3", "--pretty=%H"], gitrepo
+        )
+        self.assertEqual(len(commits), 2)
+        output = pagure.lib.git.get_commits_info(commits, gitrepo)
+        self.assertEqual(sorted(output), sorted(commits))
+        for githash in commits:
+            self.assertEqual(output[githash]["author"], "pagure")
+            self.assertEqual(output[githash]["email"], "pagure")
+            self.assertEqual(
+                output[githash]["subject"],
+                pagure.lib.git.get_commit_subject(githash, gitrepo),
+            )
+
+        self.assertEqual(pagure.lib.git.get_commits_info([], gitrepo), {})
+
+    def test_update_commits_stats(self):
+        """Test the update_commits_stats method of pagure.lib.git."""
+        tests.create_projects_git(os.path.join(self.path, "repos"), bare=True)
+        gitrepo = os.path.join(self.path, "repos", "test.git")
+        tests.add_commit_git_repo(gitrepo, ncommits=3)
+        repo = pygit2.Repository(gitrepo)
+        first_commit = repo.head.peel().parents[0].parents[0]
+
+        # Nothing is computed unless asked to
+        self.assertIsNone(
+            pagure.lib.git.update_commits_stats(gitrepo, create=False)
+        )
+        self.assertIsNone(pagure.lib.git.load_commits_stats(gitrepo))
+
+        stats = pagure.lib.git.update_commits_stats(gitrepo)
+        self.assertEqual(stats["head"], repo.head.peel().oid.hex)
+        self.assertEqual(stats["commits"], 3)
+        self.assertEqual(stats["last_commit_time"], first_commit.commit_time)
+        self.assertEqual(
+            stats["authors"], [["Alice Author", "alice@authors.tld", 3]]
+        )
+        self.assertEqual(sum(stats["dates"].values()), 3)
+        self.assertEqual(pagure.lib.git.load_commits_stats(gitrepo), stats)
+
+        # Only the new commits are walked when the history moves forward
+        stats["authors"] = [["Alice Author", "alice@authors.tld", 30]]
+        pagure.lib.git.save_commits_stats(gitrepo, stats)
+        tests.add_commit_git_repo(gitrepo, ncommits=2)
+        stats = pagure.lib.git.update_commits_stats(gitrepo, create=False)
+        self.assertEqual(stats["head"], repo.head.peel().oid.hex)
+        self.assertEqual(stats["commits"], 5)
+        self.assertEqual(stats["last_commit_time"], first_commit.commit_time)
+        self.assertEqual(
+            stats["authors"], [["Alice Author", "alice@authors.tld", 32]]
+        )
+        self.assertEqual(sum(stats["dates"].values()), 5)
+
+        # The stats are rebuilt when the history is rewritten
+        repo.references["refs/heads/master"].set_target(first_commit.oid)
+        stats = pagure.lib.git.update_commits_stats(gitrepo)
+        self.assertEqual(stats["head"], first_commit.oid.hex)
+        self.assertEqual(stats["commits"], 1)
+        self.assertEqual(
+            stats["authors"], [["Alice Author", "alice@authors.tld", 1]]
+        )
+
+    def test_commits_index(self):
+        """Test the update_commits_index and get_commits_page methods of
+        pagure.lib.git."""
+        tests.create_projects_git(os.path.join(self.path, "repos"), bare=True)
+        gitrepo = os.path.join(self.path, "repos", "test.git")
+        tests.add_commit_git_repo(gitrepo, ncommits=5)
+        repo = pygit2.Repository(gitrepo)
+
+        def history():
+            head = repo.lookup_branch("master").peel().oid.hex
+            return [c.oid.hex for c in repo.walk(head, pygit2.GIT_SORT_NONE)]
+
+        def page(start, end, emails=None):
+            count, commits = pagure.lib.git.get_commits_page(
+                repo, "master", start, end, emails=emails
+            )
+            return count, [commit.oid.hex for commit in commits]
+
+        # Nothing is computed unless asked to
+        self.assertIsNone(
+            pagure.lib.git.update_commits_index(
+                gitrepo, "master", create=False
+            )
+        )
+        self.assertIsNone(
+            pagure.lib.git.update_commits_index(gitrepo, "unknown")
+        )
+
+        commits = history()
+        self.assertEqual(page(0, 2), (5, commits[:3]))
+        self.assertEqual(page(3, 10), (5, commits[3:]))
+        self.assertEqual(page(6, 8), (5, []))
+        index = pagure.lib.git.load_commits_index(gitrepo, "master")
+        self.assertEqual(index["head"], commits[0])
+        self.assertEqual(index["count"], 5)
+
+        # New commits are appended, by another author
+        head = repo.lookup_branch("master").peel()
+        author = pygit2.Signature("Bob", "bob@authors.tld")
+        for idx in range(2):
+            head = repo[
+                repo.create_commit(
+                    "refs/heads/master",
+                    author,
+                    author,
+                    "Commit %s from bob" % idx,
+                    head.tree.oid,
+                    [head.oid.hex],
+                )
+            ]
+        index = pagure.lib.git.update_commits_index(
+            gitrepo, "master", create=False
+        )
+        self.assertEqual(index["count"], 7)
+        commits = history()
+        self.assertEqual(page(0, 3), (7, commits[:4]))
+        self.assertEqual(page(0, 0, ["bob@authors.tld"]), (2, commits[:1]))
+        self.assertEqual(
+            page(1, 5, ["alice@authors.tld", "bob@authors.tld"]),
+            (7, commits[1:6]),
+        )
+        self.assertEqual(page(0, 5, ["foo@bar.com"]), (0, []))
+
+        # The index is rebuilt when the history is rewritten
+        repo.references["refs/heads/master"].set_target(commits[4])
+        self.assertEqual(page(0, 10), (3, commits[4:]))
+
+        # The index updated by another process while waiting for its lock
+        # is not updated again
+        repo.references["refs/heads/master"].set_target(commits[0])
+        head = repo.lookup_branch("master").peel().oid.hex
+        real_flock = fcntl.flock
+
+        def flock(stream, operation):
+            if operation == fcntl.LOCK_EX:
+                pagure.lib.git._update_commits_index(
+                    repo, gitrepo, "master", head
+                )
+            return real_flock(stream, operation)
+
+        with patch("pagure.lib.git.fcntl.flock", side_effect=flock):
+            index = pagure.lib.git.update_commits_index(gitrepo, "master")
+        self.assertEqual(index["count"], 7)
+        self.assertEqual(page(0, 10), (7, commits))
+
+        pagure.lib.git.remove_commits_index(gitrepo, "master")
+        self.assertIsNone(pagure.lib.git.load_commits_index(gitrepo, "master"))
+
+    def test_get_branches_of_commit(self):
+        """Test the get_branches_of_commit method of pagure.lib.git."""
+        tests.create_projects_git(os.path.join(self.path, "repos"), bare=True)
+        gitrepo = os.path.join(self.path, "repos", "test.git")
+        repo = pygit2.Repository(gitrepo)
+        self.assertEqual(
+            pagure.lib.git.get_branches_of_commit(repo, "foo"), []
+        )
+
+        tests.add_commit_git_repo(gitrepo, ncommits=2)
+        master = repo.head.peel()
+        tests.add_commit_git_repo(gitrepo, ncommits=2, branch="feature")
+        feature = repo.lookup_branch("feature").peel()
+        self.assertEqual(
+            pagure.lib.git.get_branches_of_commit(repo, feature.oid.hex),
+            ["feature"],
+        )
+        self.assertEqual(
+            pagure.lib.git.get_branches_of_commit(repo, master.oid.hex),
+            ["master"],
+        )
+
+        # The index of the branches which did not move is re-used
+        index = pagure.lib.git._BRANCHES_INDEX[repo.path]
+        tests.add_commit_git_repo(gitrepo, ncommits=1, branch="feature2")
+        pagure.lib.git.get_branches_of_commit(repo, master.oid.hex)
+        self.assertEqual(
+            sorted(pagure.lib.git._BRANCHES_INDEX[repo.path]["branches"]),
+            ["feature", "feature2"],
+        )
+        self.assertIs(
+            pagure.lib.git._BRANCHES_INDEX[repo.path]["branches"]["feature"],
+            index["branches"]["feature"],
+        )
+
+        # The index is bounded by its total number of commits
+        self.assertEqual(
+            pagure.lib.git._BRANCHES_INDEX[repo.path]["commits"], 3
+        )
+        with patch("pagure.lib.git._BRANCHES_INDEX_MAX_COMMITS", 2):
+            pagure.lib.git._BRANCHES_INDEX[repo.path]["default"] = None
+            self.assertEqual(
+                pagure.lib.git.get_branches_of_commit(repo, feature.oid.hex),
+                ["feature"],
+            )
+            self.assertNotIn(repo.path, pagure.lib.git._BRANCHES_INDEX)
+        pagure.lib.git.get_branches_of_commit(repo, feature.oid.hex)
+        with patch("pagure.lib.git._BRANCHES_INDEX_MAX_COMMITS", 4):
+            pagure.lib.git._BRANCHES_INDEX["other"] = {"commits": 2}
+            pagure.lib.git._BRANCHES_INDEX.move_to_end(repo.path)
+            pagure.lib.git.get_branches_of_commit(repo, feature.oid.hex)
+            self.assertEqual(list(pagure.lib.git._BRANCHES_INDEX), [repo.path])
+
+        # Once merged in the default branch, the commit is reported there
+        repo.references["refs/heads/master"].set_target(feature.oid)
+        self.assertEqual(
+            pagure.lib.git.get_branches_of_commit(repo, feature.oid.hex),
+            ["master"],
+        )
+
+    def test_get_diff_commits(self):
+        """Test the commits returned by get_diff_info on diverged branches
+        and that they are kept in memory."""
+        tests.create_projects_git(os.path.join(self.path, "repos"), bare=True)
+        gitrepo = os.path.join(self.path, "repos", "test.git")
+        repo = pygit2.Repository(gitrepo)
+        tests.add_commit_git_repo(gitrepo, ncommits=2)
+        tests.add_commit_git_repo(gitrepo, ncommits=3, branch="feature")
+        tests.add_commit_git_repo(gitrepo, ncommits=2, filename="other")
+        master = repo.lookup_branch("master").peel().oid.hex
+        feature = repo.lookup_branch("feature").peel().oid.hex
+        expected = [
+            commit.oid.hex
+            for commit in repo.walk(feature, pygit2.GIT_SORT_NONE)
+        ][:3]
+
+        with patch(
+            "pagure.lib.git._walk_diff_commits",
+            wraps=pagure.lib.git._walk_diff_commits,
+        ) as walk:
+            for _ in range(2):
+                diff, diff_commits, orig_commit = pagure.lib.git.get_diff_info(
+                    repo, repo, "feature", "master"
+                )
+                self.assertEqual(
+                    [commit.oid.hex for commit in diff_commits], expected
+                )
+                self.assertEqual(orig_commit.oid.hex, master)
+                self.assertEqual(len(diff), 1)
+            walk.assert_called_once_with(repo, repo, feature, master)
+
+        # The walk used when the commits are not in the same repository
+        self.assertEqual(
+            list(
+                pagure.lib.git._walk_diff_commits_lockstep(
+                    repo, repo, feature, master
+                )
+            ),
+            expected,
+        )
+
+        # The other way around
+        self.assertEqual(
+            [
+                commit.oid.hex
+                for commit in pagure.lib.git.get_diff_info(
+                    repo, repo, "master", "feature"
+                )[1]
+            ],
+            [
+                commit.oid.hex
+                for commit in repo.walk(master, pygit2.GIT_SORT_NONE)
+            ][:2],
+        )
+
+        # Nothing to merge from a branch behind its target
+        repo.references["refs/heads/feature"].set_target(master)
+        self.assertEqual(
+            pagure.lib.git.get_diff_info(repo, repo, "feature", "master")[1],
+            [],
+        )
+
     def get_author_email(self):
         """Test the get_author_email method of pagure.lib.git."""
 
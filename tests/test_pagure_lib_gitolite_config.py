@@ -995,5 +995,153 @@ repo requests/somenamespace/test3
         self.assertEqual(data, exp)
 
 
+class PagureLibGitoliteFragmentsConfigtests(tests.Modeltests):
+    """Tests for the gitolite3_fragments git auth backend"""
+
+    maxDiff = None
+
+    def setUp(self):
+        """Set up the environnment, ran before every tests."""
+        super(PagureLibGitoliteFragmentsConfigtests, self).setUp()
+
+        tests.create_projects(self.session)
+
+        self.outputconf = os.path.join(self.path, "test_gitolite.conf")
+        self.folder = os.path.join(self.path, "pagure")
+        pagure.config.config["GITOLITE_CONFIG"] = self.outputconf
+
+        self.preconf = os.path.join(self.path, "header_gitolite")
+        with open(self.preconf, "w") as stream:
+            stream.write("# this is a header that is manually added")
+
+        self.helper = pagure.lib.git_auth.get_git_auth_helper(
+            "gitolite3_fragments"
+        )
+
+    def _read_fragment(self, name):
+        """Return the content of the specified fragment."""
+        with open(os.path.join(self.folder, name)) as stream:
+            return stream.read()
+
+    def test_write_gitolite_fragments_all_projects(self):
+        """Test writing the configuration of all the projects."""
+        self.helper.write_gitolite_acls(
+            self.session, self.outputconf, project=-1, preconf=self.preconf
+        )
+
+        with open(self.outputconf) as stream:
+            data = stream.read()
+
+        exp = """# this is a header that is manually added
+# end of header
+include "pagure/*.conf"
+
+# end of body
+"""
+        self.assertEqual(data, exp)
+
+        self.assertEqual(
+            sorted(os.listdir(self.folder)), ["1.conf", "2.conf", "3.conf"]
+        )
+        self.assertEqual(
+            self._read_fragment("2.conf"),
+            """repo test2
+  R   = @all
+  RW+ = pingou
+
+repo docs/test2
+  R   = @all
+  RW+ = pingou
+
+repo tickets/test2
+  RW+ = pingou
+
+repo requests/test2
+  RW+ = pingou
+
+""",
+        )
+
+    def test_write_gitolite_fragments_one_project(self):
+        """Test that updating one project only rewrites its fragment and
+        that a full refresh removes the fragments of deleted projects."""
+        self.helper.write_gitolite_acls(
+            self.session, self.outputconf, project=-1
+        )
+        stale = os.path.join(self.folder, "deleted.conf")
+        with open(stale, "w") as stream:
+            stream.write("repo deleted\n")
+
+        # Change the main file to check it is left alone
+        with open(self.outputconf, "a") as stream:
+            stream.write("# manual change\n")
+
+        project = pagure.lib.query._get_project(self.session, "test")
+        project.settings = {"pull_request_access_only": True}
+        self.session.add(project)
+        self.session.commit()
+
+        self.helper.write_gitolite_acls(
+            self.session, self.outputconf, project=project
+        )
+        with open(self.outputconf) as stream:
+            self.assertTrue(stream.read().endswith("# manual change\n"))
+        self.assertEqual(
+            self._read_fragment("1.conf"),
+            """repo docs/test
+  R   = @all
+  RW+ = pingou
+
+repo tickets/test
+  RW+ = pingou
+
+repo requests/test
+  RW+ = pingou
+
+""",
+        )
+        self.assertTrue(os.path.exists(stale))
+
+        self.helper.write_gitolite_acls(
+            self.session, self.outputconf, project=-1
+        )
+        self.assertFalse(os.path.exists(stale))
+        with open(self.outputconf) as stream:
+            self.assertNotIn("# manual change", stream.read())
+
+    def test_remove_acls_fragments(self):
+        """Test that removing a project deletes its fragment."""
+        self.helper.write_gitolite_acls(
+            self.session, self.outputconf, project=-1
+        )
+        project = pagure.lib.query._get_project(self.session, "test")
+        self.helper.remove_acls(self.session, project=project)
+        self.assertEqual(sorted(os.listdir(self.folder)), ["2.conf", "3.conf"])
+        self.assertRaises(
+            RuntimeError, self.helper.remove_acls, self.session, None
+        )
+
+    def test_write_gitolite_fragments_renamed_project(self):
+        """Test that renaming a project replaces its fragment."""
+        self.helper.write_gitolite_acls(
+            self.session, self.outputconf, project=-1
+        )
+        project = pagure.lib.query._get_project(self.session, "test")
+        project.name = "renamed"
+        project.namespace = "somenamespace"
+        self.session.add(project)
+        self.session.commit()
+
+        self.helper.write_gitolite_acls(
+            self.session, self.outputconf, project=project
+        )
+        self.assertEqual(
+            sorted(os.listdir(self.folder)), ["1.conf", "2.conf", "3.conf"]
+        )
+        data = self._read_fragment("1.conf")
+        self.assertIn("repo somenamespace/renamed\n", data)
+        self.assertNotIn("repo test\n", data)
+
+
 if __name__ == "__main__":
     unittest.main(verbosity=2)
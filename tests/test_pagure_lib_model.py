@@ -10,6 +10,7 @@
 
 from __future__ import unicode_literals, absolute_import
 
+import json
 import unittest
 import sys
 import os
@@ -247,6 +248,54 @@ class PagureLibModeltests(tests.Modeltests):
 
         self.assertEqual([p.fullname for p in group.projects], order)
 
+    @patch("pagure.lib.model.json.loads", wraps=json.loads)
+    def test_project_json_properties_cached(self, p_loads):
+        """Test that the JSON text columns of a project are only parsed
+        once for as long as they do not change."""
+        tests.create_projects(self.session)
+        repo = pagure.lib.query.get_authorized_project(self.session, "test")
+        repo.settings = {"pull_requests": False}
+        repo.milestones = {"v1.0": "2030-01-01"}
+        self.session.add(repo)
+        self.session.commit()
+        p_loads.reset_mock()
+
+        for _ in range(5):
+            self.assertFalse(repo.settings["pull_requests"])
+            self.assertTrue(repo.settings["issue_tracker"])
+            self.assertEqual(
+                repo.milestones,
+                {"v1.0": {"date": "2030-01-01", "active": True}},
+            )
+            self.assertEqual(
+                repo.close_status,
+                ["Invalid", "Insufficient data", "Fixed", "Duplicate"],
+            )
+        self.assertEqual(p_loads.call_count, 3)
+
+        # Modifying the values returned does not alter the project
+        settings = repo.settings
+        settings["issue_tracker"] = False
+        repo.milestones["v1.0"]["active"] = False
+        self.assertTrue(repo.settings["issue_tracker"])
+        self.assertTrue(repo.milestones["v1.0"]["active"])
+
+        # Until they are saved back
+        repo.settings = settings
+        self.assertFalse(repo.settings["issue_tracker"])
+
+        # The values are parsed again once the project is reloaded
+        self.session.commit()
+        self.session.execute(
+            "UPDATE projects SET _close_status = '[\"Fixed\"]' "
+            "WHERE id = %s" % repo.id
+        )
+        self.session.commit()
+        p_loads.reset_mock()
+        self.assertEqual(repo.close_status, ["Fixed"])
+        self.assertFalse(repo.settings["issue_tracker"])
+        self.assertEqual(p_loads.call_count, 2)
+
 
 if __name__ == "__main__":
     unittest.main(verbosity=2)
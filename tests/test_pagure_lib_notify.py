@@ -14,6 +14,7 @@ import unittest
 import shutil
 import sys
 import os
+import smtplib
 
 from mock import patch, MagicMock
 
@@ -544,6 +545,100 @@ RW1haWwgY29udGVudA==
 """
         self.assertEqual(email.as_string(), exp)
 
+    @patch.dict(
+        "pagure.config.config",
+        {"EMAIL_SEND": True, "SMTP_USERNAME": "user", "SMTP_PASSWORD": "pw"},
+    )
+    @patch("pagure.lib.notify.smtplib.SMTP")
+    def test_deliver_email_keep_connection(self, mock_smtp):
+        """Test that deliver_email re-uses its connection to the SMTP
+        server across recipients and emails when asked to."""
+        smtp = MagicMock()
+        mock_smtp.return_value = smtp
+        pagure.lib.notify._SMTP.connection = None
+
+        for _ in range(3):
+            email = pagure.lib.notify.deliver_email(
+                "Email content",
+                "Email subject",
+                "foo@bar.com,bar@foo.net",
+                keep_connection=True,
+            )
+            self.assertEqual(email["To"], "bar@foo.net")
+
+        # A single connection, authenticated once, used for all the emails
+        self.assertEqual(mock_smtp.call_count, 1)
+        self.assertEqual(smtp.login.call_count, 1)
+        self.assertEqual(smtp.sendmail.call_count, 6)
+        self.assertEqual(
+            [call[0][1] for call in smtp.sendmail.call_args_list],
+            [["foo@bar.com"], ["bar@foo.net"]] * 3,
+        )
+        smtp.quit.assert_not_called()
+        self.assertIs(pagure.lib.notify._SMTP.connection, smtp)
+
+        # Without keep_connection, the connection is closed at the end
+        pagure.lib.notify.deliver_email(
+            "Email content", "Email subject", "foo@bar.com"
+        )
+        self.assertEqual(mock_smtp.call_count, 2)
+        self.assertEqual(smtp.quit.call_count, 1)
+
+    @patch.dict("pagure.config.config", {"EMAIL_SEND": True})
+    @patch("pagure.lib.notify.smtplib.SMTP")
+    def test_deliver_email_reconnect(self, mock_smtp):
+        """Test that deliver_email opens a new connection to the SMTP
+        server when the one it kept open was closed."""
+        stale = MagicMock()
+        stale.sendmail.side_effect = smtplib.SMTPServerDisconnected()
+        fresh = MagicMock()
+        mock_smtp.return_value = fresh
+        pagure.lib.notify._SMTP.connection = stale
+
+        pagure.lib.notify.deliver_email(
+            "Email content",
+            "Email subject",
+            "foo@bar.com,bar@foo.net",
+            keep_connection=True,
+        )
+
+        self.assertEqual(stale.sendmail.call_count, 1)
+        self.assertEqual(mock_smtp.call_count, 1)
+        self.assertEqual(
+            [call[0][1] for call in fresh.sendmail.call_args_list],
+            [["foo@bar.com"], ["bar@foo.net"]],
+        )
+        self.assertIs(pagure.lib.notify._SMTP.connection, fresh)
+        pagure.lib.notify._SMTP.connection = None
+
+    @patch.dict("pagure.config.config", {"EMAIL_ASYNC": True})
+    @patch("pagure.lib.notify.deliver_email")
+    @patch("pagure.lib.tasks_services.send_email")
+    def test_send_email_async(self, mock_task, mock_deliver):
+        """Test that send_email only queues the email when EMAIL_ASYNC is
+        set."""
+        out = pagure.lib.notify.send_email(
+            "Email content",
+            "Email subject",
+            "foo@bar.com",
+            mail_id="test-1",
+            project_name="namespace/project",
+        )
+
+        self.assertIsNone(out)
+        mock_deliver.assert_not_called()
+        mock_task.delay.assert_called_once_with(
+            "Email content",
+            "Email subject",
+            "foo@bar.com",
+            mail_id="test-1",
+            in_reply_to=None,
+            project_name="namespace/project",
+            user_from=None,
+            reporter=None,
+            assignee=None,
+        )
+
     def test_notification_mention(self):
         g = munch.Munch()
         g.session = self.session
@@ -15,12 +15,16 @@ import os
 import shutil
 import sys
 import tempfile
+import threading
 import time
 import unittest
 
 import pygit2
+import requests
 import six
+import urllib3
 from mock import ANY, patch, MagicMock, call
+from six.moves.BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
 
 sys.path.insert(
     0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
@@ -209,7 +213,10 @@ class PagureLibTaskServicestests(tests.Modeltests):
             namespace=None,
             username=None,
         )
-        self.assertIsNone(output)
+        self.assertEqual(
+            [output[key] for key in ("files", "loaded", "skipped", "failed")],
+            [0, 0, 0, 0],
+        )
         up_issue.assert_not_called()
         up_pr.assert_not_called()
 
@@ -228,7 +235,10 @@ class PagureLibTaskServicestests(tests.Modeltests):
             namespace=None,
             username=None,
         )
-        self.assertIsNone(output)
+        self.assertEqual(
+            [output[key] for key in ("files", "loaded", "skipped", "failed")],
+            [0, 0, 0, 0],
+        )
         up_issue.assert_not_called()
         up_pr.assert_not_called()
 
@@ -246,7 +256,10 @@ class PagureLibTaskServicestests(tests.Modeltests):
             namespace=None,
             username=None,
         )
-        self.assertIsNone(output)
+        self.assertEqual(
+            [output[key] for key in ("files", "loaded", "skipped", "failed")],
+            [0, 0, 0, 0],
+        )
         up_issue.assert_not_called()
         up_pr.assert_not_called()
         send.assert_not_called()
@@ -270,7 +283,10 @@ class PagureLibTaskServicestests(tests.Modeltests):
             namespace=None,
             username=None,
         )
-        self.assertIsNone(output)
+        self.assertEqual(
+            [output[key] for key in ("files", "loaded", "skipped", "failed")],
+            [2, 0, 2, 0],
+        )
         up_issue.assert_not_called()
         up_pr.assert_not_called()
         send.assert_not_called()
@@ -296,7 +312,10 @@ class PagureLibTaskServicestests(tests.Modeltests):
             namespace=None,
             username=None,
         )
-        self.assertIsNone(output)
+        self.assertEqual(
+            [output[key] for key in ("files", "loaded", "skipped", "failed")],
+            [2, 2, 0, 0],
+        )
 
         calls = [
             call(
@@ -307,6 +326,7 @@ class PagureLibTaskServicestests(tests.Modeltests):
                 namespace=None,
                 reponame="test",
                 username=None,
+                cache={},
             ),
             call(
                 ANY,
@@ -316,6 +336,7 @@ class PagureLibTaskServicestests(tests.Modeltests):
                 namespace=None,
                 reponame="test",
                 username=None,
+                cache={},
             ),
         ]
         self.assertEqual(calls, up_issue.mock_calls)
@@ -343,7 +364,10 @@ class PagureLibTaskServicestests(tests.Modeltests):
             namespace=None,
             username=None,
         )
-        self.assertIsNone(output)
+        self.assertEqual(
+            [output[key] for key in ("files", "loaded", "skipped", "failed")],
+            [2, 2, 0, 0],
+        )
 
         calls = [
             call(
@@ -353,6 +377,7 @@ class PagureLibTaskServicestests(tests.Modeltests):
                 reponame="test",
                 request_uid="file1",
                 username=None,
+                cache={},
             ),
             call(
                 ANY,
@@ -361,6 +386,7 @@ class PagureLibTaskServicestests(tests.Modeltests):
                 reponame="test",
                 request_uid="file2",
                 username=None,
+                cache={},
             ),
         ]
         up_issue.assert_not_called()
@@ -402,7 +428,10 @@ class PagureLibTaskServicestests(tests.Modeltests):
             namespace=None,
             username=None,
         )
-        self.assertIsNone(output)
+        self.assertEqual(
+            [output[key] for key in ("files", "loaded", "skipped", "failed")],
+            [2, 0, 0, 1],
+        )
 
         calls = [
             call(
@@ -412,6 +441,7 @@ class PagureLibTaskServicestests(tests.Modeltests):
                 reponame="test",
                 request_uid="file1",
                 username=None,
+                cache={},
             )
         ]
         up_issue.assert_not_called()
@@ -431,6 +461,69 @@ class PagureLibTaskServicestests(tests.Modeltests):
         ]
         self.assertEqual(calls, send.mock_calls)
 
+    @patch("pagure.lib.git.read_git_lines")
+    def test_get_files_to_load(self, git):
+        """Test that get_files_to_load diffs the trees of the commits
+        pushed with pygit2."""
+        gitrepo = os.path.join(self.path, "repos", "tickets", "load.git")
+        repo = pygit2.init_repository(gitrepo, bare=True)
+        author = pygit2.Signature("Alice Author", "alice@authors.tld")
+
+        def _commit(files, parents):
+            builder = repo.TreeBuilder()
+            for filename, content in files.items():
+                builder.insert(
+                    filename,
+                    repo.create_blob(content),
+                    pygit2.GIT_FILEMODE_BLOB,
+                )
+            return repo.create_commit(
+                "refs/heads/master",
+                author,
+                author,
+                "commit",
+                builder.write(),
+                parents,
+            ).hex
+
+        first = _commit({"issue1": "{}", "issue2": "{}"}, [])
+        second = _commit({"issue1": "{}", "issue2": '{"a": 1}'}, [first])
+        third = _commit(
+            {"issue2": '{"a": 1}', "issue3": "{}", "issue4": "{}"}, [second]
+        )
+        fourth = _commit(
+            {"issue2": '{"a": 1}', "issue3": '{"b": 2}', "issue4": "{}"},
+            [third],
+        )
+
+        # Pushing the last commits only: changed, added and removed files
+        output = pagure.lib.tasks_services.get_files_to_load(
+            "test", [fourth, third], gitrepo
+        )
+        self.assertEqual(output, set(["issue1", "issue3", "issue4"]))
+
+        # Pushing the whole history
+        output = pagure.lib.tasks_services.get_files_to_load(
+            "test", [fourth, third, second, first], gitrepo
+        )
+        self.assertEqual(output, set(["issue2", "issue3", "issue4"]))
+        git.assert_not_called()
+
+        # Removed files are not loaded, the others are read from the repo
+        tree = repo.revparse_single("HEAD").peel(pygit2.Tree)
+        self.assertIsNone(
+            pagure.lib.tasks_services._read_file_to_load(
+                repo, tree, "issue1", gitrepo
+            )
+        )
+        self.assertEqual(
+            pagure.lib.tasks_services._read_file_to_load(
+                repo, tree, "issue3", gitrepo
+            ),
+            '{"b": 2}',
+        )
+        git.assert_not_called()
+
 
 class PagureLibTaskServicesWithWebHooktests(tests.Modeltests):
     """Tests for pagure.lib.task_services"""
@@ -477,7 +570,8 @@ class PagureLibTaskServicesWithWebHooktests(tests.Modeltests):
     @patch("time.time", MagicMock(return_value=2))
     @patch("uuid.uuid4", MagicMock(return_value="not_so_random"))
     @patch("datetime.datetime")
-    @patch("requests.post")
+    @patch("requests.Session.post")
+    @patch.dict("pagure.config.config", {"WEBHOOK_RETRIES": 0})
     def test_webhook_notification_no_webhook(self, post, dt):
         """Test the webhook_notification method."""
         post.return_value = False
@@ -519,7 +613,7 @@ class PagureLibTaskServicesWithWebHooktests(tests.Modeltests):
                     "X-Pagure-Topic": b"topic",
                     "Content-Type": "application/json",
                 },
-                timeout=60,
+                timeout=(10, 60),
             ),
             call(
                 "http://foo.com/api/flag",
@@ -542,13 +636,147 @@ class PagureLibTaskServicesWithWebHooktests(tests.Modeltests):
                     "X-Pagure-Topic": b"topic",
                     "Content-Type": "application/json",
                 },
-                timeout=60,
+                timeout=(10, 60),
             ),
         ]
 
-        print(post.mock_calls)
+        # The URLs are called concurrently, in no particular order
+        self.assertEqual(
+            calls, sorted(post.mock_calls, key=lambda entry: entry[1][0])
+        )
 
-        self.assertEqual(calls, post.mock_calls)
+    def _start_webhook_server(self):
+        """Start a local HTTP server answering the web-hooks, return its
+        URL and the paths of the requests it received."""
+        received = []
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                received.append(self.path)
+                self.rfile.read(int(self.headers["Content-Length"]))
+                status = {"/ok": 200, "/fail": 500, "/gone": 404}[self.path]
+                self.send_response(status)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        server = HTTPServer(("127.0.0.1", 0), Handler)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        return "http://127.0.0.1:%s" % server.server_port, received
+
+    @patch("pagure.lib.tasks_services.time.sleep")
+    @patch.dict("pagure.config.config", {"WEBHOOK_RETRIES": 2})
+    def test_call_web_hooks_retries_and_stats(self, sleep):
+        """Test that call_web_hooks retries the server errors, with
+        backoff, and records the statistics of every URL."""
+        pagure.lib.tasks_services.WEBHOOK_STATS.clear()
+        url, received = self._start_webhook_server()
+        project = pagure.lib.query._get_project(self.session, "test")
+
+        pagure.lib.tasks_services.call_web_hooks(
+            project,
+            "topic",
+            {"payload": "a"},
+            [url + "/ok", url + "/fail", url + "/gone", " ", url + "/ok"],
+        )
+
+        self.assertEqual(
+            sorted(received), ["/fail", "/fail", "/fail", "/gone", "/ok"]
+        )
+        self.assertEqual(
+            sorted(entry[0][0] for entry in sleep.call_args_list), [1, 2]
+        )
+
+        stats = pagure.lib.tasks_services.WEBHOOK_STATS
+        self.assertEqual(
+            sorted(stats), [url + "/fail", url + "/gone", url + "/ok"]
+        )
+        self.assertEqual(stats[url + "/ok"]["count"], 1)
+        self.assertEqual(stats[url + "/ok"]["failures"], 0)
+        self.assertIsNone(stats[url + "/ok"]["last_error"])
+        self.assertEqual(stats[url + "/fail"]["count"], 3)
+        self.assertEqual(stats[url + "/fail"]["failures"], 3)
+        self.assertEqual(stats[url + "/fail"]["last_error"], "Error code: 500")
+        self.assertEqual(stats[url + "/gone"]["count"], 1)
+        self.assertEqual(stats[url + "/gone"]["failures"], 1)
+        self.assertTrue(
+            stats[url + "/fail"]["total_time"]
+            >= stats[url + "/fail"]["max_time"]
+            >= 0
+        )
+
+        # Only the stats of the URLs called the most recently are kept
+        with patch("pagure.lib.tasks_services._WEBHOOK_STATS_SIZE", 2):
+            pagure.lib.tasks_services.record_webhook_stats(
+                url + "/ok", 1, None
+            )
+        self.assertEqual(len(stats), 2)
+        self.assertEqual(list(stats)[-1], url + "/ok")
+        self.assertEqual(stats[url + "/ok"]["count"], 2)
+
+    @patch("pagure.lib.tasks_services.time.sleep")
+    @patch("pagure.lib.tasks_services._get_webhook_session")
+    @patch.dict("pagure.config.config", {"WEBHOOK_RETRIES": 2})
+    def test_deliver_web_hook_timeouts(self, get_session, sleep):
+        """Test that _deliver_web_hook sends the notification again when
+        the url could not be reached but not after a read timeout."""
+        post = get_session.return_value.post
+
+        post.side_effect = requests.exceptions.ReadTimeout("read timeout")
+        self.assertFalse(
+            pagure.lib.tasks_services._deliver_web_hook(
+                "http://example.com/read", {}, "{}"
+            )
+        )
+        self.assertEqual(post.call_count, 1)
+        sleep.assert_not_called()
+
+        post.reset_mock()
+        post.side_effect = requests.exceptions.ConnectTimeout("timeout")
+        self.assertFalse(
+            pagure.lib.tasks_services._deliver_web_hook(
+                "http://example.com/connect", {}, "{}"
+            )
+        )
+        self.assertEqual(post.call_count, 3)
+
+        post.reset_mock()
+        post.side_effect = [
+            requests.exceptions.ConnectionError(
+                urllib3.exceptions.MaxRetryError(
+                    None,
+                    "/refused",
+                    urllib3.exceptions.NewConnectionError(None, "refused"),
+                )
+            ),
+            MagicMock(status_code=200, __bool__=lambda self: True),
+        ]
+        self.assertTrue(
+            pagure.lib.tasks_services._deliver_web_hook(
+                "http://example.com/refused", {}, "{}"
+            )
+        )
+        self.assertEqual(post.call_count, 2)
+
+        # The connection was lost once the notification was sent
+        post.reset_mock()
+        post.side_effect = requests.exceptions.ConnectionError(
+            urllib3.exceptions.ProtocolError(
+                "Connection aborted.", ConnectionResetError()
+            )
+        )
+        self.assertFalse(
+            pagure.lib.tasks_services._deliver_web_hook(
+                "http://example.com/aborted", {}, "{}"
+            )
+        )
+        self.assertEqual(post.call_count, 1)
 
 
 class PagureLibTaskServicesJenkinsCItests(tests.Modeltests):
@@ -867,7 +1095,10 @@ class PagureLibTaskServicesLoadJsonTickettests(tests.Modeltests):
             namespace=None,
             username=None,
         )
-        self.assertIsNone(output)
+        self.assertEqual(
+            [output[key] for key in ("files", "loaded", "skipped", "failed")],
+            [1, 1, 0, 0],
+        )
 
         up_pr.assert_not_called()
         calls = [
@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+
+"""
+ Tests for pagure.lib.tasks_utils
+
+"""
+
+from __future__ import unicode_literals, absolute_import
+
+import os
+import sys
+import unittest
+
+from mock import patch, MagicMock
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+)
+
+import pagure.config
+import pagure.lib.model_base
+import pagure.lib.tasks_utils as tasks_utils
+
+
+class PagureLibTasksUtilsTests(unittest.TestCase):
+    """Tests for pagure.lib.tasks_utils"""
+
+    def setUp(self):
+        tasks_utils.TASK_STATS.clear()
+        tasks_utils._TASKS_RAN[0] = 0
+
+    @patch("pagure.lib.tasks_utils.gc")
+    def test_gc_after_task_always(self, gc):
+        """Test the default GC policy: a full collection every task."""
+        gc.collect.return_value = 3
+        self.assertEqual(tasks_utils.gc_after_task(), 3)
+        self.assertEqual(tasks_utils.gc_after_task(), 3)
+        self.assertEqual(gc.collect.call_count, 2)
+        gc.collect.assert_called_with()
+
+    @patch("pagure.lib.tasks_utils.gc")
+    def test_gc_after_task_every_n(self, gc):
+        """Test the every_n GC policy."""
+        gc.collect.return_value = 0
+        with patch.dict(
+            pagure.config.config,
+            {"TASK_GC_POLICY": "every_n", "TASK_GC_EVERY_N": 3},
+        ):
+            output = [tasks_utils.gc_after_task() for _ in range(6)]
+        self.assertEqual(output, [None, None, 0, None, None, 0])
+        self.assertEqual(gc.collect.call_count, 2)
+
+    @patch("pagure.lib.tasks_utils.get_rss")
+    @patch("pagure.lib.tasks_utils.gc")
+    def test_gc_after_task_rss(self, gc, get_rss):
+        """Test the rss GC policy."""
+        gc.collect.return_value = 0
+        with patch.dict(
+            pagure.config.config,
+            {"TASK_GC_POLICY": "rss", "TASK_GC_RSS_THRESHOLD": 100},
+        ):
+            get_rss.return_value = 50
+            self.assertIsNone(tasks_utils.gc_after_task())
+            get_rss.return_value = 150
+            self.assertEqual(tasks_utils.gc_after_task(), 0)
+        self.assertEqual(gc.collect.call_count, 1)
+
+    @patch("pagure.lib.tasks_utils.gc")
+    def test_gc_after_task_gen0_and_never(self, gc):
+        """Test the gen0 and never GC policies."""
+        gc.collect.return_value = 1
+        with patch.dict(pagure.config.config, {"TASK_GC_POLICY": "gen0"}):
+            self.assertEqual(tasks_utils.gc_after_task(), 1)
+        gc.collect.assert_called_once_with(0)
+
+        with patch.dict(pagure.config.config, {"TASK_GC_POLICY": "never"}):
+            self.assertIsNone(tasks_utils.gc_after_task())
+        self.assertEqual(gc.collect.call_count, 1)
+
+    @patch("pagure.lib.tasks_utils.gc_after_task", MagicMock(return_value=2))
+    @patch("pagure.lib.model_base.create_session")
+    def test_pagure_task_stats(self, create_session):
+        """Test that pagure_task records the counters of the tasks."""
+
+        @tasks_utils.pagure_task
+        def dummy_task(self, session, value):
+            return value
+
+        @tasks_utils.pagure_task
+        def failing_task(self, session):
+            raise ValueError("boom")
+
+        self.assertEqual(dummy_task(None, 42), 42)
+        self.assertEqual(dummy_task(None, 43), 43)
+        self.assertRaises(ValueError, failing_task, None)
+
+        session = create_session.return_value
+        self.assertEqual(session.remove.call_count, 3)
+        session.rollback.assert_called_once_with()
+
+        self.assertEqual(
+            sorted(tasks_utils.TASK_STATS), ["dummy_task", "failing_task"]
+        )
+        stats = tasks_utils.TASK_STATS["dummy_task"]
+        self.assertEqual(stats["count"], 2)
+        self.assertEqual(stats["gc_runs"], 2)
+        self.assertEqual(stats["gc_collected"], 4)
+        self.assertTrue(stats["total_time"] >= stats["max_time"] >= 0)
+        self.assertEqual(tasks_utils.TASK_STATS["failing_task"]["count"], 1)
+
+    @patch("pagure.lib.model_base.create_session")
+    def test_init_worker_session(self, create_session):
+        """Test that the worker session is only bound when asked to."""
+        tasks_utils.init_worker_session()
+        self.assertIsNone(tasks_utils.WORKER_SESSION)
+        create_session.assert_not_called()
+
+        engine = MagicMock()
+        sessionmaker = pagure.lib.model_base.SESSIONMAKER
+        pagure.lib.model_base.SESSIONMAKER = MagicMock(kw={"bind": engine})
+        try:
+            with patch.dict(
+                pagure.config.config, {"TASK_WORKER_SESSION": True}
+            ):
+                tasks_utils.init_worker_session()
+            # The connections of the parent process are left alone
+            engine.dispose.assert_not_called()
+            self.assertIn(engine, tasks_utils._INHERITED_ENGINES)
+            self.assertIsNone(pagure.lib.model_base.SESSIONMAKER)
+            self.assertEqual(
+                tasks_utils.WORKER_SESSION, create_session.return_value
+            )
+
+            @tasks_utils.pagure_task
+            def dummy_task(self, session):
+                return session
+
+            self.assertEqual(dummy_task(None), create_session.return_value)
+            self.assertEqual(create_session.call_count, 1)
+        finally:
+            tasks_utils.WORKER_SESSION = None
+            tasks_utils._INHERITED_ENGINES.remove(engine)
+            pagure.lib.model_base.SESSIONMAKER = sessionmaker
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
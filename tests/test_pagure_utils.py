@@ -80,3 +80,18 @@ class PagureUtilsTests(tests.SimplePagureTest):
         res = pagure.utils.lookup_deploykey(project, "deploykey_test_1")
         self.assertNotEquals(res, None)
         self.assertFalse(res.pushaccess)
+
+    def test_lru_cache(self):
+        """Test the entries kept by LRUCache."""
+        cache = pagure.utils.LRUCache()
+        cache.store("a", 1, 2)
+        cache.store("b", 2, 2)
+        self.assertEqual(cache.lookup("a"), 1)
+        # "b" is now the entry used the longest ago
+        cache.store("c", 3, 2)
+        self.assertEqual(list(cache), ["a", "c"])
+        self.assertIsNone(cache.lookup("b"))
+        self.assertEqual(cache.lookup("b", 0), 0)
+        cache.discard("a")
+        cache.discard("a")
+        self.assertEqual(cache, {"c": 3})
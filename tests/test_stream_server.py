@@ -275,6 +275,120 @@ class StreamingServerTests(tests.Modeltests):
         # NOTE: we cannot test the 'Invalid object provided' exception
         # as it's a backup (current code will never hit it)
 
+    def test_lookup_path(self):
+        """Tests for _lookup_path."""
+        uid = self.repo.issues[0].uid
+        self.assertEqual(pss._lookup_path("/test/issue/1"), (uid, None))
+        self.assertEqual(
+            pss._lookup_path("/foo/issue/1"),
+            (None, "Project 'foo' not found"),
+        )
+
+    @mock.patch("pagure_stream_server._lookup_path")
+    def test_resolve_path(self, lookup):
+        """Tests for resolve_path."""
+        self.addCleanup(pss._PATH_CACHE.clear)
+        lookup.side_effect = lambda path: {
+            "/test/issue/1": ("abc", None),
+            "/test/issue/2": (None, "This issue is private"),
+        }[path]
+        loop = pss.trololio.asyncio.get_event_loop()
+
+        # Concurrent requests for the same path share the same lookup
+        output = loop.run_until_complete(
+            pss.trololio.asyncio.gather(
+                pss.resolve_path("/test/issue/1"),
+                pss.resolve_path("/test/issue/1"),
+            )
+        )
+        self.assertEqual(output, ["abc", "abc"])
+        self.assertEqual(
+            loop.run_until_complete(pss.resolve_path("/test/issue/1")), "abc"
+        )
+        lookup.assert_called_once_with("/test/issue/1")
+
+        six.assertRaisesRegex(
+            self,
+            PagureEvException,
+            "This issue is private",
+            loop.run_until_complete,
+            pss.resolve_path("/test/issue/2"),
+        )
+        self.assertEqual(lookup.call_count, 2)
+
+        # The entries expire
+        with mock.patch.dict(
+            pss.pagure.config.config, {"EVENTSOURCE_CACHE_TTL": -1}
+        ):
+            pss._PATH_CACHE.clear()
+            loop.run_until_complete(pss.resolve_path("/test/issue/1"))
+            loop.run_until_complete(pss.resolve_path("/test/issue/1"))
+        self.assertEqual(lookup.call_count, 4)
+
+    def test_dispatch_message(self):
+        """Tests for dispatch_message."""
+        queue = pss.trololio.asyncio.Queue(maxsize=1)
+        other = pss.trololio.asyncio.Queue()
+        pss.CLIENTS.update({"abc": set([queue]), "def": set([other])})
+        self.addCleanup(pss.CLIENTS.clear)
+
+        message = {
+            "type": "pmessage",
+            "pattern": b"pagure.*",
+            "channel": b"pagure.abc",
+            "data": b'{"comment_added": "foo"}',
+        }
+        pss.dispatch_message(message)
+        self.assertEqual(queue.get_nowait(), '{"comment_added": "foo"}')
+        self.assertTrue(other.empty())
+
+        # The messages are dropped for the clients with a full queue
+        pss.dispatch_message(message)
+        pss.dispatch_message(message)
+        self.assertEqual(queue.qsize(), 1)
+
+    @mock.patch("pagure_stream_server.time.sleep")
+    def test_read_messages(self, sleep):
+        """Tests that read_messages subscribes again after an error."""
+        message = {"type": "pmessage", "channel": b"pagure.abc"}
+        subscribers = [mock.MagicMock() for _ in range(3)]
+        subscribers[0].listen.side_effect = pss.redis.ResponseError()
+        subscribers[1].listen.side_effect = ValueError()
+        subscribers[2].listen.return_value = iter([message])
+        conn = mock.MagicMock()
+        conn.pubsub.side_effect = subscribers
+        loop = mock.MagicMock()
+        # Stop the loop once the last subscription ended
+        sleep.side_effect = [None, None, KeyboardInterrupt()]
+
+        with self.assertRaises(KeyboardInterrupt):
+            pss.read_messages(loop, conn)
+
+        for subscriber in subscribers:
+            subscriber.psubscribe.assert_called_once_with("pagure.*")
+            subscriber.close.assert_called_once_with()
+        loop.call_soon_threadsafe.assert_called_once_with(
+            pss.dispatch_message, message
+        )
+        self.assertEqual(sleep.call_count, 3)
+
+    def test_ping_wheel(self):
+        """Tests for PingWheel."""
+        wheel = pss.PingWheel(size=3)
+        queues = [pss.trololio.asyncio.Queue() for _ in range(3)]
+        slots = []
+        for queue in queues:
+            slots.append(wheel.add(queue))
+            wheel.tick()
+        self.assertEqual(slots, [0, 1, 2])
+        self.assertEqual([queue.qsize() for queue in queues], [1, 0, 0])
+
+        wheel.remove(queues[1], slots[1])
+        for _ in range(3):
+            wheel.tick()
+        self.assertEqual([queue.qsize() for queue in queues], [2, 0, 1])
+        self.assertIsNone(queues[0].get_nowait())
+
 
 if __name__ == "__main__":
     unittest.main(verbosity=2)
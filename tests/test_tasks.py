@@ -21,9 +21,23 @@ class MockCommit(object):
 @patch("pagure.lib.query.create_session", new=Mock())
 class TestCommitsAuthorStats(unittest.TestCase):
     def setUp(self):
-        self.search_user_patcher = patch("pagure.lib.query.search_user")
+        self.search_user_patcher = patch(
+            "pagure.lib.query.search_users_by_emails"
+        )
         mock_search_user = self.search_user_patcher.start()
-        mock_search_user.side_effect = lambda _, email: self.authors.get(email)
+        mock_search_user.side_effect = lambda _, emails: {
+            email: self.authors[email]
+            for email in emails
+            if email in self.authors
+        }
+
+        # Do not load or store the stats in the (mocked) git repo
+        self.load_stats_patcher = patch(
+            "pagure.lib.git.load_commits_stats", return_value=None
+        )
+        self.load_stats_patcher.start()
+        self.save_stats_patcher = patch("pagure.lib.git.save_commits_stats")
+        self.save_stats_patcher.start()
 
         self.pygit_patcher = patch("pygit2.Repository")
         mock_repo = self.pygit_patcher.start().return_value
@@ -48,6 +62,8 @@ class TestCommitsAuthorStats(unittest.TestCase):
 
     def tearDown(self):
         self.search_user_patcher.stop()
+        self.load_stats_patcher.stop()
+        self.save_stats_patcher.stop()
         self.pygit_patcher.stop()
         self.exists_patcher.stop()
 